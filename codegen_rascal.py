@@ -11,7 +11,11 @@ class GeradorCodigoMEPA(Visitador):
         '<=': 'CMEG', '>': 'CMMA', '>=': 'CMAG'
     }
 
-    def __init__(self):
+    def __init__(self, salva_display: bool = False):
+        # salva_display: subrotinas com ENPD/RTPD, que guardam no registro
+        # de ativação a entrada do display alterada e a restauram no
+        # retorno em tempo constante (em vez de ENPR/RTPR)
+        self.salva_display = salva_display
         self.codigo: List[str] = []
         self.erros: List[str] = []
         self.tem_erro = False
@@ -76,7 +80,7 @@ class GeradorCodigoMEPA(Visitador):
         nivel_anterior = self.current_level
         self.current_level = no.simbolo.nivel_lexico + 1
         
-        self._emite("ENPR", self.current_level) 
+        self._emite("ENPD" if self.salva_display else "ENPR", self.current_level)
         
         total_locais = no.total_vars_locais
         if total_locais > 0:
@@ -91,7 +95,7 @@ class GeradorCodigoMEPA(Visitador):
         if no.parametros:
             for p in no.parametros: total_params += len(p.ids)
             
-        self._emite("RTPR", total_params)
+        self._emite("RTPD" if self.salva_display else "RTPR", total_params)
 
         self.current_level = nivel_anterior
 
@@ -0,0 +1,315 @@
+from __future__ import annotations
+from typing import Dict, List, Optional
+import ast_rascal as ast
+from defs_rascal import Visitador, Categoria
+from vm_reg_rascal import *
+
+class GeradorCodigoRegistradores(Visitador):
+    '''
+    Gera código de três endereços para a máquina de registradores
+    (vm_reg_rascal.py) a partir da AST anotada pelo VerificadorSemantico.
+    Variáveis, parâmetros e constantes são operandos diretos: x := y + 1
+    é uma única instrução SOMA. As expressões são visitadas com
+    self.destino, o registrador onde o valor deve ficar (None para
+    qualquer um), e devolvem o registrador com o valor.
+    '''
+    OP = {
+        '+': SOMA, '-': SUBT, '*': MULT, 'div': DIVI,
+        'and': CONJ, 'or': DISJ,
+        '=': CMIG, '<>': CMDG, '<': CMME,
+        '<=': CMEG, '>': CMMA, '>=': CMAG
+    }
+    # Desvio se a comparação for falsa
+    DESVIO = {
+        '=': DCIG, '<>': DCDG, '<': DCME,
+        '<=': DCEG, '>': DCMA, '>=': DCAG
+    }
+
+    def __init__(self):
+        self.funcoes: List[FuncaoReg] = []
+        self.erros: List[str] = []
+        self.tem_erro = False
+        self.indices: Dict[str, int] = {}
+        self.destino: Optional[int] = None
+
+    def _erro(self, msg: str):
+        self.erros.append(f"Erro CodeGen: {msg}")
+        self.tem_erro = True
+
+    # Subrotina em geração
+
+    def _inicia(self, funcao: FuncaoReg, registradores: int, subrotina: bool):
+        self.atual = funcao
+        self.subrotina = subrotina
+        funcao.modelo = registradores * [None]
+        self.constantes: Dict[int, int] = {}
+        self.temps_livres: List[int] = []
+        self.temps_usados: List[int] = []
+        self.rotulos: List[int] = []
+
+    def _emite(self, op: int, a=0, b=0, c=0):
+        self.atual.codigo.append([op, a, b, c])
+
+    def _novo_registrador(self) -> int:
+        self.atual.modelo.append(None)
+        return len(self.atual.modelo) - 1
+
+    def _novo_temp(self) -> int:
+        r = self.temps_livres.pop() if self.temps_livres else self._novo_registrador()
+        self.temps_usados.append(r)
+        return r
+
+    def _libera_temps(self):
+        # Fim de um comando: nenhum temporário continua vivo
+        self.temps_livres.extend(self.temps_usados)
+        self.temps_usados = []
+
+    def _constante(self, valor: int) -> int:
+        if valor not in self.constantes:
+            r = self._novo_registrador()
+            self.atual.modelo[r] = valor
+            self.constantes[valor] = r
+        return self.constantes[valor]
+
+    def _novo_rotulo(self) -> int:
+        self.rotulos.append(-1)
+        return len(self.rotulos) - 1
+
+    def _marca_rotulo(self, rotulo: int):
+        self.rotulos[rotulo] = len(self.atual.codigo)
+
+    def _finaliza(self):
+        # Resolve os rótulos dos desvios (último operando)
+        codigo = []
+        for instr in self.atual.codigo:
+            op = instr[0]
+            if op == DSVS:
+                instr[1] = self.rotulos[instr[1]]
+            elif op == DSVF:
+                instr[2] = self.rotulos[instr[2]]
+            elif op in self.DESVIO.values():
+                instr[3] = self.rotulos[instr[3]]
+            codigo.append(tuple(instr))
+        self.atual.codigo = codigo
+
+    # Endereçamento
+
+    def _global(self, simbolo) -> bool:
+        # Variável global acessada de dentro de uma subrotina
+        return (self.subrotina and simbolo.nivel_lexico == 0
+                and simbolo.categoria == Categoria.VAR)
+
+    def _registrador(self, simbolo) -> int:
+        if simbolo.categoria == Categoria.FUNC:
+            if self.atual.retorno < 0 or simbolo.nome != self.atual.nome:
+                self._erro(f"Uso inválido da função '{simbolo.nome}'.")
+            return self.atual.retorno
+        if simbolo.categoria == Categoria.PARAM:
+            # parâmetros: deslocamentos -5, -6, ... -> registradores 0, 1, ...
+            return -5 - simbolo.deslocamento
+        if self.subrotina and simbolo.nivel_lexico > 0:
+            return self.atual.parametros + simbolo.deslocamento
+        return simbolo.deslocamento
+
+    def _tem_chamada(self, no) -> bool:
+        if isinstance(no, ast.ExpChamadaFuncao):
+            return True
+        if isinstance(no, ast.ExpBinaria):
+            return self._tem_chamada(no.esq) or self._tem_chamada(no.dir)
+        if isinstance(no, ast.ExpUnaria):
+            return self._tem_chamada(no.expressao)
+        return False
+
+    def _avalia(self, no, destino: Optional[int] = None) -> int:
+        anterior, self.destino = self.destino, destino
+        r = self.visita(no)
+        self.destino = anterior
+        return r
+
+    def _preserva(self, r: int) -> int:
+        # Copia uma variável que uma chamada avaliada depois poderia alterar
+        if r in self.temps_usados or r in self.constantes.values():
+            return r
+        t = self._novo_temp()
+        self._emite(MOVE, t, r)
+        return t
+
+    def _resultado(self) -> int:
+        return self.destino if self.destino is not None else self._novo_temp()
+
+    def _argumentos(self, argumentos) -> tuple:
+        # Avaliados do último para o primeiro, como na MEPA
+        regs = len(argumentos) * [0]
+        for k in reversed(range(len(argumentos))):
+            r = self._avalia(argumentos[k])
+            if any(self._tem_chamada(a) for a in argumentos[:k]):
+                r = self._preserva(r)
+            regs[k] = r
+        return tuple(regs)
+
+    # Programa Principal
+
+    def visita_Programa(self, no: ast.Programa):
+        subrotinas = no.bloco.decl_subrotinas or []
+        for k, sub in enumerate(subrotinas):
+            self.indices[sub.simbolo.nome] = k + 1
+        self.funcoes = [FuncaoReg(no.id)] + [None] * len(subrotinas)
+
+        for sub in subrotinas:
+            self.visita(sub)
+
+        self._inicia(self.funcoes[0], no.total_vars_globais, False)
+        self.visita(no.bloco.comando_composto)
+        self._emite(PARA)
+        self._finaliza()
+
+    # Subrotinas
+
+    def _gera_subrotina(self, no):
+        total_params = 0
+        if no.parametros:
+            for p in no.parametros: total_params += len(p.ids)
+        funcao = FuncaoReg(no.simbolo.nome, total_params)
+
+        # parâmetros, variáveis locais e o valor de retorno
+        registradores = total_params + no.total_vars_locais
+        if no.simbolo.categoria == Categoria.FUNC:
+            funcao.retorno = registradores
+            registradores += 1
+        self._inicia(funcao, registradores, True)
+
+        self.visita(no.bloco.comando_composto)
+        self._emite(RETN)
+        self._finaliza()
+        self.funcoes[self.indices[no.simbolo.nome]] = funcao
+
+    def visita_DeclProcedimento(self, no: ast.DeclProcedimento):
+        self._gera_subrotina(no)
+
+    def visita_DeclFuncao(self, no: ast.DeclFuncao):
+        self._gera_subrotina(no)
+
+    # Comandos
+
+    def visita_ComandoComposto(self, no: ast.ComandoComposto):
+        for cmd in no.comandos:
+            self.visita(cmd)
+
+    def visita_CmdAtribuicao(self, no: ast.CmdAtribuicao):
+        if self._global(no.simbolo):
+            r = self._avalia(no.expressao)
+            self._emite(ARGL, no.simbolo.deslocamento, r)
+        else:
+            self._avalia(no.expressao, self._registrador(no.simbolo))
+        self._libera_temps()
+
+    def _desvia_se_falso(self, condicao, rotulo: int):
+        if isinstance(condicao, ast.ExpBinaria) and condicao.op in self.DESVIO:
+            esq = self._avalia(condicao.esq)
+            if self._tem_chamada(condicao.dir):
+                esq = self._preserva(esq)
+            dir = self._avalia(condicao.dir)
+            self._emite(self.DESVIO[condicao.op], esq, dir, rotulo)
+        else:
+            self._emite(DSVF, self._avalia(condicao), rotulo)
+        self._libera_temps()
+
+    def visita_CmdIf(self, no: ast.CmdIf):
+        if no.cmd_else:
+            rot_fim = self._novo_rotulo()
+            rot_else = self._novo_rotulo()
+
+            self._desvia_se_falso(no.condicao, rot_else)
+            self.visita(no.cmd_then)
+            self._emite(DSVS, rot_fim)
+
+            self._marca_rotulo(rot_else)
+            self.visita(no.cmd_else)
+            self._marca_rotulo(rot_fim)
+        else:
+            rot_saida = self._novo_rotulo()
+
+            self._desvia_se_falso(no.condicao, rot_saida)
+            self.visita(no.cmd_then)
+            self._marca_rotulo(rot_saida)
+
+    def visita_CmdWhile(self, no: ast.CmdWhile):
+        rot_inicio = self._novo_rotulo()
+        rot_fim = self._novo_rotulo()
+
+        self._marca_rotulo(rot_inicio)
+        self._desvia_se_falso(no.condicao, rot_fim)
+
+        self.visita(no.cmd_do)
+        self._emite(DSVS, rot_inicio)
+
+        self._marca_rotulo(rot_fim)
+
+    def visita_CmdRead(self, no: ast.CmdRead):
+        for simbolo in no.simbolos:
+            if self._global(simbolo):
+                t = self._novo_temp()
+                self._emite(LEIT, t)
+                self._emite(ARGL, simbolo.deslocamento, t)
+            else:
+                self._emite(LEIT, self._registrador(simbolo))
+        self._libera_temps()
+
+    def visita_CmdWrite(self, no: ast.CmdWrite):
+        for expr in no.expressoes:
+            self._emite(IMPR, self._avalia(expr))
+            self._libera_temps()
+
+    def visita_CmdChamadaProcedimento(self, no: ast.CmdChamadaProcedimento):
+        nome = no.simbolo.nome
+        if nome not in self.indices:
+            self._erro(f"Rótulo para '{nome}' não encontrado.")
+            return
+        args = self._argumentos(no.argumentos or [])
+        self._emite(CHAM, self.indices[nome], -1, args)
+        self._libera_temps()
+
+    # Expressões
+
+    def visita_ExpBinaria(self, no: ast.ExpBinaria):
+        destino = self.destino
+        esq = self._avalia(no.esq)
+        if self._tem_chamada(no.dir):
+            esq = self._preserva(esq)
+        dir = self._avalia(no.dir)
+        r = destino if destino is not None else self._novo_temp()
+        self._emite(self.OP[no.op], r, esq, dir)
+        return r
+
+    def visita_ExpUnaria(self, no: ast.ExpUnaria):
+        destino = self.destino
+        v = self._avalia(no.expressao)
+        r = destino if destino is not None else self._novo_temp()
+        self._emite(INVR if no.op == '-' else NEGA, r, v)
+        return r
+
+    def _valor(self, r: int) -> int:
+        if self.destino is None:
+            return r
+        self._emite(MOVE, self.destino, r)
+        return self.destino
+
+    def visita_ExpNumero(self, no: ast.ExpNumero):
+        return self._valor(self._constante(no.valor))
+
+    def visita_ExpBooleano(self, no: ast.ExpBooleano):
+        return self._valor(self._constante(1 if no.valor else 0))
+
+    def visita_ExpVariavel(self, no: ast.ExpVariavel):
+        if self._global(no.simbolo):
+            r = self._resultado()
+            self._emite(CRGL, r, no.simbolo.deslocamento)
+            return r
+        return self._valor(self._registrador(no.simbolo))
+
+    def visita_ExpChamadaFuncao(self, no: ast.ExpChamadaFuncao):
+        destino = self.destino
+        args = self._argumentos(no.argumentos or [])
+        r = destino if destino is not None else self._novo_temp()
+        self._emite(CHAM, self.indices[no.simbolo.nome], r, args)
+        return r
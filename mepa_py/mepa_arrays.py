@@ -0,0 +1,532 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Flat memory engine: values and type tags are kept in two parallel      #
+# preallocated arrays instead of one [value,tag] list per cell, so no    #
+# memory is allocated by the instructions, and a cell takes 9 bytes      #
+# instead of a list. The common instructions run inline in the execution #
+# loop, the others in the functions below; without type checks           #
+# ('--nocheck' or a verified program) the inline instructions do not     #
+# keep the tags, which are then never read.                              #
+#                                                                        #
+# This engine trades speed for memory: reading an array element makes a  #
+# new Python integer each time, so it runs slower than the engines on    #
+# lists, e.g. "decoded" and "vm".                                        #
+#                                                                        #
+# Values are kept in a 64-bit array until one does not fit: the values   #
+# then become a list of Python integers, unbounded as in the other       #
+# engines, and the instruction runs again (instructions storing new      #
+# values change no register before). With '--nocheck' reading an         #
+# uninitialized cell yields 0.                                           #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys
+from array import array
+
+from mepa_defs import *
+from mepa_interp import executeDecoded
+from mepa_tos import BINARY_OPS
+
+# Instructions run inline, most frequent first
+LDVL, LDCT, BINARY, STVL, JMPF, JMP, NOP, WRIT, OTHER = range(9)
+
+# Jump instructions, which set 'i' themselves
+JMP_INSTR = [ "jmp", "retproc", "retprocd", "call", "callpar" ]
+
+# Tag of cells never written
+UNDEF = -1
+
+def executeArrays(MP,P,L,msfile,infile,outfile,nocheck):
+    """Execution function over pre-decoded instructions and flat memory.
+       Debugging options and instructions use 'executeDecoded'.
+    """
+    global s, i, D, V, T, inf, outf, check
+
+    DP = decodeProgram(P)
+    if debugging(DP):
+        return executeDecoded(MP,P,L,msfile,infile,outfile,nocheck)
+    DP = decode(P)
+
+    inf = infile
+    outf = outfile
+
+    i = 0
+    s = -1
+    D = OPTIONS_DICT["displaysize"] * [None]
+
+    # same number of cells as the original interpreter
+    size = 2*OPTIONS_DICT["stacksize"]
+    V = array('q',[0]) * size
+    T = array('b',[UNDEF]) * size
+
+    check = not nocheck
+    limit = OPTIONS_DICT["limit"]
+    count = 0
+    write = outfile.write
+
+    ldvl, ldct, binary, stvl, jmpf, jmp, nop, writ = \
+        LDVL, LDCT, BINARY, STVL, JMPF, JMP, NOP, WRIT
+
+    # registers of the inline instructions; 's' and 'i' are set for
+    # the others
+    pc = 0
+    sp = -1
+    vals = V
+    tags = T
+    tagged = check
+
+    # execution loop
+    while True:
+        li = pc
+        try:
+            try:
+                op, a, b, fn, args, step = DP[pc]
+            except:
+                Msg(PROG_END,quit=True,code=1,file=msfile)
+            pc += 1
+            if op==ldvl:
+                a = D[a]
+                assert a!=None
+                a += b
+                sp += 1
+                vals[sp] = vals[a]
+                if tagged:
+                    tags[sp] = tags[a]
+            elif op==ldct:
+                assert size>sp+1
+                vals[sp+1] = a
+                if tagged:
+                    tags[sp+1] = 0
+                sp += 1
+            elif op==binary:
+                if tagged and (tags[sp-1] or tags[sp]):
+                    fault((sp-1,0),(sp,0))
+                vals[sp-1] = a(vals[sp-1],vals[sp])
+                if tagged:
+                    tags[sp-1] = 0
+                sp -= 1
+            elif op==stvl:
+                a = D[a]
+                assert a!=None
+                a += b
+                vals[a] = vals[sp]
+                if tagged:
+                    tags[a] = tags[sp]
+                sp -= 1
+            elif op==jmpf:
+                if tagged and tags[sp]:
+                    fault((sp,0))
+                if not vals[sp]:
+                    pc = a
+                sp -= 1
+            elif op==jmp:
+                pc = a
+            elif op==nop:
+                pass
+            elif op==writ:
+                if tagged and tags[sp]:
+                    fault((sp,0))
+                write("%d\n" % vals[sp])
+                sp -= 1
+            else:
+                s = sp
+                i = li+step
+                fn(*args)
+                sp = s
+                pc = i
+                vals = V
+            count += 1
+        except OverflowError:
+            widen()
+            vals = V
+            pc = li
+            continue
+        except MepaError as e:
+            Msg(str(e),quit=True,code=e.code,file=msfile)
+        except AssertionError as e:
+            Msg("\n"+ILLEGAL_ARGUMENT_TYPE,file=msfile)
+            sys.exit(1)
+        except SystemExit as e:
+            sys.exit(1)
+        except:
+            Msg(ILLEGAL_VALUE % li, quit=True,file=msfile)
+        if pc<0:      # halt()
+            Msg(EXECUTED_INSTRUCTIONS % count,file=msfile)
+            return -1
+        if count>=limit:
+            Msg(MAXIMUM_INSTRUCTIONS_EXCEEDED % limit,quit=True,code=1,
+                file=msfile)
+
+# Auxiliary functions
+
+def decode(P):
+    """ Decodes program (after 'fixArgs') once into a list of (code, a,
+        b, handler, args, step) entries: 'a' and 'b' are the arguments
+        of inline instructions, or the Python operation of a binary
+        one; the others run 'handler' of this module, and 'step' is
+        added to 'i' before it runs.
+    """
+    DP = []
+    for name, args in decodeProgram(P):
+        if args==None:
+            DP.append((OTHER, 0, 0, badarg, (), 1))
+        elif name=="ldvl":
+            DP.append((LDVL, args[0], args[1], None, args, 1))
+        elif name=="ldct":
+            DP.append((LDCT, args[0], 0, None, args, 1))
+        elif name in BINARY_OPS:
+            DP.append((BINARY, BINARY_OPS[name], 0, None, args, 1))
+        elif name=="stvl":
+            DP.append((STVL, args[0], args[1], None, args, 1))
+        elif name=="jmpf":
+            DP.append((JMPF, args[0], 0, None, args, 1))
+        elif name=="jmp":
+            DP.append((JMP, args[0], 0, None, args, 0))
+        elif name=="nop":
+            DP.append((NOP, 0, 0, None, args, 1))
+        elif name=="writ":
+            DP.append((WRIT, 0, 0, None, args, 1))
+        else:
+            DP.append((OTHER, 0, 0, globals()[name], args,
+                       0 if name in JMP_INSTR else 1))
+    return DP
+
+def badarg(*args):
+    """ Argument that 'eval' would not accept. """
+    raise ValueError
+
+def widen():
+    """ Values beyond 64 bits: the memory becomes a list. """
+    global V
+    V = list(V)
+
+def fault(*cells):
+    """ Raises the exception of the failed type check on (address,
+        tag) pairs: uninitialized cells behave as in mepa_vm.py.
+    """
+    for k, t in cells:
+        if T[k]==UNDEF:
+            raise TypeError
+        assert T[k]==t
+
+# Instructions
+
+def add():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    V[s-1] = V[s-1]+V[s];  T[s-1] = 0
+    s -= 1
+
+def subt():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    V[s-1] = V[s-1]-V[s];  T[s-1] = 0
+    s -= 1
+
+def mult():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    V[s-1] = V[s-1]*V[s];  T[s-1] = 0
+    s -= 1
+
+def divi():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    V[s-1] = V[s-1]//V[s];  T[s-1] = 0
+    s -= 1
+
+def andd():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    s -= 1
+    V[s] = V[s] and V[s+1];  T[s] = 0
+
+def orr():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    s -= 1
+    V[s] = V[s] or V[s+1];  T[s] = 0
+
+def less():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    s -= 1
+    V[s] = V[s]<V[s+1];  T[s] = 0
+
+def grt():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    s -= 1
+    V[s] = V[s]>V[s+1];  T[s] = 0
+
+def eql():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    s -= 1
+    V[s] = V[s]==V[s+1];  T[s] = 0
+
+def dif():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    s -= 1
+    V[s] = V[s]!=V[s+1];  T[s] = 0
+
+def leq():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    s -= 1
+    V[s] = V[s]<=V[s+1];  T[s] = 0
+
+def geq():
+    global s
+    if check and (T[s-1] or T[s]):
+        fault((s-1,0),(s,0))
+    s -= 1
+    V[s] = V[s]>=V[s+1];  T[s] = 0
+
+def inv():
+    if check and T[s]:
+        fault((s,0))
+    V[s] = -V[s];  T[s] = 0
+
+def nott():
+    if check and T[s]:
+        fault((s,0))
+    V[s] = 1-V[s];  T[s] = 0
+
+def nop():
+    pass
+
+def halt():
+    global i
+    i = -1
+
+def read():
+    global s
+    assert len(V)>s
+    try:
+        v = inf.readInt()
+        try:
+            V[s+1] = v
+        except OverflowError:
+            # the value has been read: not run again
+            widen()
+            V[s+1] = v
+        T[s+1] = 0
+        s += 1
+    except EOFError:
+        raise MepaError("\n"+UNEXPECTED_EOF_INPUT)
+    except:
+        raise MepaError(ILLEGAL_INPUT_VALUE)
+
+def writ():
+    global s
+    if check and T[s]:
+        fault((s,0))
+    outf.write("%d\n" % V[s])
+    s -= 1
+
+def init():
+    global s
+    s = -1;  D[0] = 0
+
+def cont():
+    if check and T[s]!=2:
+        fault((s,2))
+    t = V[s]
+    V[s] = V[t];  T[s] = T[t]
+
+def ldct(k):
+    global s
+    assert len(V)>s+1
+    V[s+1] = k;  T[s+1] = 0
+    s += 1
+
+def jmp(p):
+    global i
+    i = p
+
+def jmpf(p):
+    global i, s
+    if check and T[s]:
+        fault((s,0))
+    if not V[s]:
+        i = p
+    s -= 1
+
+def alloc(n):
+    global s
+    s += n
+
+def dealloc(n):
+    global s
+    s -= n
+
+def entproc(k):
+    global s
+    assert len(D)>k
+    s += 1
+    assert len(V)>s
+    V[s] = D[k-1];  T[s] = 2
+    D[k] = s+1
+
+def retproc(n):
+    global i, s
+    if check and (T[s-1]!=1 or T[s-2]!=2 or T[s-3]!=3):
+        fault((s-1,1),(s-2,2),(s-3,3))
+    t = V[s-1]
+    D[t] = V[s-2]
+    i = V[s-3]
+    s -= (n+4)
+    while t>1:
+        if check and T[D[t]-1]!=2:
+            fault((D[t]-1,2))
+        D[t-1] = V[D[t]-1]
+        t -= 1
+
+def entprocd(k):
+    global s
+    assert len(D)>k
+    s += 1
+    assert len(V)>s
+    V[s] = D[k-1];  T[s] = 2
+    V[s-1] = k;  T[s-1] = 1
+    # an unset display entry is saved as -1
+    V[s-2] = -1 if D[k]==None else D[k];  T[s-2] = 2
+    D[k] = s+1
+
+def retprocd(n):
+    global i, s
+    if check and (T[s-1]!=1 or T[s-2]!=2 or T[s-3]!=3):
+        fault((s-1,1),(s-2,2),(s-3,3))
+    D[V[s-1]] = None if V[s-2]<0 else V[s-2]
+    i = V[s-3]
+    s -= (n+4)
+
+def indx(k):
+    global s
+    if check and (T[s-1]!=2 or T[s]):
+        fault((s-1,2),(s,0))
+    V[s-1] += V[s]*k;  T[s-1] = 2
+    s -= 1
+
+def ldmv(k):
+    global s
+    if check and T[s]!=2:
+        fault((s,2))
+    assert len(V)>(s+k)
+    t = V[s]
+    V[s:s+k] = V[t:t+k]
+    T[s:s+k] = T[t:t+k]
+    s += (k-1)
+
+def stmv(k):
+    global s
+    if check and T[s-k]!=2:
+        fault((s-k,2))
+    t = V[s-k]
+    V[t:t+k] = V[s-k+1:s+1]
+    T[t:t+k] = T[s-k+1:s+1]
+    s -= (k+1)
+
+def ldvl(m,n):
+    global s
+    a = D[m]
+    assert a!=None
+    a += n
+    s += 1
+    V[s] = V[a];  T[s] = T[a]
+
+def ldaddr(m,n):
+    global s
+    a = D[m]
+    assert a!=None
+    V[s+1] = a+n;  T[s+1] = 2
+    s += 1
+
+def stvl(m,n):
+    global s
+    a = D[m]
+    assert a!=None
+    a += n
+    V[a] = V[s];  T[a] = T[s]
+    s -= 1
+
+def ldvi(m,n):
+    global s
+    a = D[m]
+    assert a!=None
+    a += n
+    if check and T[a]!=2:
+        fault((a,2))
+    a = V[a]
+    s += 1
+    V[s] = V[a];  T[s] = T[a]
+
+def stvi(m,n):
+    global s
+    a = D[m]
+    assert a!=None
+    a += n
+    if check and T[a]!=2:
+        fault((a,2))
+    a = V[a]
+    V[a] = V[s];  T[a] = T[s]
+    s -= 1
+
+def entlabl(j,n):
+    global s
+    s = D[j]+n-1
+
+def ldgaddr(p,k):
+    global s
+    assert len(V)>(s+3)
+    V[s+1] = p;     T[s+1] = 3
+    V[s+2] = D[k];  T[s+2] = 2
+    V[s+3] = k;     T[s+3] = 1
+    s += 3
+
+def call(p,k):
+    global i, s
+    assert len(V)>(s+3)
+    V[s+1] = i+1;   T[s+1] = 3
+    V[s+2] = D[k];  T[s+2] = 2
+    V[s+3] = k;     T[s+3] = 1
+    s += 3
+    i = p
+
+def callpar(m,n,k):
+    global i, s
+    a = D[m]
+    assert a!=None
+    a += n
+    assert len(V)>(s+3)
+    if check and (T[a]!=3 or T[a+1]!=2 or T[a+2]!=1):
+        fault((a,3),(a+1,2),(a+2,1))
+    V[s+1] = i+1;   T[s+1] = 3
+    V[s+2] = D[k];  T[s+2] = 2
+    V[s+3] = k;     T[s+3] = 1
+    s += 3
+    i = V[a]
+    t = V[a+2]
+    D[t] = V[a+1]
+    while t>1:
+        if check and T[D[t]-1]!=2:
+            fault((D[t]-1,2))
+        D[t-1] = V[D[t]-1]
+        t -= 1
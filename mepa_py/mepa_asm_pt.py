@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Assembler: writes the binary object (.mepb, see mepa_obj.py) of a MEPA #
+# program, which 'mepa_pt.py --progfile' runs without parsing text.      #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, os, getopt
+
+from mepa_defs import *
+from mepa_obj import writeObject
+
+Usage = """
+Usage:
+
+    [python3] mepa_asm_pt.py <program file>
+         [-h | --help (False)]
+         [-o | --outfile <file name> (program file with extension .mepb)]
+         [--programsize <integer> (no limit)]
+"""
+
+#======================================================================
+# Main
+#======================================================================
+
+
+if __name__ == "__main__":
+
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:],"ho:",
+                                       ["help","outfile=","programsize="])
+    except getopt.GetoptError:
+        Msg(UNRECOGNIZED_OPTION)
+        Msg(Usage,quit=True,code=1)
+    if len(args)!=1:
+        Msg(Usage,quit=True,code=1)
+
+    outname = os.path.splitext(args[0])[0]+".mepb"
+    for o,a in opts:
+        if o=="-h" or o=="--help":
+            Msg(Usage,quit=True)
+        elif o=="-o" or o=="--outfile":
+            outname = a
+        elif o=="--programsize":
+            try:
+                OPTIONS_DICT["programsize"] = int(a)
+            except ValueError:
+                Msg(ILLEGAL_OPTION % (o[2:],a),quit=True,code=1)
+
+    try:
+        with open(args[0],"r") as f:
+            P, L = readProgram(f)
+        resolveArgs(P,L)
+        with open(outname,"wb") as f:
+            writeObject(P,L,f)
+    except OSError as e:
+        Msg(OPEN_FILE_ERROR % e.filename,quit=True,code=1)
+    except MepaError as e:
+        Msg(str(e),quit=True,code=1)
+    Msg(OBJECT_WRITTEN % (len(P),len(L),outname))
@@ -0,0 +1,145 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Interactive MEPA sessions on an asyncio event loop: each session is a  #
+# VM (mepa_vm.py) reading from and writing to asyncio streams, e.g. a    #
+# socket connection. A session runs at most 'quantum' instructions at a  #
+# time before letting the other sessions run, and a LEIT without input   #
+# suspends it, without blocking the loop, until more input arrives.      #
+#                                                                        #
+#    vm = AsyncVM(limit=10**6)                                           #
+#    vm.load(open("prog.mep"))                                           #
+#    count = await vm.arun(reader,writer)     # raises MepaError         #
+#                                                                        #
+# Input is split into tokens by complete lines, as in mepa_io.py. A      #
+# suspended LEIT has not been executed: it runs again when input comes.  #
+# mepa_serve_pt.py serves a program over TCP or Unix sockets, a session  #
+# per connection.                                                        #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import io, asyncio, codecs
+
+from mepa_defs import *
+from mepa_io import Input, Output, OUT_BUFFER, InputPending
+from mepa_vm import VM
+
+# Instructions run by a session before the others run
+QUANTUM = 1000
+
+# Bytes read from a stream at a time
+READ_SIZE = 1<<12
+
+# Seconds a finished session waits for the end of its input, so that
+# closing with unread input does not reset the connection
+LINGER = 5
+
+class StreamInput(Input):
+    """ Integer tokens from asyncio stream 'reader'; at the end of the
+        tokens received, 'readInt' raises InputPending until 'more'
+        receives another line or the end of the stream.
+    """
+
+    def __init__(self,reader):
+        Input.__init__(self,io.StringIO())
+        self.reader = reader
+        self.decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self.partial = ""
+        self.fill = self.fillStream
+
+    def fillStream(self):
+        if self.eof:
+            raise EOFError
+        raise InputPending
+
+    async def more(self):
+        """ Waits for more input. """
+        data = await self.reader.read(READ_SIZE)
+        text = self.partial+self.decoder.decode(data,not data)
+        if not data:
+            # final line without end of line, as in 'Input'
+            self.eof = True
+            self.partial = ""
+            if text:
+                self.lines += 1
+            tokens = text[:-1].split()
+        else:
+            k = text.rfind("\n")
+            if k<0:
+                self.partial = text
+                return
+            self.lines += text.count("\n",0,k)+1
+            self.partial = text[k+1:]
+            tokens = text[:k].split()
+        self.setTokens(self.tokens[self.pos:]+tokens)
+
+class StreamText:
+    """ Text file interface of asyncio stream 'writer', for 'Output'
+        and VM messages.
+    """
+
+    def __init__(self,writer):
+        self.writer = writer
+
+    def write(self,t):
+        self.writer.write(t.encode())
+
+    def flush(self):
+        pass
+
+class AsyncVM(VM):
+    """ VM running as a coroutine, 'quantum' instructions at a time. """
+
+    async def arun(self,reader,writer,quantum=QUANTUM):
+        """ Runs the loaded program from its beginning, reading from
+            asyncio stream 'reader' and writing to 'writer'; returns
+            the number of executed instructions. Errors are raised as
+            MepaError.
+        """
+        self.reset()
+        self.attach(StreamInput(reader),Output(StreamText(writer),OUT_BUFFER))
+        while True:
+            try:
+                count = self.execute(self.count+quantum)
+            except InputPending:
+                await writer.drain()
+                await self.inf.more()
+                continue
+            await writer.drain()
+            if count!=None:
+                return count
+            # the other sessions run
+            await asyncio.sleep(0)
+
+def sessionHandler(program,quantum=QUANTUM,**options):
+    """ Connection callback for 'asyncio.start_server' and
+        'start_unix_server': runs 'program' (as for 'VM.load') on a new
+        AsyncVM with 'options', with the messages also sent to the
+        connection.
+    """
+    async def session(reader,writer):
+        vm = AsyncVM(messfile=StreamText(writer),**options)
+        vm.load(program)
+        try:
+            try:
+                count = await vm.arun(reader,writer,quantum)
+                vm.msg(EXECUTED_INSTRUCTIONS % count)
+            except MepaError as e:
+                vm.msg(str(e))
+            await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+                await asyncio.wait_for(discard(reader),LINGER)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+    return session
+
+async def discard(reader):
+    """ Reads 'reader' up to its end. """
+    while await reader.read(READ_SIZE):
+        pass
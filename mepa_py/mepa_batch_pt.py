@@ -0,0 +1,379 @@
+#! /usr/bin/env python3
+
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Batch runner: runs the jobs of a manifest over a pool of worker        #
+# processes and writes one JSON line per finished job.                   #
+#                                                                        #
+# Each manifest line has a program file (MEPA text or object, see        #
+# mepa_obj.py), an input file and a file with the expected output; '-'   #
+# means no input or nothing to compare. Two                              #
+# optional fields give the instruction budget of the job (--limit by     #
+# default) and its priority (1), see below. Relative names are taken     #
+# from the manifest directory. Empty lines and lines starting with ';'   #
+# are ignored:                                                           #
+#                                                                        #
+#    ; program            input          expected       budget  priority #
+#    correto01.mep        -              correto01.out                   #
+#    correto02.mep        entrada02.txt  correto02.out  50000   2        #
+#                                                                        #
+# Every worker reads and decodes each distinct program once. Results     #
+# have the fields "job" (manifest order, from 0), "program", "input",    #
+# "status" ("ok", "wrong", "error" or "load"), "count", "time" (run      #
+# seconds), "peak" (memory cells used, see mepa_vm.py), "message" and    #
+# "diff" (unified diff against the expected output).                     #
+#                                                                        #
+# With --lanes the jobs of each program run together in lock-step (see   #
+# mepa_lanes.py), one program per worker; "time" is then the time of     #
+# the whole program divided among its jobs, and budgets and priorities  #
+# are not used.                                                          #
+#                                                                        #
+# With --quantum all jobs run in this process, on the scheduler of       #
+# mepa_sched.py: at most --slots jobs at a time, by priority, in turns   #
+# of that many instructions times their priority. VMs are reused by     #
+# later jobs of the same program; "time" is the time of the job's turns. #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, os, io, time, json, difflib, getopt, multiprocessing
+
+from mepa_defs import *
+from mepa_vm import VM
+from mepa_obj import isObject, readObject, MepaObject
+from mepa_sched import Scheduler, Job, SLOTS
+import mepa_lanes
+
+Usage = """
+Usage:
+
+    [python3] mepa_batch_pt.py <manifest>
+         [-h | --help (False)]
+         [--jobs <integer> (number of processors)]
+         [--stacksize <integer> (500)]
+         [--displaysize <integer> (10)]
+         [--limit <integer> (10000)]
+         [--outfile <file name> (stdout)]
+         [--nocheck (False)]
+         [--jit (False)]
+         [--lanes (False)]
+         [--quantum <integer> (none)]
+         [--slots <integer> (%d)]
+""" % SLOTS
+
+BATCH_OPTIONS = [ "help", "nocheck", "jit", "lanes", "jobs=", "stacksize=", "displaysize=",
+                  "limit=", "outfile=", "quantum=", "slots=" ]
+
+# Programs already loaded by this process: file name -> VM or the
+# MepaError message
+PROGRAMS = {}
+
+# VMs of each program not in use by scheduled jobs
+IDLE = {}
+
+def readManifest(name):
+    """ List of [program, input, expected, budget, priority] entries;
+        input, expected and budget may be None.
+    """
+    base = os.path.dirname(name)
+    jobs = []
+    try:
+        f = open(name,"r")
+    except OSError:
+        Msg(OPEN_FILE_ERROR % name,quit=True,code=1)
+    with f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if line=="" or line.startswith(';'):
+                continue
+            p = line.split()
+            if not 3<=len(p)<=5:
+                Msg(ILLEGAL_MANIFEST_LINE % (n+1,line),quit=True,code=1)
+            job = [None if a=="-" else os.path.join(base,a)
+                   for a in p[:3]]
+            try:
+                budget, priority = (p[3:]+["-","-"])[:2]
+                job.append(None if budget=="-" else int(budget))
+                job.append(1 if priority=="-" else int(priority))
+                if min(job[3] or 1,job[4])<=0:
+                    raise ValueError
+            except ValueError:
+                Msg(ILLEGAL_MANIFEST_LINE % (n+1,line),quit=True,code=1)
+            jobs.append(job)
+    return jobs
+
+def machine(prog,options):
+    """ VM with program 'prog' loaded, decoded once per process. """
+    if not prog in PROGRAMS:
+        vm = VM(messfile=io.StringIO(),**options)
+        try:
+            if isObject(prog):
+                with open(prog,"rb") as f:
+                    vm.load(readObject(f))
+            else:
+                with open(prog,"r") as f:
+                    vm.load(f)
+            PROGRAMS[prog] = vm
+        except OSError:
+            PROGRAMS[prog] = OPEN_FILE_ERROR % prog
+        except MepaError as e:
+            PROGRAMS[prog] = str(e).strip()
+    return PROGRAMS[prog]
+
+def spare(prog,options):
+    """ VM with program 'prog' for a scheduled job: an idle one or a
+        copy of that of 'machine'; MepaError if it could not be loaded.
+    """
+    vm = machine(prog,options)
+    if isinstance(vm,str):
+        raise MepaError(vm)
+    idle = IDLE.setdefault(prog,[vm])
+    if idle:
+        return idle.pop()
+    # already verified
+    new = VM(messfile=io.StringIO(),verify=False,
+             **dict(options,nocheck=not vm.check))
+    new.load(vm.P if isinstance(vm.P,MepaObject) else [vm.P,vm.L])
+    return new
+
+def newResult(k,prog,inp):
+    """ Result dictionary of job 'k' before it runs. """
+    return { "job": k, "program": prog, "input": inp, "status": "ok",
+             "count": 0, "time": 0.0, "peak": 0, "message": "",
+             "diff": [] }
+
+def runJob(job):
+    """ Runs one manifest entry (index, [program, input, expected,
+        budget, priority], VM options); returns its result dictionary.
+    """
+    k, [prog, inp, expected, budget, priority], options = job
+    res = newResult(k,prog,inp)
+    vm = machine(prog,options)
+    if isinstance(vm,str):
+        res["status"] = "load"
+        res["message"] = vm
+        return res
+    vm.limit = budget if budget!=None else \
+               options.get("limit",OPTIONS_DICT["limit"])
+    out = io.StringIO()
+    vm.mess = io.StringIO()
+    try:
+        inf = open(inp,"r") if inp!=None else io.StringIO()
+    except OSError:
+        res["status"] = "error"
+        res["message"] = OPEN_FILE_ERROR % inp
+        return res
+    start = time.perf_counter()
+    try:
+        with inf:
+            res["count"] = vm.run(inf,out)
+    except MepaError as e:
+        res["status"] = "error"
+        res["message"] = str(e).strip()
+        res["count"] = vm.count
+    res["time"] = time.perf_counter()-start
+    res["peak"] = vm.peak()
+    return compare(res,out,expected)
+
+def runLanes(task):
+    """ Runs the jobs of one program in lock-step (program, list of
+        (index, [program, input, expected]), VM options); returns their
+        result dictionaries.
+    """
+    prog, jobs, options = task
+    vm = machine(prog,options)
+    results = []
+    lanes = []
+    for k, [prog, inp, expected, budget, priority] in jobs:
+        res = newResult(k,prog,inp)
+        results.append(res)
+        if isinstance(vm,str):
+            res["status"] = "load"
+            res["message"] = vm
+            continue
+        try:
+            if inp!=None:
+                with open(inp,"r") as f:
+                    inf = io.StringIO(f.read())
+            else:
+                inf = io.StringIO()
+        except OSError:
+            res["status"] = "error"
+            res["message"] = OPEN_FILE_ERROR % inp
+            continue
+        lanes.append((res,inf,io.StringIO(),expected))
+    if lanes:
+        vm.mess = io.StringIO()
+        start = time.perf_counter()
+        R = mepa_lanes.Lanes(vm,[l[1] for l in lanes],
+                             [l[2] for l in lanes]).run()
+        elapsed = (time.perf_counter()-start)/len(lanes)
+        for (res, inf, out, expected), (count, message, peak) in zip(lanes,R):
+            res["count"] = count
+            res["time"] = elapsed
+            res["peak"] = peak
+            if message:
+                res["status"] = "error"
+                res["message"] = message
+            compare(res,out,expected)
+    return results
+
+def compare(res,out,expected):
+    """ Result 'res' after comparing output 'out' with file
+        'expected'.
+    """
+    if expected!=None:
+        try:
+            with open(expected,"r") as f:
+                exp = f.read().splitlines()
+        except OSError:
+            res["status"] = "error"
+            res["message"] = OPEN_FILE_ERROR % expected
+            return res
+        diff = list(difflib.unified_diff(exp,out.getvalue().splitlines(),
+                                         "expected","output",lineterm=""))
+        if diff:
+            res["diff"] = diff
+            if res["status"]=="ok":
+                res["status"] = "wrong"
+    return res
+
+def runScheduled(jobs,options,quantum,slots):
+    """ Runs all jobs in this process on the scheduler; yields their
+        result dictionaries as they finish.
+    """
+    limit = options.get("limit",OPTIONS_DICT["limit"])
+    queue = []
+    results = {}
+    for k, [prog, inp, expected, budget, priority] in enumerate(jobs):
+        res = results[k] = newResult(k,prog,inp)
+        try:
+            if inp!=None:
+                with open(inp,"r") as f:
+                    inf = io.StringIO(f.read())
+            else:
+                inf = io.StringIO()
+        except OSError:
+            res["status"] = "error"
+            res["message"] = OPEN_FILE_ERROR % inp
+            yield res
+            continue
+        make = lambda prog=prog: spare(prog,options)
+        queue.append(Job(k,make,inf,io.StringIO(),
+                         budget if budget!=None else limit,priority))
+    for job in Scheduler(quantum,slots).run(queue):
+        res = results.pop(job.key)
+        if job.vm==None:
+            res["status"] = "load"
+            res["message"] = job.error
+            yield res
+            continue
+        res["count"] = job.count
+        res["time"] = job.time
+        res["peak"] = job.vm.peak()
+        IDLE[res["program"]].append(job.vm)
+        if job.error!=None:
+            res["status"] = "error"
+            res["message"] = job.error
+        yield compare(res,job.outfile,jobs[job.key][2])
+
+def runBatch(jobs,options,nproc,outfile,lanes=False,quantum=None,
+             slots=SLOTS):
+    """ Runs all jobs, the jobs of each program together with 'lanes'
+        or all of them on the scheduler with 'quantum', writing results
+        as they finish; returns the number of jobs with each status.
+    """
+    pool = None
+    if quantum!=None:
+        # one process, however many jobs
+        lanes = False
+        results = runScheduled(jobs,options,quantum,slots)
+    else:
+        if lanes:
+            programs = {}
+            for k in range(len(jobs)):
+                programs.setdefault(jobs[k][0],[]).append((k,jobs[k]))
+            tasks = [(prog,group,options)
+                     for prog, group in programs.items()]
+            run = runLanes
+        else:
+            tasks = [(k,jobs[k],options) for k in range(len(jobs))]
+            run = runJob
+        nproc = min(nproc,max(len(tasks),1))
+        if nproc>1:
+            pool = multiprocessing.Pool(nproc)
+            results = pool.imap_unordered(run,tasks)
+        else:
+            results = map(run,tasks)
+    totals = {}
+    for r in results:
+        for res in (r if lanes else [r]):
+            outfile.write(json.dumps(res)+"\n")
+            outfile.flush()
+            totals[res["status"]] = totals.get(res["status"],0)+1
+    if pool!=None:
+        pool.close()
+        pool.join()
+    return totals
+
+#======================================================================
+# Main
+#======================================================================
+
+
+if __name__ == "__main__":
+
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:],"h",BATCH_OPTIONS)
+    except getopt.GetoptError:
+        Msg(UNRECOGNIZED_OPTION)
+        Msg(Usage,quit=True,code=1)
+
+    options = {}
+    lanes = False
+    quantum = None
+    slots = SLOTS
+    nproc = os.cpu_count() or 1
+    outfile = sys.stdout
+    for o,a in opts:
+        if o=="-h" or o=="--help":
+            Msg(Usage,quit=True)
+        o = o[2:]
+        if o=="nocheck" or o=="jit":
+            options[o] = True
+        elif o=="lanes":
+            lanes = True
+        elif o=="outfile":
+            try:
+                outfile = open(a,"w")
+            except OSError:
+                Msg(OPEN_FILE_ERROR % a,quit=True,code=1)
+        else:
+            try:
+                n = int(a)
+                if n<=0:
+                    raise ValueError
+            except ValueError:
+                Msg(ILLEGAL_OPTION % (o,a),quit=True,code=1)
+            if o=="jobs":
+                nproc = n
+            elif o=="quantum":
+                quantum = n
+            elif o=="slots":
+                slots = n
+            else:
+                options[o] = n
+    if len(args)!=1:
+        Msg(Usage,quit=True,code=1)
+
+    jobs = readManifest(args[0])
+    if lanes and mepa_lanes.numpy==None:
+        Msg(NO_NUMPY)
+    start = time.perf_counter()
+    totals = runBatch(jobs,options,nproc,outfile,lanes,quantum,slots)
+    Msg(BATCH_SUMMARY % (len(jobs),time.perf_counter()-start,
+                         totals.get("ok",0),totals.get("wrong",0),
+                         totals.get("error",0),totals.get("load",0)))
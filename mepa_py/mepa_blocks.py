@@ -0,0 +1,351 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Basic block compiler: the program is split into basic blocks which    #
+# are translated into Python functions with the stack operations        #
+# inlined; execution dispatches once per block. Memory cells are either  #
+# [value,tag] lists, as in mepa_vm.py, or untagged plain values.         #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys
+
+from mepa_defs import *
+from mepa_interp import executeDecoded
+
+# Instructions which end a basic block
+END_BLOCK = [ "jmp", "jmpf", "halt", "retproc", "retprocd", "call",
+              "callpar" ]
+
+# Code templates; {0},{1},{2} are the arguments and {ni} is the address
+# of the next instruction. Lines starting with '?' are type checks,
+# omitted with '--nocheck'.
+TEMPLATES = {
+    "add":     [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]+M[s+1][0],0]" ],
+    "subt":    [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]-M[s+1][0],0]" ],
+    "mult":    [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]*M[s+1][0],0]" ],
+    "divi":    [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]//M[s+1][0],0]" ],
+    "andd":    [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0] and M[s+1][0],0]" ],
+    "orr":     [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0] or M[s+1][0],0]" ],
+    "less":    [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]<M[s+1][0],0]" ],
+    "grt":     [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]>M[s+1][0],0]" ],
+    "eql":     [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]==M[s+1][0],0]" ],
+    "dif":     [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]!=M[s+1][0],0]" ],
+    "leq":     [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]<=M[s+1][0],0]" ],
+    "geq":     [ "?assert M[s-1][1]==0 and M[s][1]==0",
+                 "s -= 1", "M[s] = [M[s][0]>=M[s+1][0],0]" ],
+    "inv":     [ "?assert M[s][1]==0", "M[s] = [-M[s][0],0]" ],
+    "nott":    [ "?assert M[s][1]==0", "M[s] = [1-M[s][0],0]" ],
+    "nop":     [ ],
+    "halt":    [ "return -1, s" ],
+    "read":    [ "s = read(M,s)" ],
+    "writ":    [ "?assert M[s][1]==0", "write('%d\\n' % M[s][0])", "s -= 1" ],
+    "init":    [ "s = -1", "D[0] = 0" ],
+    "cont":    [ "?assert M[s][1]==2", "M[s] = M[M[s][0]]" ],
+    "ldct":    [ "s += 1", "assert len(M)>s", "M[s] = [{0},0]" ],
+    "jmp":     [ "return {0}, s" ],
+    "jmpf":    [ "?assert M[s][1]==0", "s -= 1",
+                 "if not M[s+1][0]:", "    return {0}, s", "return {ni}, s" ],
+    "alloc":   [ "s += {0}" ],
+    "dealloc": [ "s -= {0}" ],
+    "entproc": [ "assert len(D)>{0}", "s += 1", "assert len(M)>s",
+                 "M[s] = [D[{0}-1],2]", "D[{0}] = s+1" ],
+    "retproc": [ "?assert M[s-1][1]==1 and M[s-2][1]==2 and M[s-3][1]==3",
+                 "t = M[s-1][0]", "D[t] = M[s-2][0]", "ni = M[s-3][0]",
+                 "s -= {0}+4",
+                 "while t>1:",
+                 "?    assert M[D[t]-1][1]==2",
+                 "    D[t-1] = M[D[t]-1][0]",
+                 "    t -= 1",
+                 "return ni, s" ],
+    "entprocd": [ "assert len(D)>{0}", "s += 1", "assert len(M)>s",
+                  "M[s] = [D[{0}-1],2]", "M[s-1] = [{0},1]",
+                  "M[s-2] = [D[{0}],2]", "D[{0}] = s+1" ],
+    "retprocd": [ "?assert M[s-1][1]==1 and M[s-2][1]==2 and M[s-3][1]==3",
+                  "D[M[s-1][0]] = M[s-2][0]", "ni = M[s-3][0]",
+                  "s -= {0}+4", "return ni, s" ],
+    "indx":    [ "?assert M[s-1][1]==2 and M[s][1]==0",
+                 "M[s-1] = [M[s-1][0]+M[s][0]*({0}),2]", "s -= 1" ],
+    "ldmv":    [ "?assert M[s][1]==2", "assert len(M)>(s+{0})",
+                 "t = M[s][0]", "M[s:s+{0}] = M[t:t+{0}]", "s += {0}-1" ],
+    "stmv":    [ "?assert M[s-{0}][1]==2",
+                 "t = M[s-{0}][0]", "M[t:t+{0}] = M[s-{0}+1:s+1]", "s -= {0}+1" ],
+    "ldvl":    [ "a = D[{0}]", "assert a!=None",
+                 "s += 1", "M[s] = M[a+({1})]" ],
+    "ldaddr":  [ "a = D[{0}]", "assert a!=None",
+                 "s += 1", "M[s] = [a+({1}),2]" ],
+    "stvl":    [ "a = D[{0}]", "assert a!=None",
+                 "M[a+({1})] = M[s]", "s -= 1" ],
+    "ldvi":    [ "a = D[{0}]", "assert a!=None", "?assert M[a+({1})][1]==2",
+                 "s += 1", "M[s] = M[M[a+({1})][0]]" ],
+    "stvi":    [ "a = D[{0}]", "assert a!=None", "?assert M[a+({1})][1]==2",
+                 "M[M[a+({1})][0]] = M[s]", "s -= 1" ],
+    "entlabl": [ "s = D[{0}]+({1})-1" ],
+    "ldgaddr": [ "assert len(M)>(s+3)",
+                 "M[s+1] = [{0},3]", "M[s+2] = [D[{1}],2]", "M[s+3] = [{1},1]",
+                 "s += 3" ],
+    "call":    [ "assert len(M)>(s+3)",
+                 "M[s+1] = [{ni},3]", "M[s+2] = [D[{1}],2]", "M[s+3] = [{1},1]",
+                 "s += 3", "return {0}, s" ],
+    "callpar": [ "a = D[{0}]", "assert a!=None", "a += {1}",
+                 "assert len(M)>(s+3)",
+                 "?assert M[a][1]==3 and M[a+1][1]==2 and M[a+2][1]==1",
+                 "M[s+1] = [{ni},3]", "M[s+2] = [D[{2}],2]", "M[s+3] = [{2},1]",
+                 "s += 3",
+                 "ni = M[a][0]", "t = M[a+2][0]", "D[t] = M[a+1][0]",
+                 "while t>1:",
+                 "?    assert M[D[t]-1][1]==2",
+                 "    D[t-1] = M[D[t]-1][0]",
+                 "    t -= 1",
+                 "return ni, s" ],
+    }
+
+
+# Templates for untagged memory, where cells hold plain values: there are
+# no type checks and display entries are not checked either (an unset one
+# makes the instruction fail as an illegal value).
+UNTAGGED = {
+    "add":     [ "s -= 1", "M[s] = M[s]+M[s+1]" ],
+    "subt":    [ "s -= 1", "M[s] = M[s]-M[s+1]" ],
+    "mult":    [ "s -= 1", "M[s] = M[s]*M[s+1]" ],
+    "divi":    [ "s -= 1", "M[s] = M[s]//M[s+1]" ],
+    "andd":    [ "s -= 1", "M[s] = M[s] and M[s+1]" ],
+    "orr":     [ "s -= 1", "M[s] = M[s] or M[s+1]" ],
+    "less":    [ "s -= 1", "M[s] = M[s]<M[s+1]" ],
+    "grt":     [ "s -= 1", "M[s] = M[s]>M[s+1]" ],
+    "eql":     [ "s -= 1", "M[s] = M[s]==M[s+1]" ],
+    "dif":     [ "s -= 1", "M[s] = M[s]!=M[s+1]" ],
+    "leq":     [ "s -= 1", "M[s] = M[s]<=M[s+1]" ],
+    "geq":     [ "s -= 1", "M[s] = M[s]>=M[s+1]" ],
+    "inv":     [ "M[s] = -M[s]" ],
+    "nott":    [ "M[s] = 1-M[s]" ],
+    "nop":     [ ],
+    "halt":    [ "return -1, s" ],
+    "read":    [ "s = read(M,s,False)" ],
+    "writ":    [ "write('%d\\n' % M[s])", "s -= 1" ],
+    "init":    [ "s = -1", "D[0] = 0" ],
+    "cont":    [ "M[s] = M[M[s]]" ],
+    "ldct":    [ "s += 1", "assert len(M)>s", "M[s] = {0}" ],
+    "jmp":     [ "return {0}, s" ],
+    "jmpf":    [ "s -= 1", "if not M[s+1]:", "    return {0}, s",
+                 "return {ni}, s" ],
+    "alloc":   [ "s += {0}" ],
+    "dealloc": [ "s -= {0}" ],
+    "entproc": [ "assert len(D)>{0}", "s += 1", "assert len(M)>s",
+                 "M[s] = D[{0}-1]", "D[{0}] = s+1" ],
+    "retproc": [ "t = M[s-1]", "D[t] = M[s-2]", "ni = M[s-3]",
+                 "s -= {0}+4",
+                 "while t>1:",
+                 "    D[t-1] = M[D[t]-1]",
+                 "    t -= 1",
+                 "return ni, s" ],
+    "entprocd": [ "assert len(D)>{0}", "s += 1", "assert len(M)>s",
+                  "M[s] = D[{0}-1]", "M[s-1] = {0}", "M[s-2] = D[{0}]",
+                  "D[{0}] = s+1" ],
+    "retprocd": [ "D[M[s-1]] = M[s-2]", "ni = M[s-3]",
+                  "s -= {0}+4", "return ni, s" ],
+    "indx":    [ "M[s-1] = M[s-1]+M[s]*({0})", "s -= 1" ],
+    "ldmv":    [ "assert len(M)>(s+{0})",
+                 "t = M[s]", "M[s:s+{0}] = M[t:t+{0}]", "s += {0}-1" ],
+    "stmv":    [ "t = M[s-{0}]", "M[t:t+{0}] = M[s-{0}+1:s+1]", "s -= {0}+1" ],
+    "ldvl":    [ "s += 1", "M[s] = M[D[{0}]+({1})]" ],
+    "ldaddr":  [ "s += 1", "M[s] = D[{0}]+({1})" ],
+    "stvl":    [ "M[D[{0}]+({1})] = M[s]", "s -= 1" ],
+    "ldvi":    [ "s += 1", "M[s] = M[M[D[{0}]+({1})]]" ],
+    "stvi":    [ "M[M[D[{0}]+({1})]] = M[s]", "s -= 1" ],
+    "entlabl": [ "s = D[{0}]+({1})-1" ],
+    "ldgaddr": [ "assert len(M)>(s+3)",
+                 "M[s+1] = {0}", "M[s+2] = D[{1}]", "M[s+3] = {1}",
+                 "s += 3" ],
+    "call":    [ "assert len(M)>(s+3)",
+                 "M[s+1] = {ni}", "M[s+2] = D[{1}]", "M[s+3] = {1}",
+                 "s += 3", "return {0}, s" ],
+    "callpar": [ "a = D[{0}]+({1})",
+                 "assert len(M)>(s+3)",
+                 "M[s+1] = {ni}", "M[s+2] = D[{2}]", "M[s+3] = {2}",
+                 "s += 3",
+                 "ni = M[a]", "t = M[a+2]", "D[t] = M[a+1]",
+                 "while t>1:",
+                 "    D[t-1] = M[D[t]-1]",
+                 "    t -= 1",
+                 "return ni, s" ],
+    }
+
+def leaders(DP):
+    """ Instruction addresses which start a basic block. """
+    lead = { 0 }
+    for k in range(len(DP)):
+        name, args = DP[k]
+        if name in END_BLOCK:
+            lead.add(k+1)
+        if args and name in ("jmp", "jmpf", "call", "ldgaddr"):
+            lead.add(args[0])
+    return lead
+
+def blockEnd(DP,start,lead):
+    """ Address following the basic block starting at 'start'. """
+    k = start
+    while k<len(DP):
+        name, args = DP[k]
+        k += 1
+        if name in END_BLOCK or k in lead:
+            break
+    return k
+
+def templates(tagged,check):
+    """ Code templates for tagged or untagged memory; type checks are
+        kept only when 'check' is set.
+    """
+    T = {}
+    for name, lines in (TEMPLATES if tagged else UNTAGGED).items():
+        T[name] = [ t.lstrip('?') for t in lines
+                    if check or not t.startswith('?') ]
+    return T
+
+def genBlock(DP,start,end,tmpl,code,lines):
+    """ Appends to 'code' the source of the function running
+        instructions start..end-1; 'lines' gets, for each source line,
+        the corresponding instruction address.
+    """
+    code.append("def b%d(M,D,s):" % start)
+    lines.append(start)
+    for k in range(start,end):
+        name, args = DP[k]
+        if args==None:
+            body = [ "raise ValueError" ]
+        else:
+            body = tmpl[name]
+        for t in body:
+            code.append("    "+t.format(*(args or ()),ni=k+1))
+            lines.append(k)
+    name = DP[end-1][0]
+    if not name in END_BLOCK or DP[end-1][1]==None:
+        code.append("    return %d, s" % end)
+        lines.append(end-1)
+
+def compileBlocks(DP,ranges,tmpl,ns):
+    """ Compiles at once the blocks given by (start,end) pairs and
+        returns their functions.
+    """
+    code = []
+    lines = [None]   # source lines start at 1
+    for start, end in ranges:
+        genBlock(DP,start,end,tmpl,code,lines)
+    filename = "<mepa blocks %d>" % len(ns["__linemaps__"])
+    ns["__linemaps__"][filename] = lines
+    exec(compile("\n".join(code)+"\n",filename,"exec"),ns)
+    return [ns["b%d" % start] for start, end in ranges]
+
+def faultAddress(tb,ns,default):
+    """ Address of the instruction which raised an exception. """
+    li = default
+    while tb!=None:
+        lines = ns["__linemaps__"].get(tb.tb_frame.f_code.co_filename)
+        if lines!=None:
+            li = lines[tb.tb_lineno]
+        tb = tb.tb_next
+    return li
+
+
+def reader(inf):
+    """ Same as the LEIT of mepa_vm.py, for block code reading from
+        'inf'.
+    """
+    def read(M,s,tagged=True):
+        assert len(M)>s
+        try:
+            v = inf.readInt()
+            s += 1; M[s] = [v,0] if tagged else v
+        except EOFError:
+            raise MepaError("\n"+UNEXPECTED_EOF_INPUT)
+        except:
+            raise MepaError(ILLEGAL_INPUT_VALUE)
+        return s
+    return read
+
+
+def executeBlocks(MP,P,L,msfile,infile,outfile,nocheck):
+    """Execution function running compiled basic blocks. Debugging
+       options and instructions use 'executeDecoded'.
+    """
+    return run(MP,P,L,msfile,infile,outfile,nocheck,True)
+
+def executeUntagged(MP,P,L,msfile,infile,outfile,nocheck):
+    """Execution function running compiled basic blocks over untagged
+       memory, for trusted programs such as the Rascal compiler output.
+    """
+    return run(MP,P,L,msfile,infile,outfile,nocheck,False)
+
+def run(MP,P,L,msfile,infile,outfile,nocheck,tagged):
+    """ Block execution over tagged or untagged memory. """
+    DP = decodeProgram(P)
+    if debugging(DP):
+        return executeDecoded(MP,P,L,msfile,infile,outfile,nocheck)
+
+    i = 0
+    s = -1
+    D = OPTIONS_DICT["displaysize"] * [None]
+    M = OPTIONS_DICT["stacksize"] * [None,None]
+
+    tmpl = templates(tagged,not nocheck)
+    limit = OPTIONS_DICT["limit"]
+    count = 0
+
+    # compile every block once; blocks entered elsewhere, e.g. by
+    # returning to a computed address, are compiled when first reached
+    ns = { "read": reader(infile), "write": outfile.write,
+           "__linemaps__": {} }
+    lead = leaders(DP)
+    ranges = [ (k,blockEnd(DP,k,lead)) for k in sorted(lead) if k<len(DP) ]
+    B = len(DP) * [None]
+    for (start, end), fn in zip(ranges,compileBlocks(DP,ranges,tmpl,ns)):
+        B[start] = (fn, end-start)
+
+    # execution loop
+    while True:
+        li = i
+        try:
+            try:
+                blk = B[i]
+            except:
+                Msg(PROG_END,quit=True,code=1,file=msfile)
+            if blk==None:
+                end = blockEnd(DP,i,lead)
+                blk = B[i] = (compileBlocks(DP,[(i,end)],tmpl,ns)[0], end-i)
+            fn, n = blk
+            if count+n>=limit:
+                # runs only up to the instruction reaching the limit
+                n = limit-count
+                fn = compileBlocks(DP,[(i,i+n)],tmpl,ns)[0]
+            i, s = fn(M,D,s)
+            count += n
+        except MepaError as e:
+            Msg(str(e),quit=True,code=e.code,file=msfile)
+        except AssertionError as e:
+            Msg("\n"+ILLEGAL_ARGUMENT_TYPE,file=msfile)
+            sys.exit(1)
+        except SystemExit as e:
+            sys.exit(1)
+        except:
+            li = faultAddress(sys.exc_info()[2],ns,li)
+            Msg(ILLEGAL_VALUE % li, quit=True,file=msfile)
+        if i<0:      # halt()
+            Msg(EXECUTED_INSTRUCTIONS % count,file=msfile)
+            return -1
+        if count>=limit:
+            Msg(MAXIMUM_INSTRUCTIONS_EXCEEDED % limit,quit=True,code=1,
+                file=msfile)
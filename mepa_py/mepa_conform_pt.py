@@ -0,0 +1,435 @@
+#! /usr/bin/env python3
+
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Conformance of the execution engines (see mepa_engines.py): every      #
+# program runs on every engine, with a few inputs and options, and the   #
+# output, the messages (with the instruction count), both of them on one #
+# stream, and the exit code must be those of the reference engine; the   #
+# engines meant for verified programs only run those. Without program    #
+# files, the programs are those of testes2 and resultados_mepa and a     #
+# corpus of random programs ('--generated'), with procedures,            #
+# parameters, loops, conditionals, input and output, far and negative    #
+# global addresses, levels outside the display and values beyond 64      #
+# bits, and the programs of past divergences ('REGRESSIONS'). The        #
+# throughput of each engine is reported after each group of programs.    #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, os, io, re, time, random, getopt
+
+from mepa_defs import *
+from mepa_engines import ENGINES, REFERENCE_ENGINE, VERIFIED_ENGINES, \
+     runProgram
+from mepa_verify import verifyProgram
+from mepa_io import Input, Output, OUT_BUFFER
+from mepa_obj import isObject, readObject
+
+Usage = """
+Usage:
+
+    [python3] mepa_conform_pt.py [<program file> ...]
+         [-h | --help (False)]
+         [--engines <name,...> (all)]
+         [--reference <name> (eval)]
+         [--generated <integer> (30)]
+         [--seed <integer> (1)]
+"""
+
+# Directories of the default programs, relative to this file
+PROGRAM_DIRS = [ "testes2", "resultados_mepa" ]
+
+# Inputs of the programs, the last one with an illegal value
+INPUTS = [ "5 3 4 2 1 6 7 8 9 10 11 12 13 14 15\n", "0 0 0\n",
+           "12\n3 1 x\n" ]
+
+# Options of each run, besides the defaults; the largest stack has
+# more cells than a segment of the VM memory
+VARIANTS = [ {}, {"limit": 37}, {"stacksize": 20}, {"stacksize": 5000} ]
+
+# Constants and input values of generated programs beyond 64 bits, or
+# at its limits
+BIG_VALUES = [ 2**62, 2**63-1, -2**63, 10**20, -3**50 ]
+
+# Addresses of the far globals of generated programs, beyond the stack
+# of the default options
+FAR_ADDRESSES = [ 1500, 4100, 4500, 6000, 9990 ]
+
+# Negative addresses of generated programs, from the end of the memory
+# (the first cell for the default options) and beyond its beginning
+NEGATIVE_ADDRESSES = [ -1, -2, -40, -1000, -4097 ]
+
+# Levels of accesses of generated programs to display entries never set
+# or outside the display
+DISPLAY_FAULTS = [ 2, 9, 10, 40 ]
+
+# Programs of past divergences, with their inputs and options
+REGRESSIONS = [
+    # access beyond the first segment of the VM memory (mepa_vm.py)
+    ("far_store", "INPP\nAMEM 1\nCRCT 7\nARMZ 0,5000\nCRVL 0,5000\n"
+                  "IMPR\nPARA\nFIM\n", [""],
+     [ {"stacksize": 5000}, {"stacksize": 2600}, {"stacksize": 2400} ]),
+    # values beyond 64 bits (mepa_arrays.py)
+    ("big_values", "INPP\nAMEM 2\nLEIT\nARMZ 0,0\n"
+                   "CRCT 4611686018427387904\nCRCT 4\nMULT\nARMZ 0,1\n"
+                   "CRVL 0,1\nCRVL 0,0\nSOMA\nIMPR\nCRVL 0,0\nINVR\n"
+                   "IMPR\nPARA\nFIM\n",
+     [ "99999999999999999999999\n", "-9223372036854775808\n" ], [ {} ]),
+    # negative address, from the end of the memory (mepa_vm.py)
+    ("negative_address", "INPP\nCRCT 5\nARMZ 0,-1\nCRVL 0,4095\nIMPR\n"
+                         "CRVL 0,-1\nIMPR\nPARA\nFIM\n", [""],
+     [ {}, {"stacksize": 5000} ]),
+    # level outside the display, address beyond the memory (mepa_vm.py)
+    ("display_fault", "INPP\nCRVL 20,0\nIMPR\nPARA\nFIM\n", [""],
+     [ {"stacksize": 5000} ]),
+    ("beyond_ceiling", "INPP\nCRVL 0,10000\nIMPR\nPARA\nFIM\n", [""],
+     [ {"stacksize": 5000} ]),
+    # negative address after a push in a compiled loop (mepa_jit.py)
+    ("negative_in_trace", "INPP\nAMEM 1\nCRCT 1\nARMZ 0,-40\nCRCT 100\n"
+                          "ARMZ 0,0\nL1: NADA\nCRVL 0,0\nCRCT 0\nCMMA\n"
+                          "DSVF L2\nCRCT 2\nCRVL 0,-40\nSOMA\n"
+                          "ARMZ 0,-40\nCRVL 0,0\nCRCT 1\nSUBT\n"
+                          "ARMZ 0,0\nDSVS L1\nL2: NADA\nCRVL 0,-40\n"
+                          "IMPR\nPARA\nFIM\n", [""], [ {} ]),
+    ]
+
+# Messages with instruction counts
+COUNT_RE = [ re.compile(re.escape(m).replace("%d","(\\d+)")) for m in
+             (EXECUTED_INSTRUCTIONS, MAXIMUM_INSTRUCTIONS_EXCEEDED) ]
+
+DEFAULTS = dict(OPTIONS_DICT)
+
+class Tee:
+    """ Text file writing to each of 'files'. """
+
+    def __init__(self,*files):
+        self.files = files
+
+    def write(self,t):
+        for f in self.files:
+            f.write(t)
+
+    def flush(self):
+        pass
+
+def runEngine(name,P,L,text,options):
+    """ Runs program P on engine 'name' with input 'text' and the
+        default options updated by 'options'; returns the exit code,
+        output, messages and both on one stream, the instruction count
+        (None if not known) and the time taken.
+    """
+    OPTIONS_DICT.clear()
+    OPTIONS_DICT.update(DEFAULTS)
+    OPTIONS_DICT.update(options)
+    OPTIONS_DICT["engine"] = name
+    OPTIONS_DICT["silent"] = True
+    mess = io.StringIO()
+    outf = io.StringIO()
+    both = io.StringIO()
+    messages = Tee(mess,both)
+    tracing = debugging(decodeProgram(P))
+    out = Output(Tee(outf,both),1 if tracing else OUT_BUFFER)
+    inp = Input(io.StringIO(text),tracing,out)
+    code = 0
+    start = time.perf_counter()
+    try:
+        try:
+            res = runProgram(P,L,messages,inp,out)
+        finally:
+            out.flush()
+        if res!=-1:
+            Msg(EXECUTION_ERROR % res,quit=True,code=1,file=messages)
+    except SystemExit as e:
+        code = e.code if e.code!=None else 0
+    except Exception as e:
+        code = None
+        messages.write(CONFORM_EXCEPTION % repr(e))
+    t = time.perf_counter()-start
+    count = None
+    for r in COUNT_RE:
+        m = r.search(mess.getvalue())
+        if m:
+            count = int(m.group(1))
+    return (code, outf.getvalue(), mess.getvalue(), both.getvalue()), \
+           count, t
+
+def generateProgram(R):
+    """ Random MEPA program (text) and its input, from random generator
+        R; loops are bounded and procedures only call the ones declared
+        before them. Some programs have a global far above the others
+        or at a negative address, a few accesses have a level with no
+        display entry and some constants and inputs are big values.
+    """
+    nglob = R.randint(1,4)
+    far = [R.choice(FAR_ADDRESSES)] if R.random()<0.3 else []
+    if R.random()<0.15:
+        far.append(R.choice(NEGATIVE_ADDRESSES))
+    lines = []
+    state = { "labels": 0, "loops": 0 }
+
+    def label():
+        state["labels"] += 1
+        return "L%d" % state["labels"]
+
+    def emit(instr,lab=""):
+        lines.append("%-8s%s" % (lab+":" if lab else "",instr))
+
+    def variables(level,nparams,nlocals):
+        V = [(0,g) for g in range(nglob)]+[(0,a) for a in far]
+        if level==1:
+            V += [(1,j) for j in range(nlocals)]
+            V += [(1,-5-j) for j in range(nparams)]
+        return V
+
+    def fault():
+        return R.choice(DISPLAY_FAULTS), R.randint(0,2)
+
+    def expression(V,depth):
+        c = R.random()
+        if depth==0 or c<0.3:
+            if R.random()<0.03:
+                emit("CRCT %d" % R.choice(BIG_VALUES))
+            elif R.random()<0.002:
+                emit("CRVL %d,%d" % fault())
+            elif R.random()<0.4:
+                emit("CRCT %d" % R.randint(-3,9))
+            else:
+                emit("CRVL %d,%d" % R.choice(V))
+        elif c<0.4:
+            expression(V,depth-1)
+            emit("INVR")
+        else:
+            expression(V,depth-1)
+            expression(V,depth-1)
+            emit(R.choice(["SOMA","SOMA","SUBT","MULT","DIVI"]))
+
+    def condition(V,depth):
+        c = R.random()
+        if depth>0 and c<0.2:
+            condition(V,depth-1)
+            condition(V,depth-1)
+            emit(R.choice(["CONJ","DISJ"]))
+        elif depth>0 and c<0.3:
+            condition(V,depth-1)
+            emit("NEGA")
+        else:
+            expression(V,1)
+            expression(V,1)
+            emit(R.choice(["CMME","CMMA","CMIG","CMDG","CMEG","CMAG"]))
+
+    def statements(V,procs,level,depth):
+        for k in range(R.randint(1,4)):
+            c = R.random()
+            target = R.choice([v for v in V if v[1]<0 or v[0]==level] or V)
+            if R.random()<0.002:
+                target = fault()
+            if c<0.25:
+                expression(V,2)
+                emit("ARMZ %d,%d" % target)
+            elif c<0.45:
+                expression(V,2)
+                emit("IMPR")
+            elif c<0.55:
+                emit("LEIT")
+                emit("ARMZ %d,%d" % target)
+            elif c<0.7 and depth>0:
+                other, end = label(), label()
+                condition(V,1)
+                emit("DSVF %s" % other)
+                statements(V,procs,level,depth-1)
+                emit("DSVS %s" % end)
+                emit("NADA",other)
+                statements(V,procs,level,depth-1)
+                emit("NADA",end)
+            elif c<0.82 and depth>0:
+                counter = nglob+state["loops"]
+                state["loops"] += 1
+                test, end = label(), label()
+                emit("CRCT %d" % R.randint(0,12))
+                emit("ARMZ 0,%d" % counter)
+                emit("CRVL 0,%d" % counter,test)
+                emit("CRCT 0")
+                emit("CMMA")
+                emit("DSVF %s" % end)
+                statements(V,procs,level,depth-1)
+                emit("CRVL 0,%d" % counter)
+                emit("CRCT 1")
+                emit("SUBT")
+                emit("ARMZ 0,%d" % counter)
+                emit("DSVS %s" % test)
+                emit("NADA",end)
+            elif procs:
+                name, nparams = R.choice(procs)
+                for j in range(nparams):
+                    expression(V,1)
+                emit("CHPR %s,%d" % (name,level))
+            else:
+                expression(V,1)
+                emit("IMPR")
+
+    procs = []
+    for k in range(R.randint(0,3)):
+        name = "P%d" % k
+        nparams, nlocals = R.randint(0,2), R.randint(0,2)
+        emit("ENPR 1",name)
+        emit("AMEM %d" % nlocals)
+        for j in range(nlocals):
+            emit("CRCT 0")
+            emit("ARMZ 1,%d" % j)
+        statements(variables(1,nparams,nlocals),procs,1,2)
+        emit("DMEM %d" % nlocals)
+        emit("RTPR %d" % nparams)
+        procs.append((name,nparams))
+    body, lines[:] = lines[:], []
+    emit("NADA","MAIN")
+    statements(variables(0,0,0),procs,0,3)
+    main, lines[:] = lines[:], []
+    nvars = nglob+state["loops"]
+    emit("INPP")
+    emit("AMEM %d" % nvars)
+    for g in list(range(nvars))+far:
+        emit("CRCT %d" % R.randint(-2,6))
+        emit("ARMZ 0,%d" % g)
+    emit("DSVS MAIN")
+    lines.extend(body+main)
+    emit("DMEM %d" % nvars)
+    emit("PARA")
+    emit(END_INSTR)
+    text = " ".join(str(R.choice(BIG_VALUES) if R.random()<0.05 else
+                        R.randint(-5,20)) for k in range(R.randint(0,10)))
+    return "\n".join(lines)+"\n", [text+"\n"]
+
+def loadProgram(name):
+    """ [P, L] pair of a program file, text or object. """
+    if isObject(name):
+        with open(name,"rb") as f:
+            P = readObject(f)
+        return P, P.labels
+    with open(name,"r") as f:
+        P, L = readProgram(f)
+    resolveArgs(P,L)
+    return P, L
+
+def checkGroup(title,programs,engines,reference,variants=VARIANTS):
+    """ Runs the (name, P, L, inputs) programs on the engines and on
+        the reference, with each of 'variants' (or the variants after
+        the inputs); returns the number of mismatches. The engines of
+        VERIFIED_ENGINES only run the programs passing the verifier.
+    """
+    stats = dict((e, [0, 0.0, 0]) for e in [reference]+engines)
+    runs = 0
+    for name, P, L, inputs, *more in programs:
+        verified = verifyProgram(decodeProgram(P))==None
+        run = [e for e in engines if verified or not e in VERIFIED_ENGINES]
+        for text in inputs:
+            for options in (more[0] if more else variants):
+                runs += 1
+                expected, count, t = runEngine(reference,P,L,text,options)
+                if count!=None:
+                    stats[reference][0] += count
+                    stats[reference][1] += t
+                for e in run:
+                    got, count, t = runEngine(e,P,L,text,options)
+                    if count!=None:
+                        stats[e][0] += count
+                        stats[e][1] += t
+                    if got!=expected:
+                        stats[e][2] += 1
+                        Msg(CONFORM_MISMATCH % (name,e,options,text.strip()))
+                        for k in range(len(got)):
+                            if got[k]!=expected[k]:
+                                Msg(CONFORM_EXPECTED % (repr(expected[k])[:200],
+                                                       repr(got[k])[:200]))
+                                break
+    Msg(CONFORM_GROUP % (title,len(programs),runs))
+    for e in [reference]+engines:
+        count, t, bad = stats[e]
+        Msg(CONFORM_ENGINE % (e,count,t,count/max(t,1e-9),bad))
+    return sum(stats[e][2] for e in engines)
+
+#======================================================================
+# Main
+#======================================================================
+
+
+if __name__ == "__main__":
+
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:],"h",
+                        ["help","engines=","reference=","generated=","seed="])
+    except getopt.GetoptError:
+        Msg(UNRECOGNIZED_OPTION)
+        Msg(Usage,quit=True,code=1)
+
+    engines = list(ENGINES)
+    reference = REFERENCE_ENGINE
+    generated = 30
+    seed = 1
+    for o,a in opts:
+        if o=="-h" or o=="--help":
+            Msg(Usage,quit=True)
+        elif o=="--engines":
+            engines = a.split(",")
+        elif o=="--reference":
+            reference = a
+        elif o=="--generated" or o=="--seed":
+            try:
+                n = int(a)
+                if n<0:
+                    raise ValueError
+            except ValueError:
+                Msg(ILLEGAL_OPTION % (o[2:],a),quit=True,code=1)
+            if o=="--generated":
+                generated = n
+            else:
+                seed = n
+    for e in engines+[reference]:
+        if not e in ENGINES:
+            Msg(ILLEGAL_OPTION % ("engine",e),quit=True,code=1)
+    engines = [e for e in engines if e!=reference]
+
+    if args:
+        groups = [("", args)]
+    else:
+        here = os.path.dirname(os.path.abspath(__file__))
+        groups = []
+        for d in PROGRAM_DIRS:
+            d = os.path.join(here,"..",d)
+            groups.append((os.path.basename(d),
+                           sorted(os.path.join(d,f) for f in os.listdir(d)
+                                  if f.endswith(".mep") or isObject(f))))
+    bad = 0
+    for title, names in groups:
+        programs = []
+        for name in names:
+            try:
+                P, L = loadProgram(name)
+            except OSError:
+                Msg(OPEN_FILE_ERROR % name,quit=True,code=1)
+            except MepaError as e:
+                Msg(str(e),quit=True,code=1)
+            programs.append((os.path.basename(name),P,L,INPUTS))
+        bad += checkGroup(title or CONFORM_FILES,programs,engines,reference)
+    if generated and not args:
+        R = random.Random(seed)
+        programs = []
+        for k in range(generated):
+            text, inputs = generateProgram(R)
+            P, L = readProgram(io.StringIO(text))
+            resolveArgs(P,L)
+            programs.append((CONFORM_PROGRAM % (seed,k),P,L,inputs))
+        bad += checkGroup(CONFORM_GENERATED,programs,engines,reference)
+    if not args:
+        programs = []
+        for name, text, inputs, variants in REGRESSIONS:
+            P, L = readProgram(io.StringIO(text))
+            resolveArgs(P,L)
+            programs.append((name,P,L,inputs,variants))
+        bad += checkGroup(CONFORM_REGRESSIONS,programs,engines,reference)
+    if bad:
+        Msg(CONFORM_FAILED % bad,quit=True,code=1)
+    Msg(CONFORM_PASSED % reference)
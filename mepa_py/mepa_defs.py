@@ -14,9 +14,9 @@
 #------------------------------------------------------------------------#
 
 
-import sys, traceback, getopt
+import sys, traceback, getopt, gc
 
-if sys.argv[0].endswith("mepa_pt.py"):
+if sys.argv[0].endswith("_pt.py"):
     from mepa_instr_pt import *
     from mepa_strings_pt import *
 else: ## default en
@@ -29,17 +29,27 @@ Usage:
     [python3] mepa.py 
          [-h | --help (False)] [-c | --copyright (False)]
          [--messfile <file name> (stderr)]
-         [--programsize <integer> (500)]
+         [--programsize <integer> (no limit)]
          [--stacksize <integer> (500)]
          [--displaysize <integer> (10)]
          [--limit <integer> (10000)]
          [--infile <file name> (stdin)]
          [--outfile <file name> (stdout)]
          [--progfile <file name> (stdin)]
+         [--engine <vm | eval | decoded | blocks | arrays | untagged | tos | jit> (eval)]
+         [--profile <file name> (none)]
+         [--profiletop <integer> (10)]
+         [--trace <file name> (none)]
+         [--tracesize <integer> (whole execution)]
+         [--checkpoint <file name> (none)]
+         [--restore <file name> (none)]
          [--debug (False)]
          [--nocheck (False)]
          [--silent (False)]
          [--step (False)]
+         [--stats (False)]
+         [--jit (False)]
+         [--verify (False)]
 """
 
 
@@ -47,115 +57,154 @@ OPTIONS_DICT = {
                  "help":        False,
                  "copyright":   False,
                  "messfile":    sys.stderr,
-                 "programsize": 500,
+                 "programsize": 0,
                  "stacksize":   500,
                  "displaysize": 10,
                  "limit":       10000,
                  "infile":      sys.stdin,
                  "outfile":     sys.stdout,
                  "progfile":    sys.stdin,
+                 "engine":      "eval",
+                 "profile":     "",
+                 "profiletop":  10,
+                 "trace":       "",
+                 "tracesize":   0,
+                 "checkpoint":  "",
+                 "restore":     "",
                  "debug":       False,
                  "nocheck":     False,
                  "silent":      False,
                  "step":        False,
+                 "stats":       False,
+                 "jit":         False,
+                 "verify":      False,
                }
                
-BOOL_OPTIONS = [ "help", "copyright", "debug", "nocheck", "silent", "step"]
-INT_OPTIONS =  [ "programsize", "stacksize", "displaysize", "limit"]
+BOOL_OPTIONS = [ "help", "copyright", "debug", "nocheck", "silent", "step",
+                 "stats", "jit", "verify"]
+INT_OPTIONS =  [ "programsize", "stacksize", "displaysize", "limit",
+                 "profiletop", "tracesize"]
 FILE_OPTIONS = [ "messfile", "infile", "outfile", "progfile"]
+STR_OPTIONS =  [ "engine", "profile", "trace", "checkpoint", "restore"]
 
 def appendColumn(s): 
     """ Help to process options requiring args. """
     return s+"="
     
-OPTIONS = BOOL_OPTIONS + list(map(appendColumn,INT_OPTIONS+FILE_OPTIONS))
-OPTIONS_ORDER = FILE_OPTIONS + INT_OPTIONS + BOOL_OPTIONS
+OPTIONS = BOOL_OPTIONS + list(map(appendColumn,INT_OPTIONS+FILE_OPTIONS+STR_OPTIONS))
+OPTIONS_ORDER = FILE_OPTIONS + STR_OPTIONS + INT_OPTIONS + BOOL_OPTIONS
 
-MESS_FILE = sys.stderr
-IN_FILE = sys.stdin
-OUT_FILE = sys.stdout
-PROG_FILE = sys.stdin
-
-def Msg(msg,quit=False,code=0,silent=False,eol=True):
-    """ Error and other messages. """
+def Msg(msg,quit=False,code=0,silent=False,eol=True,file=None):
+    """ Error and other messages, to 'file' (stderr by default). """
     if not silent:
+        if file==None:
+            file = sys.stderr
         if eol:
-            MESS_FILE.write(msg+'\n')
+            file.write(msg+'\n')
         else:
-            MESS_FILE.write(msg)
-        MESS_FILE.flush()
+            file.write(msg)
+        file.flush()
     if quit:
         sys.exit(code)
 
-def UndMsg(s,c,k=1):
-    Msg(s)
-    Msg((len(s)-k)*c)
+def UndMsg(s,c,k=1,file=None):
+    Msg(s,file=file)
+    Msg((len(s)-k)*c,file=file)
     
 def impossible(k):
     Msg(INTERNAL_ERROR % k,quit=True,code=1)
 
 
-def inputProgram():
-    """ Decodes program instructions """
+# Number of arguments of each instruction
+NUM_ARGS = {}
+for n, names in enumerate([INSTR_0, INSTR_1, INSTR_2, INSTR_3]):
+    NUM_ARGS.update(dict.fromkeys(names,n))
+
+class MepaError(Exception):
+    """ Error in a program or during its execution; the message is
+        the one printed by the interpreter, 'code' its exit code.
+    """
+    def __init__(self,msg,code=1):
+        Exception.__init__(self,msg)
+        self.code = code
+
+def inputProgram(f,mess=None):
+    """ Decodes program instructions from file 'f'. """
+    try:
+        return readProgram(f)
+    except MepaError as e:
+        Msg(str(e),quit=True,code=1,file=mess)
+
+def readProgram(f,maxsize=None):
+    """ Decodes program instructions from text file 'f', splitting
+        each line only once; errors are raised as MepaError. Programs
+        reaching 'maxsize' instructions (by default the option
+        'programsize'; 0 for no limit) are refused.
+    """
     
     LABEL_DICT = {}
     P = []
     count = 0
-    maxsize = OPTIONS_DICT["programsize"]
-    #debug = OPTIONS_DICT["debug"]
-    while True:
-        try:
-            line = inline = PROG_FILE.readline()
-        except:
-            Msg(UNEXPECTED_PROGRAM_READING_EXCEPTION,quit=True,code=1)
-        if not line:
-            Msg(UNEXPECTED_EOF_PROGRAM,quit=True,code=1)
-        line = line.strip()
-        if line=="" or line.startswith(';'):
-            continue
-        lab, line = getLabel(line)
-        if lab==None:
-            Msg(ILLEGAL_INSTRUCTION_LABEL % (count,inline),quit=True,code=1)
-        instr, line = getInstr(line)
-        if instr==None:
-            Msg(MISSING_INSTRUCTION_CODE % (count,inline),quit=True,code=1)
-
-        if instr.upper()==END_INSTR:
-            break
-        if count+1>=maxsize:
-            Msg(PROGRAM_TOO_LARGE,quit=True,code=1)
-            
-        try:
-            code = INSTR_DICT[instr.upper()]
-        except:
-            Msg(ILLEGAL_INSTRUCTION % (count,inline),quit=True,code=1)
-            
-        if code in INSTR_0:
-            numargs = 0
-            args = []
-        elif code in INSTR_1:
-            numargs = 1
-        elif code in INSTR_2:
-            numargs = 2
-        elif code in INSTR_3:
-            numargs = 3
-        else:
-            impossible(7)
-            
-        args = getArgs(line,numargs)
-        if args==None:
-            Msg(ILLEGAL_INSTRUCTION_ARGUMENTS % (count,inline),quit=True,code=1)
-        p = [lab, instr, args]
-        p.append(inline[:-1]) # includes original instr line
-        P.append(p)
-        if lab!="":
-            if lab in LABEL_DICT:
-                Msg(REDEFINED_LABEL % (count,inline),quit=True,code=1)
+    if maxsize==None:
+        maxsize = OPTIONS_DICT["programsize"]
+    readline = f.readline
+    append = P.append
+    # the program is made of many small lists which the collector
+    # would go through over and over
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        while True:
+            try:
+                inline = readline()
+            except:
+                raise MepaError(UNEXPECTED_PROGRAM_READING_EXCEPTION)
+            if not inline:
+                raise MepaError(UNEXPECTED_EOF_PROGRAM)
+            t = inline.split()
+            if not t or t[0][0]==';':
+                continue
+            lab = t[0]
+            if lab[-1]==':':
+                lab = lab[:-1]
+                if not (lab.isalnum() and lab[0].isalpha()):
+                    raise MepaError(ILLEGAL_INSTRUCTION_LABEL % (count,inline))
+                k = 1
             else:
-                LABEL_DICT[lab] = count
+                lab = ""
+                k = 0
+            if len(t)<=k:
+                raise MepaError(MISSING_INSTRUCTION_CODE % (count,inline))
+            instr = t[k]
 
-        count += 1
-        
+            code = INSTR_DICT.get(instr.upper())
+            if code==None and instr.upper()==END_INSTR:
+                break
+            if maxsize and count+1>=maxsize:
+                raise MepaError(PROGRAM_TOO_LARGE)
+            if code==None:
+                raise MepaError(ILLEGAL_INSTRUCTION % (count,inline))
+
+            numargs = NUM_ARGS[code]
+            if numargs==0:
+                args = []
+            else:
+                args = t[k+1].split(',') if len(t)>k+1 else []
+                if len(args)<numargs:
+                    raise MepaError(ILLEGAL_INSTRUCTION_ARGUMENTS % (count,inline))
+                del args[numargs:]
+            # includes original instr line
+            append([lab, instr, args, inline[:-1]])
+            if lab!="":
+                if lab in LABEL_DICT:
+                    raise MepaError(REDEFINED_LABEL % (count,inline))
+                else:
+                    LABEL_DICT[lab] = count
+
+            count += 1
+    finally:
+        if collecting:
+            gc.enable()
 
     return [P, LABEL_DICT]
 
@@ -216,10 +265,17 @@ def dumpLabels(L):
     for l in L:
         print("%-5s:  %d" % (l,L[l]))
 
-def fixArgs(P,L):
+def fixArgs(P,L,mess=None):
     """ Replace symbolic labels by Mepa addresses and transform other
         arguments into numbers.
     """
+    try:
+        resolveArgs(P,L)
+    except MepaError as e:
+        Msg(str(e),quit=True,code=1,file=mess)
+
+def resolveArgs(P,L):
+    """ Same as 'fixArgs', raising MepaError. """
     count = 0
     for p in P:
         args = p[2]
@@ -231,7 +287,7 @@ def fixArgs(P,L):
             elif a in L:
                 args[k] = str(L[a])
             else:
-                Msg(ILLEGAL_ARGUMENT % count,quit=True,code=1)
+                raise MepaError(ILLEGAL_ARGUMENT % count)
             count += 1
             
 def makeMepa(P):
@@ -244,6 +300,165 @@ def makeMepa(P):
         MP.append(m)
     return MP
 
+# Debugging instructions; faster engines leave programs which use them,
+# or the debugging options, to the decoded engine
+DEBUG_INSTR = [ "dbug", "step", "dump" ]
+
+def debugging(DP):
+    """ Checks whether decoded program DP needs debugging support. """
+    return OPTIONS_DICT["debug"] or OPTIONS_DICT["step"] or \
+           any(name in DEBUG_INSTR for name, args in DP)
+
+def decodeProgram(P):
+    """ Transforms program into (name, args) pairs with integer
+        arguments; args is None when 'eval' would reject them.
+    """
+    DP = []
+    for p in P:
+        name = INSTR_DICT[p[1].upper()]
+        try:
+            # same literals accepted by eval, e.g. no leading zeros
+            args = tuple(int(a,0) for a in p[2])
+        except ValueError:
+            args = None
+        DP.append((name,args))
+    return DP
+
+# Binary operations, which may appear in superinstructions
+BINARY_INSTR = [ "add", "subt", "mult", "divi", "andd", "orr",
+                 "less", "grt", "eql", "dif", "leq", "geq" ]
+
+# Their Python operations
+OPERATIONS = {
+    "add":  lambda a,b: a+b,
+    "subt": lambda a,b: a-b,
+    "mult": lambda a,b: a*b,
+    "divi": lambda a,b: a//b,
+    "andd": lambda a,b: a and b,
+    "orr":  lambda a,b: a or b,
+    "less": lambda a,b: a<b,
+    "grt":  lambda a,b: a>b,
+    "eql":  lambda a,b: a==b,
+    "dif":  lambda a,b: a!=b,
+    "leq":  lambda a,b: a<=b,
+    "geq":  lambda a,b: a>=b,
+    }
+
+# Superinstructions: name and the sequence of instructions it runs in
+# one dispatch, longest first; "op" stands for any binary operation,
+# whose name becomes an argument.
+FUSIONS = [
+    ("ldvl_ldvl_op_stvl", ["ldvl","ldvl","op","stvl"]),
+    ("ldvl_ldct_op_stvl", ["ldvl","ldct","op","stvl"]),
+    ("ldvl_ldvl_op_jmpf", ["ldvl","ldvl","op","jmpf"]),
+    ("ldvl_ldct_op_jmpf", ["ldvl","ldct","op","jmpf"]),
+    ("ldvl_ldvl_op",      ["ldvl","ldvl","op"]),
+    ("ldvl_ldct_op",      ["ldvl","ldct","op"]),
+    ("ldct_stvl",         ["ldct","stvl"]),
+    ("ldvl_stvl",         ["ldvl","stvl"]),
+    ]
+
+def fuseProgram(DP):
+    """ Superinstruction pass over decoded program DP: returns a list
+        with, for each address, None or the (name, args, length) of
+        the superinstruction starting there, and the number of sites
+        of each superinstruction. Instructions covered by a
+        superinstruction are kept, so jumps into it are still valid.
+    """
+    FP = len(DP) * [None]
+    sites = {}
+    for k in range(len(DP)):
+        for fname, seq in FUSIONS:
+            args = []
+            for j in range(len(seq)):
+                if k+j>=len(DP):
+                    break
+                name, a = DP[k+j]
+                if a==None:
+                    break
+                if seq[j]=="op":
+                    if not name in BINARY_INSTR:
+                        break
+                    args.append(name)
+                elif name==seq[j]:
+                    args.extend(a)
+                else:
+                    break
+            else:
+                FP[k] = (fname, tuple(args), len(seq))
+                sites[fname] = sites.get(fname,0)+1
+                break
+    return FP, sites
+
+# Pre-resolved addressing: memory instructions with a level and an
+# offset which may take their address from elsewhere than the display
+ADDRESS_INSTR = [ "ldvl", "stvl" ]
+
+def levelProgram(DP):
+    """ Lexical level in effect at each address of decoded program DP,
+        following the control flow from address 0: ENPR/ENPD k set it
+        to k and calls continue at the level of the caller; None where
+        it is not known or not unique, e.g. at procedure entries before
+        ENPR or after ENRT.
+    """
+    UNSEEN = -1
+    levels = len(DP) * [UNSEEN]
+    work = []
+    def flow(k,lev):
+        if 0<=k<len(DP) and levels[k]!=lev and levels[k]!=None:
+            levels[k] = lev if levels[k]==UNSEEN else None
+            work.append(k)
+    flow(0,0)
+    for name, args in DP:
+        if name in ("call", "ldgaddr") and args:
+            flow(args[0],None)
+    while work:
+        k = work.pop()
+        name, args = DP[k]
+        lev = levels[k]
+        if args==None or name in ("halt", "retproc", "retprocd"):
+            continue
+        if name in ("entproc", "entprocd"):
+            flow(k+1,args[0])
+        elif name=="entlabl":
+            flow(k+1,None)
+        elif name=="jmp":
+            flow(args[0],lev)
+        elif name=="jmpf":
+            flow(args[0],lev)
+            flow(k+1,lev)
+        else:
+            flow(k+1,lev)
+    return [None if lev==UNSEEN else lev for lev in levels]
+
+def addressProgram(DP):
+    """ Pre-resolved addressing pass over decoded program DP: returns a
+        list with, for each address, None or the (name, args) of the
+        instruction taking its address without the display, and the
+        levels of 'levelProgram'. Accesses of level 0 become '_g'
+        instructions with absolute addresses, as D[0] is 0 from INPP on
+        when the program starts with INPP and has no procedure of level
+        0, unless their offset is negative; accesses of the current
+        level become '_f' instructions with offsets from the base of
+        the current frame.
+    """
+    AP = len(DP) * [None]
+    if not DP or DP[0][0]!="init" or \
+       any(name in ("entproc", "entprocd") and args==(0,)
+           for name, args in DP):
+        return AP, len(DP) * [None]
+    levels = levelProgram(DP)
+    for k in range(len(DP)):
+        name, args = DP[k]
+        if name in ADDRESS_INSTR and args!=None:
+            m, n = args
+            if m==0:
+                if n>=0:
+                    AP[k] = (name+"_g", (n,))
+            elif m==levels[k]:
+                AP[k] = (name+"_f", (n,))
+    return AP, levels
+
 def dumpMepaP(MP):
     for m in MP:
         print(m)
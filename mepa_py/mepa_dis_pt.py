@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Disassembler: MEPA text of a binary object (.mepb, see mepa_obj.py),   #
+# with the Portuguese codes of mepa_instr_pt.py or, with '--lang en',    #
+# the instruction names of the interpreter in capitals (ADD, LDCT, ...). #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, getopt
+
+from mepa_defs import *
+from mepa_obj import readObject, disassemble
+
+Usage = """
+Usage:
+
+    [python3] mepa_dis_pt.py <object file>
+         [-h | --help (False)]
+         [-o | --outfile <file name> (stdout)]
+         [--lang <pt | en> (pt)]
+"""
+
+#======================================================================
+# Main
+#======================================================================
+
+
+if __name__ == "__main__":
+
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:],"ho:",
+                                       ["help","outfile=","lang="])
+    except getopt.GetoptError:
+        Msg(UNRECOGNIZED_OPTION)
+        Msg(Usage,quit=True,code=1)
+    if len(args)!=1:
+        Msg(Usage,quit=True,code=1)
+
+    outfile = sys.stdout
+    mnemonic = None
+    for o,a in opts:
+        if o=="-h" or o=="--help":
+            Msg(Usage,quit=True)
+        elif o=="-o" or o=="--outfile":
+            try:
+                outfile = open(a,"w")
+            except OSError:
+                Msg(OPEN_FILE_ERROR % a,quit=True,code=1)
+        elif o=="--lang":
+            if a=="en":
+                mnemonic = { name: name.upper() for name in INSTR_ALL }
+            elif a!="pt":
+                Msg(ILLEGAL_OPTION % (o[2:],a),quit=True,code=1)
+
+    try:
+        with open(args[0],"rb") as f:
+            obj = readObject(f)
+    except OSError:
+        Msg(OPEN_FILE_ERROR % args[0],quit=True,code=1)
+    except MepaError as e:
+        Msg(str(e),quit=True,code=1)
+    for line in disassemble(obj,mnemonic):
+        outfile.write(line+"\n")
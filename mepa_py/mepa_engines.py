@@ -0,0 +1,95 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Execution engines selected by '--engine'. An engine is a function      #
+#                                                                        #
+#    engine(MP,P,L,msfile,infile,outfile,nocheck)                        #
+#                                                                        #
+# which runs program P (MP made by 'makeMepa', L its labels) with the    #
+# options of OPTIONS_DICT, without type checks if 'nocheck', returns -1  #
+# at PARA, and reports errors with 'Msg' to 'msfile' and 'sys.exit',     #
+# with the messages, instruction counts and exit codes of the reference  #
+# 'mepa_interp.execute' (engine "eval"). New engines are added with      #
+# 'registerEngine', with the options of VM_OPTIONS (profiles, traces,    #
+# checkpoints and compiled loops) they have; 'runProgram' rejects the    #
+# others. mepa_conform_pt.py checks the engines against the reference,   #
+# those of VERIFIED_ENGINES ("untagged") only on programs passing the    #
+# static verifier. The engines "eval", "decoded", "vm" and "jit" run on  #
+# the VM of mepa_vm.py; with '--stats' they report the peak of the       #
+# stack, at PARA and after an execution error.                           #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+from mepa_defs import *
+from mepa_interp import execute, executeDecoded
+from mepa_blocks import executeBlocks, executeUntagged
+from mepa_arrays import executeArrays
+from mepa_tos import executeTos
+from mepa_vm import executeVM
+from mepa_verify import verifyProgram
+from mepa_io import Messages
+
+# Engine of the reference behavior
+REFERENCE_ENGINE = "eval"
+
+# Options that only some engines have
+VM_OPTIONS = ["profile", "trace", "checkpoint", "restore", "jit"]
+
+# Engines by name, in registration order, and their VM_OPTIONS
+ENGINES = {}
+ENGINE_OPTIONS = {}
+
+# Engines behaving as the reference only for programs passing the static
+# verifier, as they do not check types
+VERIFIED_ENGINES = []
+
+def registerEngine(name,fn,options=(),verified=False):
+    """ Makes 'fn' available as '--engine name', with 'options' of
+        VM_OPTIONS; 'verified' if it is only meant for programs passing
+        the static verifier.
+    """
+    ENGINES[name] = fn
+    ENGINE_OPTIONS[name] = options
+    if verified:
+        VERIFIED_ENGINES.append(name)
+
+def executeJit(MP,P,L,msfile,infile,outfile,nocheck):
+    """ 'executeVM' with hot loops compiled, as with '--jit'. """
+    return executeVM(MP,P,L,msfile,infile,outfile,nocheck,jit=True)
+
+registerEngine("vm",executeVM,VM_OPTIONS)
+registerEngine("eval",execute,VM_OPTIONS[:-1])
+registerEngine("decoded",executeDecoded,VM_OPTIONS[:-1])
+registerEngine("blocks",executeBlocks)
+registerEngine("arrays",executeArrays)
+registerEngine("untagged",executeUntagged,verified=True)
+registerEngine("tos",executeTos)
+registerEngine("jit",executeJit,VM_OPTIONS)
+
+def runProgram(P,L,msfile,infile,outfile):
+    """ Runs program P, with labels L and arguments resolved, on the
+        engine of OPTIONS_DICT; returns the engine result. Options the
+        engine does not have are an error. Programs passing the static
+        verifier run without type checks, except on the reference
+        engine, which always checks.
+    """
+    name = OPTIONS_DICT["engine"]
+    for o in VM_OPTIONS:
+        if OPTIONS_DICT[o] and not o in ENGINE_OPTIONS[name]:
+            Msg(ENGINE_OPTION % (o,name),quit=True,code=1,file=msfile)
+    MP = makeMepa(P)
+    # messages after the output written so far
+    msfile = Messages(msfile,outfile)
+    reference = name==REFERENCE_ENGINE
+    nocheck = OPTIONS_DICT["nocheck"]
+    if OPTIONS_DICT["verify"] or not (nocheck or reference):
+        diag = verifyProgram(decodeProgram(P))
+        if OPTIONS_DICT["verify"]:
+            Msg(diag if diag!=None else
+                VERIFIED_CHECKED if reference else VERIFIED,file=msfile)
+        if diag==None and not reference:
+            nocheck = True
+    return ENGINES[name](MP,P,L,msfile,infile,outfile,nocheck)
@@ -53,6 +53,8 @@ INSTR_DICT = {
           "DMEM": "dealloc",
           "ENPR": "entproc",
           "RTPR": "retproc",
+          "ENPD": "entprocd",
+          "RTPD": "retprocd",
           "INDX": "indx",
           "CRVM": "ldmv",
           "ARVM": "stmv",
@@ -107,6 +109,8 @@ INSTR_1 = [
           "dealloc",
           "entproc",
           "retproc",
+          "entprocd",
+          "retprocd",
           "indx",
           "ldmv",
           "stmv",
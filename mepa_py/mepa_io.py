@@ -0,0 +1,199 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Buffered input and output for LEIT and IMPR.                           #
+#                                                                        #
+# Input is split into tokens a large chunk at a time (through 'mmap' for #
+# regular files) and consumed by index; lines are handled as by          #
+# 'readline', including the loss of the last character of a final line   #
+# without end of line. Pipes, terminals and sockets, and any input while #
+# debugging, are read one line at a time, so that no more input is       #
+# awaited than needed, and the pending output is written before each     #
+# such read.                                                             #
+#                                                                        #
+# Output is collected and written in bulk, and flushed when execution    #
+# stops, also after errors. Messages through 'Messages' write the        #
+# pending output first, so that both keep their order when they go to    #
+# the same place.                                                        #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import os, stat, mmap
+
+# Input characters decoded at a time (whole lines are taken)
+CHUNK = 1<<16
+
+# Output values kept before writing
+OUT_BUFFER = 4096
+
+class InputPending(Exception):
+    """ No input token yet, but more may come (see mepa_async.py). """
+    pass
+
+class Input:
+    """ Integer tokens from text file 'f', read by lines if 'lines';
+        Output 'out' is flushed before waiting for a line.
+    """
+
+    def __init__(self,f,lines=False,out=None):
+        self.f = f
+        self.out = out
+        self.tokens = []
+        self.pos = 0
+        self.lines = 0         # lines already split into tokens
+        self.carry = []        # incomplete line
+        self.eof = False
+        self.map = None
+        self.mpos = 0
+        self.fill = self.fillLine
+        if lines:
+            return
+        try:
+            st = os.fstat(f.fileno())
+        except (AttributeError, OSError, ValueError):
+            # in memory: nothing to wait for
+            self.fill = self.fillChunk
+            return
+        if not stat.S_ISREG(st.st_mode):
+            # pipes, terminals and sockets
+            return
+        self.fill = self.fillChunk
+        if hasattr(f,"encoding") and st.st_size>0:
+            try:
+                if f.tell()==0:
+                    self.map = mmap.mmap(f.fileno(),0,
+                                         access=mmap.ACCESS_READ)
+                    self.fill = self.fillMap
+            except (OSError, ValueError):
+                pass
+
+    def readInt(self):
+        """ Next integer: EOFError at the end of the input, ValueError
+            for an illegal token.
+        """
+        if self.pos>=len(self.tokens):
+            self.fill()
+        t = self.tokens[self.pos]
+        self.pos += 1
+        return int(t)
+
+    def unread(self):
+        """ Gives back the last token read. """
+        self.pos -= 1
+
+    def setTokens(self,t):
+        self.tokens = t
+        self.pos = 0
+
+    def pending(self):
+        """ Tokens not consumed and number of lines read, for
+            'restore'.
+        """
+        return [self.tokens[self.pos:], self.lines]
+
+    def restore(self,tokens,lines):
+        """ Continues the input of another run which left 'tokens' of
+            its first 'lines' lines; those lines are skipped.
+        """
+        for k in range(lines):
+            if self.map!=None:
+                j = self.map.find(b"\n",self.mpos)
+                self.mpos = len(self.map) if j<0 else j+1
+            elif not self.f.readline():
+                break
+        self.lines = lines
+        self.setTokens(list(tokens))
+
+    def fillLine(self):
+        if self.out!=None:
+            self.out.flush()
+        while self.pos>=len(self.tokens):
+            line = self.f.readline()
+            if not line:
+                raise EOFError
+            self.lines += 1
+            self.setTokens(line[:-1].strip().split())
+
+    def fillChunk(self):
+        while self.pos>=len(self.tokens):
+            if self.eof:
+                raise EOFError
+            data = self.f.read(CHUNK)
+            if not data:
+                # final line without end of line
+                self.eof = True
+                line = "".join(self.carry)
+                if line:
+                    self.lines += 1
+                self.setTokens(line[:-1].split())
+                self.carry = []
+                continue
+            k = data.rfind("\n")
+            if k<0:
+                self.carry.append(data)
+                continue
+            self.lines += data.count("\n",0,k)+1
+            self.carry.append(data[:k])
+            self.setTokens("".join(self.carry).split())
+            self.carry = [data[k+1:]]
+
+    def fillMap(self):
+        m = self.map
+        while self.pos>=len(self.tokens):
+            if self.mpos>=len(m):
+                raise EOFError
+            k = m.find(b"\n",self.mpos+CHUNK)
+            if k<0:
+                text = m[self.mpos:].decode(self.f.encoding)
+                self.mpos = len(m)
+                if not text.endswith("\n"):
+                    self.lines += 1
+                    text = text[:-1]
+            else:
+                text = m[self.mpos:k+1].decode(self.f.encoding)
+                self.mpos = k+1
+            self.lines += text.count("\n")
+            self.setTokens(text.split())
+
+class Output:
+    """ Bulk writes to text file 'f'; 'size' is the number of values
+        kept before writing, 1 for terminals.
+    """
+
+    def __init__(self,f,size=OUT_BUFFER):
+        self.f = f
+        self.buf = []
+        try:
+            self.size = 1 if f.isatty() else size
+        except (AttributeError, ValueError):
+            self.size = size
+
+    def write(self,t):
+        self.buf.append(t)
+        if len(self.buf)>=self.size:
+            self.flush()
+
+    def flush(self):
+        if self.buf:
+            self.f.write("".join(self.buf))
+            self.buf = []
+        self.f.flush()
+
+class Messages:
+    """ Message file 'f' of an execution writing to Output 'out': the
+        pending output is written before each message.
+    """
+
+    def __init__(self,f,out):
+        self.f = f
+        self.out = out
+
+    def write(self,t):
+        self.out.flush()
+        self.f.write(t)
+
+    def flush(self):
+        self.f.flush()
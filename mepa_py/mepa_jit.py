@@ -0,0 +1,350 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Tracing compiler for the hot loops of a VM ('--jit').                  #
+#                                                                        #
+# Backward DSVS jumps count the iterations of their loop; once a loop   #
+# is hot, the jump stops the interpreter (returns -1) and the VM calls   #
+# 'enter'. The next iteration is executed and recorded instruction by    #
+# instruction, following calls into procedures, and the recorded path  #
+# is compiled into a Python function running whole iterations with the   #
+# stack operations inlined. Every DSVF and every return checks that the  #
+# direction taken is the recorded one (a guard); otherwise the function  #
+# returns to the interpreter at the address taken.                       #
+#                                                                        #
+# An instruction which fails inside a trace is executed again by the     #
+# interpreter from the state before it, which reports the error. Paths   #
+# reading input, with inner loops or longer than MAX_TRACE are not       #
+# compiled, and traces leaving too early on average are dropped.         #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys
+
+from mepa_defs import *
+
+# Backward jumps making a loop hot
+HOT_LOOP = 50
+
+# Longest recorded path
+MAX_TRACE = 400
+
+# Entries after which a trace must average two iterations per entry
+TRACE_CHECK = 64
+
+# Instructions ending a recording without being executed; 'read' is the
+# only one which may raise MepaError
+UNTRACED = [ "halt", "read" ] + DEBUG_INSTR
+
+# Instructions whose next address is only known when they run
+COMPUTED_JUMP = [ "retproc", "retprocd", "callpar" ]
+
+# Python expressions of the binary operations
+EXPRESSIONS = {
+    "add":  "%s+%s",
+    "subt": "%s-%s",
+    "mult": "%s*%s",
+    "divi": "%s//%s",
+    "andd": "%s and %s",
+    "orr":  "%s or %s",
+    "less": "%s<%s",
+    "grt":  "%s>%s",
+    "eql":  "%s==%s",
+    "dif":  "%s!=%s",
+    "leq":  "%s<=%s",
+    "geq":  "%s>=%s",
+    }
+
+class Jit:
+    """ Loop traces of 'vm', for its loaded program. """
+
+    def __init__(self,vm):
+        self.vm = vm
+        self.AP, levels = addressProgram(vm.names)
+        self.hits = {}
+        self.sites = {}        # backward jumps: address -> loop head
+        self.traces = {}       # loop head -> (function, length)
+        self.entries = {}
+        self.iterations = {}
+        self.compiled = 0
+        self.runs = 0
+        self.steps = 0
+
+    def install(self):
+        """ Replaces the backward DSVS of 'vm.FP' by 'jump'. """
+        FP = self.vm.FP
+        for k, (name, args) in enumerate(self.vm.names):
+            if name=="jmp" and args!=None and 0<=args[0]<=k:
+                p = args[0]
+                self.hits[p] = 0
+                self.sites[k] = p
+                FP[k] = (self.jump, (p,), 1, 1)
+
+    def jump(self,p):
+        """ Backward jump to loop head 'p'; -1 once it is hot. """
+        h = self.hits[p]+1
+        self.hits[p] = h
+        if h<HOT_LOOP:
+            return p
+        return -1
+
+    def drop(self,p):
+        """ Loop 'p' goes back to the interpreter. """
+        self.traces.pop(p,None)
+        FP = self.vm.FP
+        DP = self.vm.DP
+        for k in [k for k in self.sites if self.sites[k]==p]:
+            FP[k] = DP[k]
+            del self.sites[k]
+
+    def enter(self,k,count,near):
+        """ Runs the loop of the hot jump at 'k' after it; returns the
+            address to go on from and the instruction count.
+        """
+        p = self.sites[k]
+        t = self.traces.get(p)
+        if t==None:
+            i, count = self.record(p,count,near)
+        else:
+            vm = self.vm
+            fn, n = t
+            i, vm.s, c = fn(vm.M,vm.D,vm.s,count,near)
+            self.runs += 1
+            self.steps += c-count
+            e = self.entries[p] = self.entries[p]+1
+            it = self.iterations[p] = self.iterations[p]+(c-count)//n
+            if e>=TRACE_CHECK:
+                if it<2*e:
+                    self.drop(p)
+                self.entries[p] = self.iterations[p] = 0
+            count = c
+        F = self.vm.frames
+        if F and 0<=i<len(F):
+            self.vm.fp = self.vm.D[F[i]]
+        return i, count
+
+    def record(self,p,count,near):
+        """ Executes one iteration from 'p', compiling its path if it
+            comes back to 'p'.
+        """
+        vm = self.vm
+        DP = vm.DP
+        path = []
+        i = p
+        while count<near:
+            if not 0<=i<len(DP) or len(path)>=MAX_TRACE:
+                break
+            name = vm.names[i][0]
+            if name in UNTRACED:
+                break
+            fn, args, step, n = DP[i]
+            k = i
+            try:
+                r = fn(*args)
+            except Exception:
+                # executed again by the interpreter
+                return k, count
+            i = k+1 if r is None else r
+            count += 1
+            path.append((k,i))
+            if i==p:
+                self.compile(p,path)
+                return i, count
+            if name in ("jmp", "jmpf") and i<=k:
+                break     # inner loop
+        else:
+            return i, count
+        self.drop(p)
+        return i, count
+
+    def compile(self,p,path):
+        vm = self.vm
+        ns = { "vm": vm, "exc_info": sys.exc_info }
+        code, lines = genTrace(vm.names,self.AP,vm.DP,path,vm.check,
+                               len(vm.D),ns)
+        ns["lines"] = lines
+        ns["addrs"] = [k for k, i in path]
+        exec(compile("\n".join(code)+"\n","<mepa trace %d>" % p,"exec"),ns)
+        self.traces[p] = (ns["trace"], len(path))
+        self.entries[p] = self.iterations[p] = 0
+        self.compiled += 1
+
+def genTrace(names,AP,DP,path,check,displaysize,ns):
+    """ Source of the function running the iterations of 'path', a list
+        of (address, next address) pairs, and for each of its lines the
+        position in 'path' of its instruction and the offset of 's'
+        there (None outside the loop). Handlers called from the trace
+        are added to 'ns'.
+    """
+    code = [ "def trace(M,D,s,count,near):",
+             "    write = vm.outf.write",
+             "    stop = near-%d" % len(path),
+             "    try:",
+             "        while count<stop:" ]
+    lines = (len(code)+1) * [None]
+    d = 0          # the stack top is s+d
+    known = {}     # offset -> (cell, value, tag known to be 0)
+    dvars = {}     # level -> variable with D[level]
+    # negative addresses leave the trace (see 'VM.far'): lines checking
+    # the lowest value of 's', from where it is set, and of each display
+    # variable, for the cells accessed from them
+    guards = []    # [variable, line, lowest value]
+    low = {}       # variable -> its entry of 'guards'
+
+    def emit(t,j,off):
+        code.append(12*" "+t)
+        lines.append((j,off))
+
+    def guard(v,j,off):
+        emit("pass",j,off)
+        low[v] = [v, len(code)-1, -1 if v=="s" else 0]
+        guards.append(low[v])
+
+    def lowest(v,b):
+        low[v][2] = max(low[v][2],b)
+
+    def at(q):
+        lowest("s",-q)
+        return "M[s%+d]" % q if q else "M[s]"
+
+    def cell(q):
+        return known[q][0] if q in known and known[q][0] else at(q)
+
+    def value(q):
+        return known[q][1] if q in known else at(q)+"[0]"
+
+    def integer(q,j,off):
+        if check and not (q in known and known[q][2]):
+            emit("assert %s[1]==0" % cell(q),j,off)
+
+    def address(k,m,n,j,off):
+        if AP[k]!=None and AP[k][0].endswith("_g"):
+            return "%d" % AP[k][1][0]
+        if not m in dvars:
+            dvars[m] = "d%d" % j
+            emit("%s = D[%d]" % (dvars[m],m),j,off)
+            guard(dvars[m],j,off)
+        lowest(dvars[m],-n)
+        return "%s%+d" % (dvars[m],n)
+
+    def popto(top):
+        for q in list(known):
+            if q>top:
+                del known[q]
+        return top
+
+    guard("s",0,0)
+    for j, (k, nxt) in enumerate(path):
+        name, args = names[k]
+        off = d
+        lowest("s",-1-d)
+        if name=="ldct":
+            d += 1
+            emit("%s = [%d,0]" % (at(d),args[0]),j,off)
+            known[d] = (None, "(%d)" % args[0] if args[0]<0 else
+                              "%d" % args[0], True)
+        elif name=="ldvl":
+            a = address(k,args[0],args[1],j,off)
+            d += 1
+            c = "c%d" % j
+            emit("%s = %s = M[%s]" % (at(d),c,a),j,off)
+            known[d] = (c, c+"[0]", False)
+        elif name=="stvl":
+            a = address(k,args[0],args[1],j,off)
+            emit("M[%s] = %s" % (a,cell(d)),j,off)
+            d -= 1
+            known.clear()       # it may write the stack
+        elif name in EXPRESSIONS:
+            integer(d-1,j,off)
+            integer(d,j,off)
+            v = "v%d" % j
+            z = "z%d" % j
+            emit("%s = %s" % (v,EXPRESSIONS[name] % (value(d-1),value(d))),
+                 j,off)
+            emit("%s = %s = [%s,0]" % (at(d-1),z,v),j,off)
+            d = popto(d-1)
+            known[d] = (z, v, True)
+        elif name in ("inv", "nott"):
+            integer(d,j,off)
+            v = "v%d" % j
+            z = "z%d" % j
+            emit("%s = %s%s" % (v,"-" if name=="inv" else "1-",value(d)),
+                 j,off)
+            emit("%s = %s = [%s,0]" % (at(d),z,v),j,off)
+            known[d] = (z, v, True)
+        elif name=="jmpf":
+            integer(d,j,off)
+            if nxt==k+1:
+                emit("if not %s:" % value(d),j,off)
+                emit("    return %d, s%+d, count+%d" % (args[0],d-1,j+1),j,off)
+            else:
+                emit("if %s:" % value(d),j,off)
+                emit("    return %d, s%+d, count+%d" % (k+1,d-1,j+1),j,off)
+            d = popto(d-1)
+        elif name in ("jmp", "nop"):
+            pass
+        elif name=="alloc":
+            d += args[0]
+            popto(d)
+        elif name=="dealloc":
+            d = popto(d-args[0])
+        elif name=="writ":
+            integer(d,j,off)
+            emit("write('%%d\\n' %% %s)" % value(d),j,off)
+            d = popto(d-1)
+        elif name=="call":
+            p, lev = args
+            emit("%s = [%d,3]" % (at(d+1),k+1),j,off)
+            emit("%s = [D[%d],2]" % (at(d+2),lev),j,off)
+            emit("%s = [%d,1]" % (at(d+3),lev),j,off)
+            for q in (d+1, d+2, d+3):
+                known.pop(q,None)
+            d += 3
+        elif name=="ldaddr":
+            a = address(k,args[0],args[1],j,off)
+            d += 1
+            emit("%s = [%s,2]" % (at(d),a),j,off)
+            known.pop(d,None)
+        elif name=="entproc" and 0<args[0]<displaysize:
+            lev = args[0]
+            d += 1
+            emit("%s = [D[%d],2]" % (at(d),lev-1),j,off)
+            emit("D[%d] = s%+d" % (lev,d+1),j,off)
+            known.pop(d,None)
+            dvars.pop(lev,None)
+        else:
+            # the VM handler, with the registers in the VM
+            if d:
+                emit("s += %d" % d,j,off)
+            d = 0
+            known.clear()
+            dvars.clear()
+            h = "h%d" % j
+            fn, hargs, step, n = DP[k]
+            ns[h] = fn
+            call = "%s(%s)" % (h,",".join("%d" % a for a in hargs))
+            emit("vm.s = s",j,0)
+            if name in COMPUTED_JUMP:
+                emit("r = %s" % call,j,0)
+                emit("s = vm.s",j,0)
+                emit("if r!=%d:" % nxt,j,0)
+                emit("    return r, s, count+%d" % (j+1),j,0)
+            else:
+                emit(call,j,0)
+                emit("s = vm.s",j,0)
+            guard("s",j+1,0)
+    if d:
+        emit("s += %d" % d,len(path)-1,d)
+    lowest("s",-1-d)
+    emit("count += %d" % len(path),len(path)-1,0)
+    for v, line, b in guards:
+        if b>-1 or v!="s":
+            code[line] = 12*" "+"if %s<%d: raise IndexError" % (v,b)
+    code += [ "        return %d, s, count" % path[0][0],
+              "    except Exception:",
+              "        j, off = lines[exc_info()[2].tb_lineno]",
+              "        return addrs[j], s+off, count+j" ]
+    return code, lines
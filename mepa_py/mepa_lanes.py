@@ -0,0 +1,579 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Lock-step execution of one program over many inputs ('lanes').        #
+#                                                                        #
+# The memory is a pair of NumPy arrays of shape (cells, lanes), values   #
+# and tags, where tag -1 is an uninitialized cell. Lanes at the same     #
+# address with the same 's' and display form a group, whose             #
+# instructions run on all its lanes at once. A DSVF going both ways, or  #
+# a return to different places, splits the group; groups reaching the   #
+# same address, 's' and display merge again. The group with the highest #
+# 's', then the lowest address, runs first, so that lanes still in a     #
+# loop or in a branch catch up with those waiting after it.              #
+#                                                                        #
+# A lane goes on in the scalar VM of mepa_vm.py from the state before an #
+# instruction whenever the instruction would fail, is not executed here, #
+# or could produce a value of 62 bits or more; before reaching its       #
+# instruction limit; and when its group is left with fewer than          #
+# MIN_LANES lanes or there are more than MAX_GROUPS groups. Outputs,     #
+# instruction counts and errors are those of running each input alone.   #
+#                                                                        #
+# Without NumPy every lane runs in the scalar VM.                        #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+from mepa_defs import *
+from mepa_io import Input, Output
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Smallest group kept in lock-step
+MIN_LANES = 8
+
+# Groups kept in lock-step
+MAX_GROUPS = 16
+
+# Values are kept below BOUND in absolute value, so that int64
+# operations cannot overflow
+BOUND = 1<<62
+
+BINARY_OPS = [ "add", "subt", "mult", "divi", "andd", "orr", "less", "grt",
+               "eql", "dif", "leq", "geq" ]
+
+class Group:
+    """ Lanes at address 'i' with stack top 's' and display 'D'.
+        'lanes' is a sorted array of lane numbers and 'idx' indexes
+        them (a slice when contiguous); 'n' instructions were executed
+        and not yet added to the lane counts, 'budget' instructions
+        make a lane reach the limit.
+    """
+
+    def __init__(self,i,s,D,lanes):
+        self.i = i
+        self.s = s
+        self.D = D
+        self.n = 0
+        self.budget = 0
+        self.setLanes(lanes)
+
+    def setLanes(self,lanes):
+        self.lanes = lanes
+        a = int(lanes[0]);  b = int(lanes[-1])
+        self.idx = slice(a,b+1) if b-a+1==len(lanes) else lanes
+
+class Lanes:
+    """ Runs the program loaded in 'vm', also used for the lanes which
+        leave the lock-step, once for each of 'infiles' writing to the
+        corresponding 'outfiles'.
+    """
+
+    def __init__(self,vm,infiles,outfiles):
+        self.vm = vm
+        self.outputs = [Output(f) for f in outfiles]
+        self.inputs = [Input(f,vm.tracing,out)
+                       for f, out in zip(infiles,self.outputs)]
+        self.results = len(infiles) * [None]
+        self.size = vm.ceiling
+        self.limit = vm.limit
+        self.check = vm.check
+        self.groups = []
+        self.code = []
+        for k, (name, args) in enumerate(vm.names):
+            if args==None:
+                self.code.append((None, ()))
+            elif name in BINARY_OPS:
+                self.code.append((self.binop, (name,)))
+            elif name in ("inv", "nott"):
+                self.code.append((self.unop, (name=="inv",)))
+            elif name=="call":
+                self.code.append((self.call, args+(k+1,)))
+            elif name in LANE_INSTR:
+                self.code.append((getattr(self,name), args))
+            else:
+                self.code.append((None, ()))
+
+    def run(self):
+        """ Runs all lanes; returns their (count, message, peak)
+            results, message "" for no error.
+        """
+        vm = self.vm
+        n = len(self.inputs)
+        if numpy==None or vm.tracing or n<MIN_LANES:
+            for k in range(n):
+                self.scalar(k,None)
+            return self.results
+        self.V = numpy.zeros((self.size,n),numpy.int64)
+        self.T = numpy.full((self.size,n),-1,numpy.int8)
+        self.C = numpy.zeros(n,numpy.int64)
+        g = Group(0,-1,vm.displaysize*[None],numpy.arange(n))
+        self.flush(g)
+        self.groups = [g]
+        with numpy.errstate(all="ignore"):
+            while self.groups:
+                self.regroup()
+                if len(self.groups)>MAX_GROUPS:
+                    self.leave(min(self.groups,key=lambda h: len(h.lanes)))
+                    continue
+                g = max(self.groups,key=lambda h: (h.s,-h.i))
+                if len(g.lanes)<MIN_LANES:
+                    self.leave(g)
+                else:
+                    self.execute(g)
+        used = self.T!=-1
+        peaks = numpy.where(used.any(0),self.size-used[::-1].argmax(0),0)
+        for k in range(n):
+            if self.results[k]==None:
+                self.outputs[k].flush()
+                self.results[k] = (int(self.C[k]), "", int(peaks[k]))
+        return self.results
+
+    def execute(self,g):
+        """ Runs group 'g' up to a jump, a split or its end. """
+        others = {}
+        for h in self.groups:
+            if h is not g:
+                others.setdefault(h.i,[]).append(h)
+        code = self.code
+        while True:
+            if g.i in others:
+                self.merge(g,others[g.i])
+            i = g.i
+            if not 0<=i<len(code) or code[i][0]==None or g.n+1>=g.budget:
+                self.leave(g)
+                return
+            fn, args = code[i]
+            g.n += 1
+            if fn(g,*args):
+                return
+
+    # Groups and lanes
+
+    def flush(self,g):
+        """ Adds the instructions executed by 'g' to its lane counts. """
+        C = self.C
+        if g.n:
+            C[g.idx] += g.n
+            g.n = 0
+        g.budget = self.limit-int(C[g.idx].max())
+
+    def merge(self,g,waiting):
+        """ Moves to 'g' the lanes of the groups in 'waiting' with its
+            state.
+        """
+        for h in list(waiting):
+            if h.s==g.s and h.D==g.D:
+                self.flush(h)
+                self.flush(g)
+                g.setLanes(numpy.union1d(g.lanes,h.lanes))
+                self.groups.remove(h)
+                waiting.remove(h)
+                self.flush(g)
+
+    def regroup(self):
+        """ Merges the groups with the same state. """
+        states = {}
+        for h in list(self.groups):
+            key = (h.i,h.s,tuple(h.D))
+            if key in states:
+                self.merge(states[key],[h])
+            else:
+                states[key] = h
+
+    def split(self,g,mask):
+        """ New group with the lanes of 'g' selected by 'mask', at the
+            same state; the current instruction counts for both.
+        """
+        self.flush(g)
+        h = Group(g.i,g.s,g.D[:],g.lanes[mask])
+        g.setLanes(g.lanes[~mask])
+        self.flush(g)
+        self.flush(h)
+        self.groups.append(h)
+        return h
+
+    def evict(self,g,mask=None):
+        """ The lanes of 'g' selected by 'mask' (all by default) go on
+            in the scalar VM, from the current instruction; True if
+            none is left.
+        """
+        if mask is None or mask.all():
+            self.fallback(g,g.lanes,g.n-1)
+            self.groups.remove(g)
+            return True
+        self.fallback(g,g.lanes[mask],g.n-1)
+        self.flush(g)
+        g.setLanes(g.lanes[~mask])
+        self.flush(g)
+        return False
+
+    def leave(self,g):
+        """ All lanes of 'g' go on in the scalar VM. """
+        self.fallback(g,g.lanes,g.n)
+        self.groups.remove(g)
+
+    def fallback(self,g,lanes,n):
+        V = self.V;  T = self.T;  C = self.C
+        for k in lanes.tolist():
+            t = T[:,k]
+            used = numpy.flatnonzero(t!=-1)
+            top = int(used[-1])+1 if len(used) else 0
+            M = [None if tag<0 else [v,tag] for v, tag in
+                 zip(V[:top,k].tolist(),t[:top].tolist())]
+            self.scalar(k,(g.i,g.s,int(C[k])+n,M,g.D[:]))
+
+    def scalar(self,k,state):
+        """ Runs lane 'k' in the VM, from the start or from 'state'
+            (arguments of 'VM.assign').
+        """
+        vm = self.vm
+        try:
+            if state==None:
+                count = vm.run(self.inputs[k],self.outputs[k])
+            else:
+                vm.assign(*state)
+                count = vm.resume(self.inputs[k],self.outputs[k])
+            message = ""
+        except MepaError as e:
+            count = vm.count
+            message = str(e).strip()
+        self.results[k] = (count, message, vm.peak())
+
+    # Instructions: every check happens before the state changes; a
+    # true result ends the run of the group
+
+    def row(self,a):
+        return 0<=a<self.size
+
+    def integers(self,t):
+        """ Lanes whose cells with tags 't' are not valid operands. """
+        return t!=0 if self.check else t<0
+
+    def binop(self,g,op):
+        s = g.s
+        if not (self.row(s) and self.row(s-1)):
+            return self.evict(g)
+        V = self.V;  T = self.T;  idx = g.idx
+        a = V[s-1,idx];  b = V[s,idx]
+        bad = self.integers(T[s-1,idx]) | self.integers(T[s,idx])
+        if op=="add":
+            r = a+b
+            bad |= numpy.abs(r)>=BOUND
+        elif op=="subt":
+            r = a-b
+            bad |= numpy.abs(r)>=BOUND
+        elif op=="mult":
+            r = a*b
+            bad |= numpy.abs(a.astype(numpy.float64)*b)>=BOUND/2
+        elif op=="divi":
+            bad |= b==0
+            r = a//numpy.where(b==0,1,b)
+        elif op=="andd":
+            r = numpy.where(a==0,a,b)
+        elif op=="orr":
+            r = numpy.where(a!=0,a,b)
+        elif op=="less":
+            r = a<b
+        elif op=="grt":
+            r = a>b
+        elif op=="eql":
+            r = a==b
+        elif op=="dif":
+            r = a!=b
+        elif op=="leq":
+            r = a<=b
+        else:
+            r = a>=b
+        if bad.any():
+            if self.evict(g,bad):
+                return True
+            r = r[~bad]
+            idx = g.idx
+        V[s-1,idx] = r
+        T[s-1,idx] = 0
+        g.s = s-1
+        g.i += 1
+
+    def unop(self,g,inv):
+        s = g.s
+        if not self.row(s):
+            return self.evict(g)
+        V = self.V;  idx = g.idx
+        a = V[s,idx]
+        r = -a if inv else 1-a
+        bad = self.integers(self.T[s,idx]) | (numpy.abs(r)>=BOUND)
+        if bad.any():
+            if self.evict(g,bad):
+                return True
+            r = r[~bad]
+            idx = g.idx
+        V[s,idx] = r
+        self.T[s,idx] = 0
+        g.i += 1
+
+    def nop(self,g):
+        g.i += 1
+
+    def halt(self,g):
+        self.flush(g)
+        self.groups.remove(g)
+        return True
+
+    def init(self,g):
+        if not g.D:
+            return self.evict(g)
+        g.s = -1
+        g.D[0] = 0
+        g.i += 1
+
+    def jmp(self,g,p):
+        if p<0:
+            return self.evict(g)
+        g.i = p
+        return True
+
+    def jmpf(self,g,p):
+        s = g.s
+        if not self.row(s) or p<0:
+            return self.evict(g)
+        if self.check:
+            bad = self.T[s,g.idx]!=0
+            if bad.any() and self.evict(g,bad):
+                return True
+        taken = self.V[s,g.idx]==0
+        g.s = s-1
+        if taken.all():
+            g.i = p
+        elif taken.any():
+            g.i += 1
+            self.split(g,taken).i = p
+        else:
+            g.i += 1
+        return True
+
+    def display(self,g,m):
+        """ Address in D[m], None if not valid. """
+        if 0<=m<len(g.D):
+            return g.D[m]
+        return None
+
+    def ldct(self,g,k):
+        s = g.s+1
+        if not self.row(s) or abs(k)>=BOUND:
+            return self.evict(g)
+        self.V[s,g.idx] = k
+        self.T[s,g.idx] = 0
+        g.s = s
+        g.i += 1
+
+    def ldvl(self,g,m,n):
+        a = self.display(g,m)
+        s = g.s+1
+        if a==None or not self.row(a+n) or not self.row(s):
+            return self.evict(g)
+        a += n
+        idx = g.idx
+        self.V[s,idx] = self.V[a,idx]
+        self.T[s,idx] = self.T[a,idx]
+        g.s = s
+        g.i += 1
+
+    def stvl(self,g,m,n):
+        a = self.display(g,m)
+        s = g.s
+        if a==None or not self.row(a+n) or not self.row(s):
+            return self.evict(g)
+        a += n
+        idx = g.idx
+        self.V[a,idx] = self.V[s,idx]
+        self.T[a,idx] = self.T[s,idx]
+        g.s = s-1
+        g.i += 1
+
+    def ldaddr(self,g,m,n):
+        a = self.display(g,m)
+        s = g.s+1
+        if a==None or not self.row(s):
+            return self.evict(g)
+        self.V[s,g.idx] = a+n
+        self.T[s,g.idx] = 2
+        g.s = s
+        g.i += 1
+
+    def alloc(self,g,n):
+        g.s += n
+        g.i += 1
+
+    def dealloc(self,g,n):
+        g.s -= n
+        g.i += 1
+
+    def read(self,g):
+        s = g.s+1
+        if not self.row(s):
+            return self.evict(g)
+        lanes = g.lanes.tolist()
+        values = len(lanes) * [0]
+        bad = numpy.zeros(len(lanes),bool)
+        for j, k in enumerate(lanes):
+            inf = self.inputs[k]
+            try:
+                v = inf.readInt()
+            except EOFError:
+                bad[j] = True
+                continue
+            except:
+                inf.unread()
+                bad[j] = True
+                continue
+            if abs(v)>=BOUND:
+                inf.unread()
+                bad[j] = True
+            else:
+                values[j] = v
+        values = numpy.array(values,numpy.int64)
+        if bad.any():
+            if self.evict(g,bad):
+                return True
+            values = values[~bad]
+        self.V[s,g.idx] = values
+        self.T[s,g.idx] = 0
+        g.s = s
+        g.i += 1
+
+    def writ(self,g):
+        s = g.s
+        if not self.row(s):
+            return self.evict(g)
+        bad = self.integers(self.T[s,g.idx])
+        if bad.any() and self.evict(g,bad):
+            return True
+        outputs = self.outputs
+        for k, v in zip(g.lanes.tolist(),self.V[s,g.idx].tolist()):
+            outputs[k].write("%d\n" % v)
+        g.s = s-1
+        g.i += 1
+
+    def call(self,g,p,k,ret):
+        d = self.display(g,k)
+        s = g.s
+        if d==None or p<0 or not (self.row(s+1) and self.row(s+3)):
+            return self.evict(g)
+        V = self.V;  T = self.T;  idx = g.idx
+        V[s+1,idx] = ret;  T[s+1,idx] = 3
+        V[s+2,idx] = d;    T[s+2,idx] = 2
+        V[s+3,idx] = k;    T[s+3,idx] = 1
+        g.s = s+3
+        g.i = p
+        return True
+
+    def entproc(self,g,k):
+        s = g.s+1
+        if not (1<=k<len(g.D) and self.row(s)) or g.D[k-1]==None:
+            return self.evict(g)
+        self.V[s,g.idx] = g.D[k-1]
+        self.T[s,g.idx] = 2
+        g.s = s
+        g.D[k] = s+1
+        g.i += 1
+
+    def entprocd(self,g,k):
+        s = g.s+1
+        if not (1<=k<len(g.D) and self.row(s) and self.row(s-2)) or \
+           g.D[k-1]==None or g.D[k]==None:
+            return self.evict(g)
+        V = self.V;  T = self.T;  idx = g.idx
+        V[s,idx] = g.D[k-1];  T[s,idx] = 2
+        V[s-1,idx] = k;       T[s-1,idx] = 1
+        V[s-2,idx] = g.D[k];  T[s-2,idx] = 2
+        g.s = s
+        g.D[k] = s+1
+        g.i += 1
+
+    def retproc(self,g,n):
+        return self.returns(g,n,True)
+
+    def retprocd(self,g,n):
+        return self.returns(g,n,False)
+
+    def returns(self,g,n,rebuild):
+        """ RTPR ('rebuild': the display below the level is rebuilt
+            from the frames) and RTPD; lanes returning to different
+            places are split.
+        """
+        s = g.s
+        if not (self.row(s-1) and self.row(s-3)):
+            return self.evict(g)
+        V = self.V;  T = self.T;  idx = g.idx
+        if self.check:
+            bad = (T[s-1,idx]!=1) | (T[s-2,idx]!=2) | (T[s-3,idx]!=3)
+        else:
+            bad = (T[s-1,idx]<0) | (T[s-2,idx]<0) | (T[s-3,idx]<0)
+        if bad.any() and self.evict(g,bad):
+            return True
+        idx = g.idx
+        keys = numpy.stack((V[s-1,idx],V[s-2,idx],V[s-3,idx]),axis=1)
+        if (keys==keys[0]).all():
+            places = [(keys[0], None)]
+        else:
+            u, inv = numpy.unique(keys,axis=0,return_inverse=True)
+            inv = inv.reshape(-1)
+            places = [(u[j], inv==j) for j in range(len(u))]
+        states = []
+        for (t, d, i), mask in places:
+            t = int(t);  d = int(d);  i = int(i)
+            D = g.D[:]
+            lanes = g.lanes if mask is None else g.lanes[mask]
+            if not 0<=t<len(D) or i<0:
+                states.append((mask, None))
+                continue
+            D[t] = d
+            while rebuild and t>1 and D!=None:
+                a = D[t]-1
+                if not self.row(a):
+                    D = None
+                    break
+                tags = T[a,lanes]
+                values = V[a,lanes]
+                if (tags!=2).any() if self.check else (tags<0).any():
+                    D = None
+                elif not (values==values[0]).all():
+                    D = None
+                else:
+                    D[t-1] = int(values[0])
+                    t -= 1
+            states.append((mask, None if D==None else (i, s-(n+4), D)))
+        # lanes with no valid return, then one group for each place
+        if len(states)==1:
+            if states[0][1]==None:
+                return self.evict(g)
+            g.i, g.s, g.D = states[0][1]
+            return True
+        lanes = g.lanes
+        failed = [lanes[mask] for mask, state in states if state==None]
+        if failed and self.evict(g,numpy.isin(g.lanes,numpy.concatenate(failed))):
+            return True
+        first = True
+        for mask, state in states:
+            if state==None:
+                continue
+            if first:
+                g.i, g.s, g.D = state
+                first = False
+            else:
+                h = self.split(g,numpy.isin(g.lanes,lanes[mask]))
+                h.i, h.s, h.D = state
+        # 'g' was moved to the first place: the others came from it
+        return True
+
+# Instructions executed in lock-step, besides the binary operations,
+# 'inv', 'nott' and 'call'
+LANE_INSTR = [ "nop", "halt", "init", "jmp", "jmpf", "ldct", "ldvl",
+               "stvl", "ldaddr", "alloc", "dealloc", "read", "writ",
+               "entproc", "entprocd", "retproc", "retprocd" ]
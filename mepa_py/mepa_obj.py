@@ -0,0 +1,156 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Binary MEPA object files (.mepb), all numbers little-endian:           #
+#                                                                        #
+#    header     magic "MEPB", version, instructions, entry point,         #
+#               labels, label table bytes (HEADER)                       #
+#    codes      one byte per instruction: index in INSTR_ALL             #
+#    operands   three int32 per instruction, unused ones 0               #
+#    labels     address (int32), name length (uint16), name (utf-8)      #
+#                                                                        #
+# Codes start at offset 32 and operands are 4-aligned. Objects are read  #
+# through 'mmap' and decoded with no text processing; program lines for  #
+# debugging are produced only when asked for.                            #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, mmap, struct
+from array import array
+
+from mepa_defs import *
+
+MAGIC = b"MEPB"
+VERSION = 2
+
+# magic, version, flags, instructions, entry, labels, label bytes
+HEADER = struct.Struct("<4sHHiiii")
+HEADER_SIZE = 32
+
+LABEL = struct.Struct("<iH")
+
+# Instructions whose first argument is a program address
+PROG_ADDR = [ "jmp", "jmpf", "call", "ldgaddr" ]
+
+MNEMONICS = { name: code for code, name in INSTR_DICT.items() }
+
+def isObject(name):
+    """ Whether file 'name' is an object file (by its extension). """
+    return name.endswith(".mepb")
+
+def writeObject(P,L,f):
+    """ Writes program P, with labels L and arguments resolved, to
+        binary file 'f'.
+    """
+    n = len(P)
+    codes = bytearray(n)
+    operands = array('i',bytes(12*n))
+    for k, (name, args) in enumerate(decodeProgram(P)):
+        codes[k] = INSTR_ALL.index(name)
+        try:
+            if args==None:
+                raise ValueError     # not accepted by 'eval' either
+            operands[3*k:3*k+len(args)] = array('i',args)
+        except (ValueError, OverflowError):
+            raise MepaError(OBJECT_OPERAND % (k,P[k][3]))
+    if sys.byteorder!="little":
+        operands.byteswap()
+    labels = bytearray()
+    for lab in sorted(L,key=lambda l: L[l]):
+        name = lab.encode()
+        labels += LABEL.pack(L[lab],len(name))+name
+    codes += bytes(-n % 4)
+    f.write(HEADER.pack(MAGIC,VERSION,0,n,0,len(L),len(labels)))
+    f.write(bytes(HEADER_SIZE-HEADER.size))
+    f.write(codes)
+    f.write(operands.tobytes())
+    f.write(labels)
+
+def readObject(f):
+    """ Object from binary file 'f'. """
+    try:
+        data = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        data = f.read()
+    return MepaObject(data,getattr(f,"name",""))
+
+class MepaObject:
+    """ Object program: a sequence of [label, instruction, arguments,
+        line] entries like the 'P' of 'readProgram', made on demand;
+        'labels' is its label dictionary.
+    """
+
+    def __init__(self,data,name=""):
+        try:
+            magic, version, flags, n, entry, nlab, lsize = \
+                HEADER.unpack_from(data)
+            if magic!=MAGIC or version!=VERSION:
+                raise ValueError
+            self.n = n
+            self.entry = entry
+            self.codes = data[HEADER_SIZE:HEADER_SIZE+n]
+            start = HEADER_SIZE+n+(-n % 4)
+            self.operands = array('i')
+            self.operands.frombytes(data[start:start+12*n])
+            if sys.byteorder!="little":
+                self.operands.byteswap()
+            self.labels = {}
+            self.names = {}
+            k = start+12*n
+            for j in range(nlab):
+                a, size = LABEL.unpack_from(data,k)
+                lab = bytes(data[k+LABEL.size:k+LABEL.size+size]).decode()
+                self.labels[lab] = a
+                self.names[a] = lab
+                k += LABEL.size+size
+            if len(self.codes)!=n or len(self.operands)!=3*n or \
+               max(self.codes,default=0)>=len(INSTR_ALL):
+                raise ValueError
+        except (ValueError, struct.error, UnicodeDecodeError):
+            raise MepaError(ILLEGAL_OBJECT_FILE % name)
+
+    def decoded(self):
+        """ List of (name, args) pairs as in 'decodeProgram'. """
+        DP = []
+        ops = self.operands
+        for k in range(self.n):
+            name = INSTR_ALL[self.codes[k]]
+            DP.append((name,tuple(ops[3*k:3*k+NUM_ARGS[name]])))
+        return DP
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self,k):
+        if k<0:
+            k += self.n
+        if not 0<=k<self.n:
+            raise IndexError
+        name = INSTR_ALL[self.codes[k]]
+        code = MNEMONICS[name]
+        args = [str(a) for a in self.operands[3*k:3*k+NUM_ARGS[name]]]
+        lab = self.names.get(k,"")
+        line = "%-8s%-5s %s" % (lab+":" if lab else "",code,",".join(args))
+        return [lab, code, args, line.rstrip()]
+
+def disassemble(obj,mnemonic=None):
+    """ MEPA text of object 'obj', with program addresses replaced by
+        their labels; 'mnemonic' maps instruction names to codes, by
+        default those of mepa_instr.
+    """
+    if mnemonic==None:
+        mnemonic = MNEMONICS
+    lines = []
+    for k in range(len(obj)):
+        name = INSTR_ALL[obj.codes[k]]
+        args = [str(a) for a in obj.operands[3*k:3*k+NUM_ARGS[name]]]
+        if name in PROG_ADDR and int(args[0]) in obj.names:
+            args[0] = obj.names[int(args[0])]
+        lab = obj.names.get(k,"")
+        lines.append(("%-8s%-5s %s" % (lab+":" if lab else "",mnemonic[name],
+                                       ",".join(args))).rstrip())
+    lines.append("%-8s%s" % ("",END_INSTR))
+    return lines
@@ -0,0 +1,215 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Control flow graph optimizer for any MEPA program (see                 #
+# mepa_opt_pt.py). The program is split into basic blocks at the        #
+# targets of DSVS, DSVF, CHPR and CREG and after the instructions which  #
+# end a block; then:                                                     #
+#                                                                        #
+#   - jumps to DSVS (after any NADA) go directly to its target;          #
+#   - blocks not reachable from address 0 or from a procedure entry      #
+#     are removed, and so are the NADA instructions, their labels going  #
+#     to the next instruction;                                           #
+#   - a block entered only by one DSVS is placed after it, without the   #
+#     jump, with the blocks it falls into; DSVS to the next instruction  #
+#     are removed.                                                       #
+#                                                                        #
+# Blocks falling into the next one, e.g. after CHPR, whose return        #
+# address is the next one, are kept together. The optimized program      #
+# has the same input and output; only the executed instruction counts   #
+# and the addresses in messages differ. Programs with jumps to invalid   #
+# addresses are left as they are.                                        #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+from mepa_defs import *
+from mepa_obj import PROG_ADDR, MNEMONICS
+
+# Instructions after which execution does not go on at the next address
+NO_FALLTHROUGH = [ "jmp", "halt", "retproc", "retprocd" ]
+
+# Instructions ending a basic block
+BLOCK_END = NO_FALLTHROUGH + [ "jmpf" ]
+
+def thread(DP,t):
+    """ First address other than NADA and DSVS reached from 't'. """
+    seen = set()
+    while True:
+        while t<len(DP) and DP[t][0]=="nop":
+            t += 1
+        if t>=len(DP) or DP[t][0]!="jmp" or t in seen:
+            return t
+        seen.add(t)
+        t = DP[t][1][0]
+
+def optimizeProgram(P,L):
+    """ Optimized version of program P, with labels L and arguments
+        resolved, as a new [P, L] pair.
+    """
+    DP = decodeProgram(P)
+    n = len(DP)
+    for name, args in DP:
+        if name in PROG_ADDR and (args==None or not 0<=args[0]<=n):
+            return [P, L]
+
+    # targets, with jumps to jumps threaded
+    target = {}
+    for k, (name, args) in enumerate(DP):
+        if name in PROG_ADDR:
+            target[k] = thread(DP,args[0])
+
+    # basic blocks
+    leaders = set([0]) | set(t for t in target.values() if t<n)
+    leaders |= set(k+1 for k, (name, args) in enumerate(DP)
+                   if name in BLOCK_END and k+1<n)
+    starts = sorted(leaders)
+    ends = starts[1:]+[n]
+    block = dict((b, e) for b, e in zip(starts,ends))
+
+    def falls(b):
+        return DP[block[b]-1][0] not in NO_FALLTHROUGH
+
+    # reachable blocks, and the blocks jumped to by only one DSVS
+    reached = set()
+    work = [0]
+    preds = {}
+    pinned = set([0])
+    while work:
+        b = work.pop()
+        if b in reached:
+            continue
+        reached.add(b)
+        succ = []
+        for k in range(b,block[b]):
+            if k in target and target[k]<n:
+                t = target[k]
+                succ.append(t)
+                if DP[k][0]=="jmp":
+                    preds[t] = preds.get(t,0)+1
+                else:
+                    pinned.add(t)
+        if falls(b) and block[b]<n:
+            succ.append(block[b])
+            pinned.add(block[b])
+        work.extend(succ)
+
+    # chains of blocks falling into each other, in program order
+    chains = []
+    head = {}
+    for b in starts:
+        if b in reached:
+            if chains and chains[-1][-1] in reached and falls(chains[-1][-1]) \
+               and block[chains[-1][-1]]==b:
+                chains[-1].append(b)
+            else:
+                chains.append([b])
+            head[b] = chains[-1]
+
+    # chains jumped to by only one DSVS go after it
+    dropped = set()
+    placed = []
+    for c in chains:
+        if not c:
+            continue
+        placed.append(c)
+        # a chain merged here later is emptied in place
+        while True:
+            k = block[c[-1]]-1
+            t = target.get(k)
+            if DP[k][0]!="jmp" or t not in head or t in pinned or \
+               preds.get(t)!=1 or head[t] is c:
+                break
+            d = head[t]
+            dropped.add(k)
+            c.extend(d)
+            for b in d:
+                head[b] = c
+            del d[:]
+
+    # layout: original addresses, None for a jump to the end of the
+    # program; removed ones are mapped to the next one kept
+    placed = [c for c in placed if c]
+    layout = []
+    for c in placed:
+        for b in c:
+            layout.extend(range(b,block[b]))
+        if falls(c[-1]) and block[c[-1]]==n and c is not placed[-1]:
+            layout.append(None)
+    removed = set(k for k in layout if k!=None and
+                  (DP[k][0]=="nop" or k in dropped))
+    while True:
+        pos = {}
+        j = 0
+        for k in layout:
+            if k==None or not k in removed:
+                j += 1
+        size = j
+        for k in reversed(layout):
+            if k==None or not k in removed:
+                j -= 1
+            pos[k] = j if k==None or not k in removed else j+1
+        def where(t):
+            return pos[t] if t<n else size
+        # jumps to the next instruction
+        more = [k for k in layout if k!=None and not k in removed and
+                DP[k][0]=="jmp" and where(target[k])==pos[k]+1]
+        if not more:
+            break
+        removed.update(more)
+
+    # new program; labels of the original program kept where they fall
+    names = {}
+    for lab in sorted(L,key=lambda l: L[l]):
+        a = L[lab]
+        if a<n and a in pos and not pos[a] in names and pos[a]<size:
+            names[pos[a]] = lab
+    used = set(L)
+    newP = []
+    for k in layout:
+        if k==None:
+            newP.append(["", MNEMONICS["jmp"], [str(size)], ""])
+            continue
+        if k in removed:
+            continue
+        code, args = P[k][1], list(P[k][2])
+        if k in target:
+            args[0] = str(where(target[k]))
+        newP.append(["", code, args, ""])
+    for k, (name, args) in enumerate(DP):
+        if k in target and k in pos and not k in removed:
+            t = where(target[k])
+            if t<size and not t in names:
+                j = t
+                while "L%d" % j in used:
+                    j += size
+                names[t] = "L%d" % j
+                used.add(names[t])
+    newL = {}
+    for j, p in enumerate(newP):
+        if j in names:
+            p[0] = names[j]
+            newL[names[j]] = j
+        p[3] = programLine(p,newL)
+    return [newP, newL]
+
+def programLine(p,L):
+    lab, code, args = p[0], p[1], p[2]
+    return ("%-8s%-5s %s" % (lab+":" if lab else "",code,
+                             ",".join(args))).rstrip()
+
+def programText(P,L):
+    """ MEPA text of program P, with arguments resolved, using the
+        labels L for program addresses.
+    """
+    names = dict((a, lab) for lab, a in L.items())
+    lines = []
+    for lab, code, args, line in P:
+        if INSTR_DICT[code.upper()] in PROG_ADDR and args and \
+           args[0].isdigit() and int(args[0]) in names:
+            args = [names[int(args[0])]]+args[1:]
+        lines.append(programLine([lab,code,args],L))
+    lines.append("%-8s%s" % ("",END_INSTR))
+    return lines
@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Optimizer: equivalent, smaller MEPA program (see mepa_opt.py) of a     #
+# text or binary (.mepb) program, hand-written or from any compiler;     #
+# written as text or, if the output file name ends in .mepb, as a        #
+# binary object.                                                         #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, getopt
+
+from mepa_defs import *
+from mepa_obj import isObject, readObject, writeObject
+from mepa_opt import optimizeProgram, programText
+
+Usage = """
+Usage:
+
+    [python3] mepa_opt_pt.py <program file>
+         [-h | --help (False)]
+         [-o | --outfile <file name> (stdout)]
+         [--programsize <integer> (no limit)]
+"""
+
+#======================================================================
+# Main
+#======================================================================
+
+
+if __name__ == "__main__":
+
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:],"ho:",
+                                       ["help","outfile=","programsize="])
+    except getopt.GetoptError:
+        Msg(UNRECOGNIZED_OPTION)
+        Msg(Usage,quit=True,code=1)
+    if len(args)!=1:
+        Msg(Usage,quit=True,code=1)
+
+    outname = None
+    for o,a in opts:
+        if o=="-h" or o=="--help":
+            Msg(Usage,quit=True)
+        elif o=="-o" or o=="--outfile":
+            outname = a
+        elif o=="--programsize":
+            try:
+                OPTIONS_DICT["programsize"] = int(a)
+            except ValueError:
+                Msg(ILLEGAL_OPTION % (o[2:],a),quit=True,code=1)
+
+    try:
+        if isObject(args[0]):
+            with open(args[0],"rb") as f:
+                P = readObject(f)
+            L = P.labels
+        else:
+            with open(args[0],"r") as f:
+                P, L = readProgram(f)
+            resolveArgs(P,L)
+        newP, newL = optimizeProgram(P,L)
+        if outname!=None and isObject(outname):
+            with open(outname,"wb") as f:
+                writeObject(newP,newL,f)
+        else:
+            f = open(outname,"w") if outname!=None else sys.stdout
+            for line in programText(newP,newL):
+                f.write(line+"\n")
+            if outname!=None:
+                f.close()
+    except OSError as e:
+        Msg(OPEN_FILE_ERROR % e.filename,quit=True,code=1)
+    except MepaError as e:
+        Msg(str(e),quit=True,code=1)
+    Msg(OPTIMIZED % (len(newP),len(P)))
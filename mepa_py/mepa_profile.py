@@ -0,0 +1,84 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Execution profile: counts of executed instructions by address,         #
+# aggregated by instruction code, by label region (from a label to the   #
+# next one) and by procedure (from ENPR to its RTPR, named by the label  #
+# of its region). Written as JSON and as tables of the most executed.    #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import json
+
+from mepa_defs import *
+
+def regions(P,L):
+    """ Label of the region of each address ("" before any label). """
+    R = len(P) * [""]
+    starts = sorted((a,lab) for lab, a in L.items())
+    for k in range(len(starts)):
+        a, lab = starts[k]
+        end = starts[k+1][0] if k+1<len(starts) else len(P)
+        for j in range(a,end):
+            R[j] = lab
+    return R
+
+def procedures(P,L):
+    """ Procedure of each address ("" for the main program). """
+    R = regions(P,L)
+    proc = []
+    stack = []
+    for k in range(len(P)):
+        name = INSTR_DICT[P[k][1].upper()]
+        if name in ("entproc", "entprocd"):
+            stack.append(R[k])
+        proc.append(stack[-1] if stack else "")
+        if name in ("retproc", "retprocd") and stack:
+            stack.pop()
+    return proc
+
+def profile(P,L,counts):
+    """ Profile dictionary from the execution count of each address. """
+    R = regions(P,L)
+    proc = procedures(P,L)
+    opcodes = {}
+    labels = {}
+    procs = {}
+    for k in range(len(P)):
+        c = counts[k]
+        if c:
+            code = P[k][1].upper()
+            opcodes[code] = opcodes.get(code,0)+c
+            labels[R[k]] = labels.get(R[k],0)+c
+            procs[proc[k]] = procs.get(proc[k],0)+c
+    return { "total":      sum(counts),
+             "addresses":  list(counts),
+             "opcodes":    opcodes,
+             "labels":     labels,
+             "procedures": procs }
+
+def writeProfile(name,prof,msg=Msg):
+    """ Writes profile 'prof' to JSON file 'name'. """
+    try:
+        with open(name,"w") as f:
+            json.dump(prof,f,indent=1)
+    except OSError:
+        msg(OPEN_FILE_ERROR % name)
+
+def profileTables(prof,n,msg=Msg):
+    """ Prints the 'n' most executed codes, label regions and
+        procedures.
+    """
+    total = max(prof["total"],1)
+    for title, key, empty in [(PROFILE_OPCODES, "opcodes", ""),
+                              (PROFILE_LABELS, "labels", PROFILE_NO_LABEL),
+                              (PROFILE_PROCEDURES, "procedures", PROFILE_MAIN)]:
+        msg(title)
+        msg((len(title)-1)*'-')
+        items = sorted(prof[key].items(),key=lambda x: (-x[1],x[0]))
+        for name, c in items[:n]:
+            msg("%-20s %12d %6.1f%%" % (name or empty,c,100.0*c/total))
+        msg("")
@@ -82,10 +82,11 @@ COPY_RIGHT = """
 #------------------------------------------------------------------------#
 """
 
-import sys, traceback, getopt
-import mepa_defs
+import sys, traceback, getopt, time
 from mepa_defs import *
-from mepa_interp import execute
+from mepa_engines import ENGINES, runProgram
+from mepa_io import Input, Output, OUT_BUFFER
+from mepa_obj import isObject, readObject
 
 VERSION = "5.0"
 
@@ -126,11 +127,22 @@ if __name__ == "__main__":
                     Msg(ILLEGAL_OPTION % (o,a),code=1,quit=True)
             elif o in FILE_OPTIONS:
                 OPTIONS_DICT[o] = a
+            elif o=="engine":
+                if not a in ENGINES:
+                    Msg(ILLEGAL_OPTION % (o,a),code=1,quit=True)
+                OPTIONS_DICT[o] = a
+            elif o in STR_OPTIONS:
+                OPTIONS_DICT[o] = a
             else:
                 Msg(ILLEGAL_OPTIONS)
                 Msg(Usage,quit=True,code=1)
         
         
+        # files of the options, standard ones by default
+        mess = sys.stderr
+        infile = sys.stdin
+        outfile = sys.stdout
+        progfile = sys.stdin
         first = True
         for k in OPTIONS_ORDER:
             v = OPTIONS_DICT[k]
@@ -139,10 +151,10 @@ if __name__ == "__main__":
                 if v.startswith("<"):
                     p = v.find("<std")
                     if p<0:
-                        Msg(ILLEGAL_OPTION % (k,v))
+                        Msg(ILLEGAL_OPTION % (k,v),file=mess)
                     q = v.find(">",p)
                     if q<0:
-                        Msg(ILLEGAL_OPTION % (k,v))
+                        Msg(ILLEGAL_OPTION % (k,v),file=mess)
                     v = v[p+1:q]
                 else:
                     ## These calls of "open" used to have under
@@ -151,38 +163,54 @@ if __name__ == "__main__":
                     ## Might have problems under Windows?
                     try:
                         if k=="messfile":
-                            mepa_defs.MESS_FILE = open(v,"w")
+                            mess = open(v,"w")
                         elif k=="infile":
-                            mepa_defs.IN_FILE = open(v,"r")
+                            infile = open(v,"r")
                         elif k=="outfile":
-                            mepa_defs.OUT_FILE = open(v,"w")
+                            outfile = open(v,"w")
                         elif k=="progfile":  # progfile
-                            mepa_defs.PROG_FILE = open(v,"r")
+                            progfile = open(v,"rb" if isObject(v) else "r")
                         else:
-                            Msg(INTERNAL_ERROR % 1,code=1,quit=True)
+                            Msg(INTERNAL_ERROR % 1,code=1,quit=True,file=mess)
                     except FileNotFoundError:
-                        Msg(OPEN_FILE_ERROR % v, code=1,quit=True)
+                        Msg(OPEN_FILE_ERROR % v, code=1,quit=True,file=mess)
 
             if not OPTIONS_DICT["silent"]:       
                 if first:
-                    UndMsg(BANNER % VERSION,'=',1)
-                    Msg('\n')
-                    UndMsg(OPTIONS_TITLE,'-',0)
+                    UndMsg(BANNER % VERSION,'=',1,file=mess)
+                    Msg('\n',file=mess)
+                    UndMsg(OPTIONS_TITLE,'-',0,file=mess)
                     first = False
-                Msg("%12s:  %s" % (k,v))
+                Msg("%12s:  %s" % (k,v),file=mess)
         if not OPTIONS_DICT["silent"]:  
-            Msg("")
-        if OPTIONS_DICT["step"] and mepa_defs.PROG_FILE==sys.stdin:
-            Msg(STEP_STDIN,quit=True)
-        P, L = inputProgram()
-        fixArgs(P,L)
+            Msg("",file=mess)
+        if OPTIONS_DICT["step"] and progfile==sys.stdin:
+            Msg(STEP_STDIN,quit=True,file=mess)
+        start = time.perf_counter()
+        if isObject(str(OPTIONS_DICT["progfile"])):
+            try:
+                P = readObject(progfile)
+            except MepaError as e:
+                Msg(str(e),quit=True,code=1,file=mess)
+            L = P.labels
+        else:
+            P, L = inputProgram(progfile,mess)
+            fixArgs(P,L,mess)
+        if OPTIONS_DICT["stats"]:
+            t = time.perf_counter()-start
+            Msg(LOAD_STATS % (len(P),t,len(P)/max(t,1e-9)),file=mess)
         # dumpProgram(P)   ###############
-        MP = makeMepa(P)
-        # dumpMepaP(MP)    ###############
-        res = execute(MP,P,L,mepa_defs.MESS_FILE,mepa_defs.IN_FILE,mepa_defs.OUT_FILE)
+        # input and output as they happen while debugging
+        tracing = debugging(decodeProgram(P))
+        out = Output(outfile,1 if tracing else OUT_BUFFER)
+        inp = Input(infile,tracing,out)
+        try:
+            res = runProgram(P,L,mess,inp,out)
+        finally:
+            out.flush()
         if res!=-1:
-            Msg(EXECUTION_ERROR % res,quit=True,code=1)
-        Msg("\n")
+            Msg(EXECUTION_ERROR % res,quit=True,code=1,file=mess)
+        Msg("\n",file=mess)
 
     except SystemExit as e:
         pass
@@ -0,0 +1,148 @@
+#! /usr/bin/env python3
+
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Replays a trace written by 'mepa_pt.py --trace' (see mepa_trace.py),   #
+# showing the machine state after any executed instruction. Commands,    #
+# one per line, from the standard input:                                 #
+#                                                                        #
+#    n [k]      forward k instructions (1; also an empty line)           #
+#    b [k]      backward k instructions (1)                              #
+#    g k        go to the state after k instructions                     #
+#    t [k]      k cells from the stack top (5)                           #
+#    m a [b]    memory cells a to b                                      #
+#    d          display                                                  #
+#    q          quit                                                     #
+#                                                                        #
+# Unknown cells are shown as '?'.                                        #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, getopt
+
+from mepa_defs import *
+from mepa_trace import Replay
+
+Usage = """
+Usage:
+
+    [python3] mepa_replay_pt.py <trace file>
+         [-h | --help (False)]
+         [--progfile <file name> (none)]
+         [--goto <integer> (interactive)]
+"""
+
+MNEMONICS = { name: code for code, name in INSTR_DICT.items() }
+
+def cell(R,a):
+    c = R.M.get(a)
+    return "?" if c==None else "%d (%d)" % c
+
+def showState(R,P):
+    pc = R.pc()
+    Msg(TRACE_STATE % (R.step,len(R.steps),"?" if pc==None else pc,R.s))
+    if R.step>0:
+        last = R.steps[R.step-1][0]
+        if P!=None and 0<=last<len(P):
+            text = P[last][3].strip()
+        else:
+            text = MNEMONICS.get(R.name(R.step),R.name(R.step))
+        Msg(TRACE_LAST % (last,text))
+    showTop(R,3)
+
+def showTop(R,k):
+    for a in range(max(R.s-k+1,0),R.s+1):
+        Msg("  %4d: %s" % (a,cell(R,a)))
+
+def command(R,P,line):
+    """ Runs one command; False to quit. """
+    p = line.split()
+    if not p:
+        p = ["n"]
+    try:
+        args = [int(a) for a in p[1:]]
+        c = p[0]
+        if c=="q":
+            return False
+        elif c=="n":
+            R.forward(args[0] if args else 1)
+        elif c=="b":
+            R.backward(args[0] if args else 1)
+        elif c=="g":
+            R.goto(args[0])
+        elif c=="t":
+            showTop(R,args[0] if args else 5)
+            return True
+        elif c=="m":
+            for a in range(args[0],(args[1] if len(args)>1 else args[0])+1):
+                Msg("  %4d: %s" % (a,cell(R,a)))
+            return True
+        elif c=="d":
+            for k in sorted(R.D):
+                if R.D[k]!=None:
+                    Msg("  D[%d] = %d" % (k,R.D[k]))
+            return True
+        else:
+            raise ValueError
+    except (ValueError, IndexError):
+        Msg(UNKNOWN_COMMAND % line.strip())
+        return True
+    showState(R,P)
+    return True
+
+#======================================================================
+# Main
+#======================================================================
+
+
+if __name__ == "__main__":
+
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:],"h",
+                                       ["help","progfile=","goto="])
+    except getopt.GetoptError:
+        Msg(UNRECOGNIZED_OPTION)
+        Msg(Usage,quit=True,code=1)
+    if len(args)!=1:
+        Msg(Usage,quit=True,code=1)
+
+    P = None
+    goto = None
+    for o,a in opts:
+        if o=="-h" or o=="--help":
+            Msg(Usage,quit=True)
+        elif o=="--progfile":
+            try:
+                with open(a,"r") as f:
+                    P, L = readProgram(f)
+            except OSError:
+                Msg(OPEN_FILE_ERROR % a,quit=True,code=1)
+            except MepaError as e:
+                Msg(str(e),quit=True,code=1)
+        elif o=="--goto":
+            try:
+                goto = int(a)
+            except ValueError:
+                Msg(ILLEGAL_OPTION % (o[2:],a),quit=True,code=1)
+
+    try:
+        R = Replay(args[0])
+    except OSError:
+        Msg(OPEN_FILE_ERROR % args[0],quit=True,code=1)
+    except MepaError as e:
+        Msg(str(e),quit=True,code=1)
+    if R.truncated:
+        Msg(TRACE_TRUNCATED % (R.records,R.total))
+
+    if goto!=None:
+        R.goto(goto)
+        showState(R,P)
+    else:
+        showState(R,P)
+        for line in sys.stdin:
+            if not command(R,P,line):
+                break
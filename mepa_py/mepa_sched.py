@@ -0,0 +1,106 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Cooperative scheduler of many VMs (mepa_vm.py) in one process. Jobs   #
+# start in order of priority, at most 'slots' at a time, and take turns #
+# round robin: a turn runs 'quantum' instructions times the job         #
+# priority, after which the job is preempted and goes to the end of the #
+# queue. Each job has its own instruction budget, the limit of its VM,  #
+# so a runaway loop stops at its budget while the others go on.        #
+#                                                                        #
+#    jobs = [Job(k,make,inputs[k],outputs[k],budget=10**5)               #
+#            for k in range(n)]                                          #
+#    for job in Scheduler(quantum=1000).run(jobs):                       #
+#        print(job.key,job.count,job.error)      # as jobs finish        #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import time, collections
+
+from mepa_defs import *
+
+# Instructions of a turn of priority 1
+QUANTUM = 1000
+
+# Jobs started at a time
+SLOTS = 64
+
+class Job:
+    """ Run of the program of the VM made by 'machine()' when the job
+        starts, reading 'infile' and writing 'outfile', with at most
+        'budget' instructions (by default, the VM limit) and turns of
+        'priority' quanta. When finished, 'count' is the number of
+        executed instructions, 'error' the MepaError message, if any,
+        and 'time' the seconds of its turns.
+    """
+
+    def __init__(self,key,machine,infile,outfile,budget=None,priority=1):
+        self.key = key
+        self.machine = machine
+        self.infile = infile
+        self.outfile = outfile
+        self.budget = budget
+        self.priority = priority
+        self.vm = None
+        self.count = 0
+        self.error = None
+        self.time = 0.0
+
+class Scheduler:
+    """ Round robin of jobs in turns of 'quantum' instructions times
+        their priority, at most 'slots' jobs at a time.
+    """
+
+    def __init__(self,quantum=QUANTUM,slots=SLOTS):
+        self.quantum = quantum
+        self.slots = slots
+
+    def run(self,jobs):
+        """ Runs 'jobs', those of higher priority first; yields each
+            job as it finishes.
+        """
+        waiting = collections.deque(sorted(jobs,key=lambda j: -j.priority))
+        ready = collections.deque()
+        while waiting or ready:
+            while waiting and len(ready)<self.slots:
+                job = waiting.popleft()
+                if self.start(job):
+                    ready.append(job)
+                else:
+                    yield job
+            job = ready.popleft()
+            if self.turn(job):
+                yield job
+            else:
+                ready.append(job)
+
+    def start(self,job):
+        """ Makes the VM of 'job' ready to run; False if it failed. """
+        try:
+            vm = job.vm = job.machine()
+        except MepaError as e:
+            job.error = str(e).strip()
+            return False
+        if job.budget!=None:
+            vm.limit = job.budget
+        vm.reset()
+        vm.attach(job.infile,job.outfile)
+        return True
+
+    def turn(self,job):
+        """ Runs a turn of 'job'; whether it finished. """
+        vm = job.vm
+        start = time.perf_counter()
+        try:
+            count = vm.execute(vm.count+self.quantum*job.priority)
+        except MepaError as e:
+            job.error = str(e).strip()
+            count = vm.count
+        job.time += time.perf_counter()-start
+        if count==None:
+            return False
+        job.count = count
+        return True
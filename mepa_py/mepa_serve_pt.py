@@ -0,0 +1,123 @@
+#! /usr/bin/env python3
+
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Session server: each connection to a TCP port or Unix socket runs the  #
+# program (text or .mepb) with the connection's input and output, all    #
+# sessions on one event loop (see mepa_async.py). Messages, such as the  #
+# instruction count and errors, are also sent to the connection.         #
+#                                                                        #
+#    python3 mepa_serve_pt.py prog.mep --port 5000 &                     #
+#    nc 127.0.0.1 5000                                                   #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, asyncio, getopt
+
+from mepa_defs import *
+from mepa_obj import isObject, readObject
+from mepa_verify import verifyProgram
+from mepa_async import QUANTUM, sessionHandler
+
+Usage = """
+Usage:
+
+    [python3] mepa_serve_pt.py <program file>
+         (--port <integer> | --socket <file name>)
+         [-h | --help (False)]
+         [--host <name> (127.0.0.1)]
+         [--quantum <integer> (%d)]
+         [--stacksize <integer> (500)]
+         [--displaysize <integer> (10)]
+         [--limit <integer> (10000)]
+         [--nocheck (False)]
+""" % QUANTUM
+
+SERVE_OPTIONS = [ "help", "nocheck", "port=", "socket=", "host=", "quantum=",
+                  "stacksize=", "displaysize=", "limit=" ]
+
+async def serve(program,host,port,path,quantum,nocheck):
+    """ Serves sessions of 'program' until interrupted. """
+    # verified once for all sessions
+    handler = sessionHandler(program,quantum,nocheck=nocheck,verify=False)
+    if path!=None:
+        server = await asyncio.start_unix_server(handler,path)
+        where = path
+    else:
+        server = await asyncio.start_server(handler,host,port)
+        where = "%s:%d" % (host,port)
+    Msg(SERVING % (where,quantum))
+    async with server:
+        await server.serve_forever()
+
+#======================================================================
+# Main
+#======================================================================
+
+
+if __name__ == "__main__":
+
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:],"h",SERVE_OPTIONS)
+    except getopt.GetoptError:
+        Msg(UNRECOGNIZED_OPTION)
+        Msg(Usage,quit=True,code=1)
+    if len(args)!=1:
+        Msg(Usage,quit=True,code=1)
+
+    host = "127.0.0.1"
+    port = path = None
+    quantum = QUANTUM
+    for o,a in opts:
+        o = o.lstrip("-")
+        if o=="h" or o=="help":
+            Msg(Usage,quit=True)
+        elif o=="nocheck":
+            OPTIONS_DICT[o] = True
+        elif o=="socket":
+            path = a
+        elif o=="host":
+            host = a
+        else:
+            try:
+                n = int(a)
+                if n<=0:
+                    raise ValueError
+            except ValueError:
+                Msg(ILLEGAL_OPTION % (o,a),quit=True,code=1)
+            if o=="port":
+                port = n
+            elif o=="quantum":
+                quantum = n
+            else:
+                OPTIONS_DICT[o] = n
+    if (port==None)==(path==None):
+        Msg(Usage,quit=True,code=1)
+
+    try:
+        if isObject(args[0]):
+            with open(args[0],"rb") as f:
+                program = readObject(f)
+            names = program.decoded()
+        else:
+            with open(args[0],"r") as f:
+                P, L = readProgram(f)
+            resolveArgs(P,L)
+            program = [P, L]
+            names = decodeProgram(P)
+    except OSError:
+        Msg(OPEN_FILE_ERROR % args[0],quit=True,code=1)
+    except MepaError as e:
+        Msg(str(e),quit=True,code=1)
+    # verified programs run without type checks
+    nocheck = OPTIONS_DICT["nocheck"] or verifyProgram(names)==None
+    try:
+        asyncio.run(serve(program,host,port,path,quantum,nocheck))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        Msg(str(e),quit=True,code=1)
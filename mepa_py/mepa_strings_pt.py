@@ -27,6 +27,7 @@ EXECUTION_ERROR = "Erro de execução %d"
 UNEXPECTED_EXCEPTION = "Exceção inesperada"
 OPTIONS_TITLE = "Opções:"
 STEP_STDIN = "Opção '--step' não pode ser usada sem '--progfile'\n"
+ENGINE_OPTION = "Opção '--%s' não pode ser usada com o motor '%s'"
 
 # main_defs.py
 
@@ -39,6 +40,7 @@ ILLEGAL_INSTRUCTION  = "Instrução inválida (%3d)  %s"
 ILLEGAL_INSTRUCTION_ARGUMENTS = "Argumentos inválidos para instrução %d:  %s" 
 REDEFINED_LABEL = "Rótulo redefinido (%3d)  %s" 
 ILLEGAL_ARGUMENT = "Argumento inválido ou rótulo indefinido na linha %3d" 
+LOAD_STATS = "Programa carregado: %d instruções em %.3fs (%.0f instruções/s)"
 
 # mepa_interp.py
 
@@ -60,3 +62,87 @@ END_DUMP = "\nFim de despejo"
 ILLEGAL_DEBUG_VALUE = "Valor inválido para depuração"
 OPEN_FILE_ERROR = "Erro na abertura do arquivo '%s'"
 ILLEGAL_VALUE = "Valor inválido encontrado durante a interpretação da instrução %d"
+FUSION_STATS = "Superinstruções (locais, execuções)"
+STACK_PEAK = "Pico da pilha: %d posições (%d alocadas, limite %d)"
+ADDRESS_STATS = "Endereços pré-resolvidos: %d globais, %d locais"
+JIT_STATS = "Laços compilados: %d, execuções de traços: %d, instruções em traços: %d"
+
+# mepa_batch_pt.py
+
+ILLEGAL_MANIFEST_LINE = "Linha inválida no arquivo de tarefas %d:  %s"
+NO_NUMPY = "NumPy não encontrado: com --lanes as tarefas são executadas uma a uma"
+BATCH_SUMMARY = "%d tarefas em %.2fs: %d corretas, %d erradas, %d com erro de execução, %d com erro no programa"
+
+# mepa_profile.py
+
+PROFILE_OPCODES = "Instruções mais executadas"
+PROFILE_LABELS = "Regiões de rótulos mais executadas"
+PROFILE_PROCEDURES = "Procedimentos mais executados"
+PROFILE_NO_LABEL = "(sem rótulo)"
+PROFILE_MAIN = "(programa principal)"
+
+# mepa_trace.py, mepa_replay_pt.py
+
+ILLEGAL_TRACE_FILE = "Arquivo de rastro inválido '%s'"
+TRACE_TRUNCATED = "Rastro com os últimos %d de %d registros"
+TRACE_STATE = "passo %d de %d: i=%s, s=%d"
+TRACE_LAST = "última instrução: %3d  %s"
+UNKNOWN_COMMAND = "Comando desconhecido '%s'"
+
+# checkpoints (mepa_vm.py)
+
+ILLEGAL_CHECKPOINT = "Arquivo de estado inválido '%s'"
+CHECKPOINT_PROGRAM = "Arquivo de estado '%s' é de outro programa"
+CHECKPOINT_WRITTEN = "Estado salvo em '%s' após %d instruções"
+
+# mepa_obj.py, mepa_asm_pt.py, mepa_dis_pt.py
+
+ILLEGAL_OBJECT_FILE = "Arquivo objeto inválido '%s'"
+OBJECT_OPERAND = "Argumento não representável no arquivo objeto %d:  %s"
+OBJECT_WRITTEN = "%d instruções e %d rótulos escritos em '%s'"
+
+# mepa_opt_pt.py
+
+OPTIMIZED = "Programa otimizado: %d instruções (eram %d)"
+
+# mepa_conform_pt.py
+
+CONFORM_MISMATCH = "Divergência: %s, motor %s, opções %s, entrada '%s'"
+CONFORM_EXPECTED = "    esperado %s\n    obtido   %s"
+CONFORM_EXCEPTION = "Exceção inesperada: %s"
+CONFORM_GROUP = "%s: %d programas, %d execuções por motor"
+CONFORM_ENGINE = "%12s: %10d instruções em %7.3f s (%9.0f instruções/s), %d divergências"
+CONFORM_FILES = "programas"
+CONFORM_GENERATED = "gerados"
+CONFORM_REGRESSIONS = "regressões"
+CONFORM_PROGRAM = "gerado %d.%d"
+CONFORM_FAILED = "%d divergências com a referência"
+CONFORM_PASSED = "Todos os motores conformes à referência (%s)"
+
+# mepa_serve_pt.py
+
+SERVING = "Sessões em %s, quantum de %d instruções"
+
+# mepa_verify.py
+
+VERIFIED = "Verificação: programa aceito, executado sem testes de tipos"
+VERIFIED_CHECKED = "Verificação: programa aceito"
+VERIFY_FAILED = "Verificação: instrução %d (%s): %s"
+TYPE_INT = "inteiro"
+TYPE_LEVEL = "nível"
+TYPE_ADDR = "endereço"
+TYPE_PROG = "endereço de programa"
+TYPE_UNDEF = "indefinido"
+V_TYPE = "operando %d do tipo %s, esperado %s"
+V_UNDERFLOW = "pilha esvaziada abaixo da base do quadro"
+V_HEIGHT = "alturas diferentes da pilha (%d e %d)"
+V_FRAME = "quadros diferentes nos caminhos que chegam à instrução"
+V_SHARED = "código compartilhado por rotinas diferentes"
+V_INSTR = "instrução não verificável"
+V_LEVEL = "nível léxico %d não verificável"
+V_GLOBAL = "global fora da área das variáveis globais"
+V_OUTSIDE = "armazenamento fora da parte conhecida da pilha"
+V_LINK = "armazenamento em uma célula de ligação"
+V_ENTRY = "entrada de procedimento com a pilha alterada"
+V_RETURN = "retorno com a pilha desbalanceada"
+V_PARAMS = "retornos com números diferentes de parâmetros"
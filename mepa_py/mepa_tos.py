@@ -0,0 +1,261 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Top of stack caching engine: the values of the top one or two cells,   #
+# when they are integers, are kept in local registers of the execution   #
+# loop, where the common instructions are dispatched inline. Registers   #
+# are written to memory (spilled) only before instructions which need    #
+# the memory, e.g. calls and indexed access, which then run the          #
+# instructions of a VM of mepa_vm.py sharing the memory and display.     #
+#                                                                        #
+# Values consumed from the registers are never written: cells above the  #
+# stack top may differ from mepa_vm.py, which is only visible to         #
+# programs reading uninitialized cells.                                  #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, operator
+
+from mepa_defs import *
+from mepa_interp import executeDecoded
+from mepa_vm import VM
+from mepa_obj import MepaObject
+
+# Instructions run inline, most frequent first
+LDVL, LDCT, BINARY, STVL, JMPF, JMP, NOP, UNARY, WRIT, OTHER = range(10)
+
+# Binary operations, as C functions where they exist
+BINARY_OPS = dict(OPERATIONS,
+                  add=operator.add, subt=operator.sub, mult=operator.mul,
+                  divi=operator.floordiv, less=operator.lt, grt=operator.gt,
+                  eql=operator.eq, dif=operator.ne, leq=operator.le,
+                  geq=operator.ge)
+
+def encode(vm):
+    """ List of (code, a, b, handler, args, step) entries for the
+        program loaded in 'vm': 'a' and 'b' are the arguments of inline
+        instructions, or the Python operation of a binary one; the
+        others run 'handler' of 'vm' (see 'VM.decode').
+    """
+    C = []
+    for (name, args), (fn, hargs, step, n) in zip(vm.names,vm.DP):
+        if args==None:
+            C.append((OTHER, 0, 0, fn, hargs, step))
+        elif name=="ldvl":
+            C.append((LDVL, args[0], args[1], fn, hargs, step))
+        elif name=="ldct":
+            C.append((LDCT, args[0], 0, fn, hargs, step))
+        elif name in BINARY_OPS:
+            C.append((BINARY, BINARY_OPS[name], 0, fn, hargs, step))
+        elif name=="stvl":
+            C.append((STVL, args[0], args[1], fn, hargs, step))
+        elif name=="jmpf":
+            C.append((JMPF, args[0], 0, fn, hargs, step))
+        elif name=="jmp":
+            C.append((JMP, args[0], 0, fn, hargs, step))
+        elif name=="nop":
+            C.append((NOP, 0, 0, fn, hargs, step))
+        elif name in ("inv", "nott"):
+            C.append((UNARY, name=="inv", 0, fn, hargs, step))
+        elif name=="writ":
+            C.append((WRIT, 0, 0, fn, hargs, step))
+        else:
+            C.append((OTHER, 0, 0, fn, hargs, step))
+    return C
+
+def executeTos(MP,P,L,msfile,infile,outfile,nocheck):
+    """Execution function with the top of the stack in registers.
+       Debugging options and instructions use 'executeDecoded'.
+    """
+    if debugging(decodeProgram(P)):
+        return executeDecoded(MP,P,L,msfile,infile,outfile,nocheck)
+
+    # other instructions, with the whole memory of the original
+    # interpreter
+    vm = VM(nocheck=nocheck,profile=False,stats=False,jit=False,
+            messfile=msfile,verify=False,resolve=False)
+    vm.load(P if isinstance(P,MepaObject) else [P,L])
+    vm.attach(infile,outfile)
+    vm.grow(vm.ceiling-1)
+    C = encode(vm)
+
+    i = 0
+    s = -1
+    D = vm.D
+    M = vm.M
+    size = len(M)
+
+    check = vm.check
+    limit = OPTIONS_DICT["limit"]
+    count = 0
+    write = outfile.write
+
+    ldvl, ldct, binary, stvl, jmpf, jmp, nop, unary, writ = \
+        LDVL, LDCT, BINARY, STVL, JMPF, JMP, NOP, UNARY, WRIT
+
+    # registers: y is the value of M[s] when k>0, x that of M[s-1] when
+    # k==2; those cells are not up to date in M
+    k = 0
+    x = y = None
+
+    # execution loop
+    while True:
+        li = i
+        try:
+            try:
+                op, a, b, fn, args, step = C[i]
+            except:
+                Msg(PROG_END,quit=True,code=1,file=msfile)
+            i += 1
+            if op==ldvl:
+                a = D[a]
+                assert a!=None
+                a += b
+                if k and (a>=s-k+1 or a<0):
+                    M[s] = [y,0]
+                    if k==2:
+                        M[s-1] = [x,0]
+                    k = 0
+                c = M[a]
+                if s+1>=size:
+                    raise IndexError
+                if c!=None and c[1]==0:
+                    if k==2:
+                        M[s-1] = [x,0]
+                        x = y
+                    elif k:
+                        x = y;  k = 2
+                    else:
+                        k = 1
+                    y = c[0]
+                else:
+                    if k:
+                        M[s] = [y,0]
+                        if k==2:
+                            M[s-1] = [x,0]
+                        k = 0
+                    M[s+1] = c
+                s += 1
+            elif op==ldct:
+                s += 1
+                assert size>s
+                if k==2:
+                    M[s-2] = [x,0]
+                    x = y
+                elif k:
+                    x = y;  k = 2
+                else:
+                    k = 1
+                y = a
+            elif op==binary:
+                if k==2:
+                    v = a(x,y)
+                elif k:
+                    c = M[s-1]
+                    if check:
+                        assert c[1]==0
+                    v = a(c[0],y)
+                else:
+                    c = M[s-1];  d = M[s]
+                    if check:
+                        assert c[1]==0 and d[1]==0
+                    v = a(c[0],d[0])
+                s -= 1
+                y = v;  k = 1
+            elif op==stvl:
+                a = D[a]
+                assert a!=None
+                a += b
+                if k:
+                    if a>=s-k+1 or a<0:
+                        M[s] = [y,0]
+                        if k==2:
+                            M[s-1] = [x,0]
+                        k = 0
+                        M[a] = M[s]
+                    else:
+                        M[a] = [y,0]
+                        if k==2:
+                            y = x;  k = 1
+                        else:
+                            k = 0
+                else:
+                    M[a] = M[s]
+                s -= 1
+            elif op==jmpf:
+                if k:
+                    v = y
+                    if k==2:
+                        y = x;  k = 1
+                    else:
+                        k = 0
+                else:
+                    c = M[s]
+                    if check:
+                        assert c[1]==0
+                    v = c[0]
+                s -= 1
+                if not v:
+                    i = a
+            elif op==jmp:
+                i = a
+            elif op==nop:
+                pass
+            elif op==unary:
+                if not k:
+                    c = M[s]
+                    if check:
+                        assert c[1]==0
+                    y = c[0];  k = 1
+                y = -y if a else 1-y
+            elif op==writ:
+                if k:
+                    v = y
+                else:
+                    c = M[s]
+                    if check:
+                        assert c[1]==0
+                    v = c[0]
+                write("%d\n" % v)
+                if k==2:
+                    y = x;  k = 1
+                else:
+                    k = 0
+                s -= 1
+            else:
+                # spill and run the handler
+                if k:
+                    M[s] = [y,0]
+                    if k==2:
+                        M[s-1] = [x,0]
+                    k = 0
+                vm.s = s
+                r = fn(*args)
+                s = vm.s
+                if r is not None:
+                    i = r
+            count += 1
+        except MepaError as e:
+            Msg(str(e),quit=True,code=e.code,file=msfile)
+        except AssertionError as e:
+            Msg("\n"+ILLEGAL_ARGUMENT_TYPE,file=msfile)
+            sys.exit(1)
+        except SystemExit as e:
+            sys.exit(1)
+        except IndexError:
+            if op!=OTHER:
+                Msg(ILLEGAL_VALUE % li, quit=True,file=msfile)
+            # errors of the memory size as in 'VM.execute'
+            e = vm.overflow(li,vm.reach(li))
+            Msg(str(e),quit=True,code=e.code,file=msfile)
+        except:
+            Msg(ILLEGAL_VALUE % li, quit=True,file=msfile)
+        if i<0:      # halt()
+            Msg(EXECUTED_INSTRUCTIONS % count,file=msfile)
+            return -1
+        if count>=limit:
+            Msg(MAXIMUM_INSTRUCTIONS_EXCEEDED % limit,quit=True,code=1,
+                file=msfile)
@@ -0,0 +1,231 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Binary execution traces.                                               #
+#                                                                        #
+# Every executed instruction produces a fixed-size record with its       #
+# address (pc), the value of 's' after it, its code (index in INSTR_ALL) #
+# and one written location: effective address, tag and value. Further    #
+# locations written by the same instruction follow in records with code  #
+# MORE. Addresses of the display are negative: D[k] is -(k+1). Tag       #
+# NOWRITE marks an instruction writing nothing and tag UNDEF a copied    #
+# uninitialized cell; values are limited to 64 bits.                     #
+#                                                                        #
+# Records go to a file as they are produced or, with a size, to a        #
+# preallocated ring keeping the last records, written at the end.        #
+#                                                                        #
+# A trace is replayed by 'Replay', which moves forward and backward over #
+# the executed instructions (see mepa_replay_pt.py).                     #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import struct
+
+from mepa_defs import *
+
+MAGIC = b"MEPT"
+VERSION = 2
+
+# magic, version, record size, records produced, records in the file
+HEADER = struct.Struct("<4sHHqq")
+
+# pc, s, code, tag, effective address, value
+RECORD = struct.Struct("<iiBBxxiq")
+
+MORE = 255
+NOWRITE = 254
+UNDEF = 255
+
+# Bytes kept before writing to the file
+FILE_BUFFER = 1<<20
+
+class TraceWriter:
+    """ Trace file 'name'; with 'size' only the last 'size' records
+        are kept.
+    """
+
+    def __init__(self,name,size=0):
+        self.name = name
+        self.size = size
+        self.total = 0
+        if size:
+            self.buf = bytearray(size*RECORD.size)
+        else:
+            self.buf = bytearray()
+            self.f = open(name,"wb")
+            self.f.write(HEADER.pack(MAGIC,VERSION,RECORD.size,0,0))
+
+    def record(self,pc,s,code,ea,tag,v):
+        try:
+            r = RECORD.pack(pc,s,code,tag,ea,v)
+        except struct.error:
+            r = RECORD.pack(pc,s,code,tag,ea,
+                            ((int(v)+(1<<63)) % (1<<64))-(1<<63))
+        if self.size:
+            k = (self.total % self.size)*RECORD.size
+            self.buf[k:k+RECORD.size] = r
+        else:
+            self.buf += r
+            if len(self.buf)>=FILE_BUFFER:
+                self.f.write(self.buf)
+                self.buf = bytearray()
+        self.total += 1
+
+    def close(self):
+        if self.size:
+            n = min(self.total,self.size)
+            k = (self.total % self.size)*RECORD.size if self.total>n else 0
+            with open(self.name,"wb") as f:
+                f.write(HEADER.pack(MAGIC,VERSION,RECORD.size,self.total,n))
+                f.write(self.buf[k:n*RECORD.size])
+                f.write(self.buf[:k])
+        else:
+            self.f.write(self.buf)
+            self.f.seek(0)
+            self.f.write(HEADER.pack(MAGIC,VERSION,RECORD.size,
+                                     self.total,self.total))
+            self.f.close()
+
+# Locations of the memory written by each instruction, from the state
+# before it and its arguments; the display is compared instead.
+
+def top1(vm,*args):
+    return (vm.s,)
+
+def below(vm,*args):
+    return (vm.s-1,)
+
+def push1(vm,*args):
+    return (vm.s+1,)
+
+def push3(vm,*args):
+    return (vm.s+1,vm.s+2,vm.s+3)
+
+WRITES = dict.fromkeys(BINARY_INSTR+["indx"],below)
+WRITES.update(dict.fromkeys(["inv","nott","cont"],top1))
+WRITES.update(dict.fromkeys(["ldct","ldvl","ldaddr","ldvi","read",
+                             "entproc"],push1))
+WRITES["entprocd"] = lambda vm,k: (vm.s+1,vm.s,vm.s-1)
+WRITES.update(dict.fromkeys(["ldgaddr","call","callpar"],push3))
+WRITES["stvl"] = lambda vm,m,n: (vm.D[m]+n,)
+WRITES["stvi"] = lambda vm,m,n: (vm.M[vm.D[m]+n][0],)
+WRITES["ldmv"] = lambda vm,k: range(vm.s,vm.s+k)
+WRITES["stmv"] = lambda vm,k: range(vm.M[vm.s-k][0],vm.M[vm.s-k][0]+k)
+
+def traced(vm,fn,pc,name,iargs=None):
+    """ Handler 'fn' of address 'pc' writing the records of its
+        executions to 'vm.trace'; 'iargs' are the arguments of the
+        instruction, if the handler takes others.
+    """
+    code = INSTR_ALL.index(name)
+    writes = WRITES.get(name)
+    rec = vm.trace.record
+    def f(*args):
+        addrs = ()
+        if writes!=None:
+            try:
+                addrs = writes(vm,*(args if iargs==None else iargs))
+            except:
+                pass    # the instruction reports the error
+        D0 = vm.D[:]
+        r = fn(*args)
+        M = vm.M;  D = vm.D;  s = vm.s
+        c = code
+        for ea in addrs:
+            if ea<0:
+                ea += len(M)
+            cell = M[ea]
+            if cell==None or cell[0]==None:
+                rec(pc,s,c,ea,UNDEF,0)
+            else:
+                rec(pc,s,c,ea,cell[1],cell[0])
+            c = MORE
+        for k in range(len(D)):
+            if D[k]!=D0[k]:
+                if D[k]==None:
+                    rec(pc,s,c,-(k+1),UNDEF,0)
+                else:
+                    rec(pc,s,c,-(k+1),2,D[k])
+                c = MORE
+        if c==code:
+            rec(pc,s,c,0,NOWRITE,0)
+        return r
+    return f
+
+class Replay:
+    """ Machine states of trace file 'name': 'step' instructions of
+        the trace have been applied. Cells not written in the trace
+        are unknown, as well as everything before the first record of
+        a ring.
+    """
+
+    def __init__(self,name):
+        with open(name,"rb") as f:
+            data = f.read()
+        magic, version, size, self.total, n = HEADER.unpack_from(data)
+        if magic!=MAGIC or version!=VERSION or size!=RECORD.size:
+            raise MepaError(ILLEGAL_TRACE_FILE % name)
+        # steps: (pc, s, code, [(ea, tag, value), ...])
+        self.steps = []
+        for k in range(n):
+            pc, s, code, tag, ea, v = RECORD.unpack_from(data,
+                                          HEADER.size+k*RECORD.size)
+            if code==MORE:
+                if self.steps:     # a ring may start in the middle
+                    self.steps[-1][3].append((ea,tag,v))
+                continue
+            w = [] if tag==NOWRITE else [(ea,tag,v)]
+            self.steps.append((pc,s,code,w))
+        self.records = n
+        self.truncated = self.total>n
+        self.M = {}
+        self.D = {}
+        self.s = -1
+        self.step = 0
+        self.undo = []
+
+    def name(self,k):
+        """ Instruction name of step 'k' (from 1). """
+        return INSTR_ALL[self.steps[k-1][2]]
+
+    def pc(self):
+        """ Address of the next instruction, None at the end. """
+        if self.step<len(self.steps):
+            return self.steps[self.step][0]
+        return None
+
+    def forward(self,n=1):
+        while n>0 and self.step<len(self.steps):
+            pc, s, code, w = self.steps[self.step]
+            old = []
+            for ea, tag, v in w:
+                if ea<0:
+                    old.append((ea,self.D.get(-ea-1)))
+                    self.D[-ea-1] = None if tag==UNDEF else v
+                else:
+                    old.append((ea,self.M.get(ea)))
+                    self.M[ea] = None if tag==UNDEF else (v,tag)
+            self.undo.append((self.s,old))
+            self.s = s
+            self.step += 1
+            n -= 1
+
+    def backward(self,n=1):
+        while n>0 and self.step>0:
+            self.s, old = self.undo.pop()
+            for ea, v in reversed(old):
+                if ea<0:
+                    self.D[-ea-1] = v
+                else:
+                    self.M[ea] = v
+            self.step -= 1
+            n -= 1
+
+    def goto(self,k):
+        if k>self.step:
+            self.forward(k-self.step)
+        else:
+            self.backward(self.step-k)
@@ -0,0 +1,567 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Static verifier: abstract interpretation over the control flow graph   #
+# computing, at every address, the stack height and the possible types   #
+# of its cells (int, level, mem addr, prog addr, uninitialized). A       #
+# program passes when every operand checked by the interpreters (DSVF,   #
+# IMPR, arithmetic, returns) can only have the expected type, no path   #
+# pops below the base of its frame and no store reaches the linkage of   #
+# a call; such programs behave in the same way with '--nocheck', which  #
+# 'mepa_pt.py' and the VM then use, except on the reference engine.     #
+#                                                                        #
+# The main program and each procedure (the targets of CHPR) are          #
+# analyzed apart. A procedure sees the top of its callers' stacks,      #
+# joined over every call, below its linkage; its summary is the number  #
+# of cells popped by its return and the types left in the cells it      #
+# wrote there, and in the globals. The globals accessed by procedures    #
+# must lie below every cell that a procedure reaches from its frame.    #
+# Only the instructions of compiled programs, with       #
+# procedures of level 1, are accepted: indirect accesses, arrays,       #
+# ENRT and CHPP make a program fail.                                     #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+from mepa_defs import *
+
+# Types of cells, as bits; the linkage cells pushed by CHPR and ENPR
+# have their own bits, so stores into them are detected
+INT, LEVEL, ADDR, PROG, UNDEF = 1, 2, 4, 8, 16
+L_RET, L_ADDR, L_LEVEL, L_DISP = 32, 64, 128, 256
+ANY = INT | LEVEL | ADDR | PROG | UNDEF
+LINK = L_RET | L_ADDR | L_LEVEL | L_DISP
+
+TYPE_NAMES = [ (INT, TYPE_INT), (LEVEL, TYPE_LEVEL), (ADDR, TYPE_ADDR),
+               (PROG, TYPE_PROG), (UNDEF, TYPE_UNDEF) ]
+
+UNARY = [ "inv", "nott" ]
+
+# Instructions without effect on the stack
+NO_EFFECT = [ "nop" ] + DEBUG_INSTR
+
+# Mnemonics for the diagnostics
+MNEMONICS = dict((v,k) for k, v in INSTR_DICT.items())
+
+# Entries of a node of 'Cells'
+BITS = 5
+WIDTH = 1<<BITS
+MASK = WIDTH-1
+
+class VerifyError(Exception):
+    pass
+
+def plain(t):
+    """ Types of the value of a cell with types 't'. """
+    v = t & ANY
+    if t & L_RET:
+        v |= PROG
+    if t & (L_ADDR | L_DISP):
+        v |= ADDR
+    if t & L_LEVEL:
+        v |= LEVEL
+    return v
+
+def typeNames(t):
+    return "|".join(name for bit, name in TYPE_NAMES if t & bit)
+
+class Cells:
+    """ Immutable sequence of cell types: the last ones (up to WIDTH)
+        in a tuple, the others in a tree of tuples of WIDTH entries,
+        with the types in the leaves. A new sequence shares the nodes
+        it does not change, so that a push, pop or store costs at most
+        the logarithm of the number of cells, and so does the
+        comparison of sequences sharing their nodes.
+    """
+    __slots__ = ("root", "n", "shift", "tail")
+
+    def __init__(self,root=(),n=0,shift=0,tail=()):
+        self.root = root
+        self.n = n
+        self.shift = shift
+        self.tail = tail
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        if self.n>len(self.tail):
+            yield from cellsOf(self.root,self.shift)
+        yield from self.tail
+
+    def __getitem__(self,i):
+        n = self.n
+        if i<0:
+            i += n
+        if not 0<=i<n:
+            raise IndexError(i)
+        b = n-len(self.tail)
+        if i>=b:
+            return self.tail[i-b]
+        return leafOf(self.root,self.shift,i)[i&MASK]
+
+    def __eq__(self,other):
+        return isinstance(other,Cells) and self.n==other.n and \
+               self.tail==other.tail and self.root==other.root
+
+    def __ne__(self,other):
+        return not self==other
+
+    def __hash__(self):
+        return hash(self.tail)
+
+    def extend(self,types):
+        """ Sequence with tuple 'types' pushed. """
+        root, shift, tail = self.root, self.shift, self.tail
+        b = self.n-len(tail)
+        while True:
+            k = WIDTH-len(tail)
+            tail += types[:k]
+            types = types[k:]
+            if not types:
+                return Cells(root,b+len(tail),shift,tail)
+            if b>0 and b==1<<(shift+BITS):
+                root = (root,)
+                shift += BITS
+            root = pushLeaf(root,shift,b,tail)
+            b += WIDTH
+            tail = ()
+
+    def truncate(self,n):
+        """ First 'n' cells. """
+        if n==0:
+            return EMPTY
+        b = self.n-len(self.tail)
+        if n>b:
+            return Cells(self.root,n,self.shift,self.tail[:n-b])
+        # the last leaf left becomes the tail
+        b = (n-1)>>BITS<<BITS
+        tail = leafOf(self.root,self.shift,b)[:n-b]
+        if b==0:
+            return Cells((),n,0,tail)
+        root = truncateCells(self.root,self.shift,b)
+        shift = self.shift
+        while shift>0 and len(root)==1:
+            root = root[0]
+            shift -= BITS
+        return Cells(root,n,shift,tail)
+
+    def replace(self,i,t):
+        """ Sequence with types 't' at index 'i'. """
+        n = self.n
+        if i<0:
+            i += n
+        b = n-len(self.tail)
+        if i>=b:
+            i -= b
+            return Cells(self.root,n,self.shift,
+                         self.tail[:i]+(t,)+self.tail[i+1:])
+        return Cells(replaceCell(self.root,self.shift,i,t),n,self.shift,
+                     self.tail)
+
+    def join(self,other):
+        """ Union of the types of each cell, for sequences of the same
+            length.
+        """
+        return Cells(joinCells(self.root,other.root,self.shift),self.n,
+                     self.shift,joinCells(self.tail,other.tail,0))
+
+    def union(self,other):
+        """ Join of the cells of both sequences, followed by the last
+            cells of the longer one.
+        """
+        a, b = (self, other) if len(self)<=len(other) else (other, self)
+        if len(a)==len(b):
+            return a.join(b)
+        return a.join(b.truncate(len(a))).extend(b.top(len(b)-len(a)))
+
+    def top(self,n):
+        """ Tuple of the types of the last 'n' cells. """
+        return tuple(self[j] for j in range(self.n-n,self.n))
+
+# Nodes of the tree of 'Cells', for a node 'shift' bits above the leaves
+
+def cellsOf(node,shift):
+    if shift==0:
+        yield from node
+    else:
+        for c in node:
+            yield from cellsOf(c,shift-BITS)
+
+def leafOf(node,shift,i):
+    while shift>0:
+        node = node[(i>>shift)&MASK]
+        shift -= BITS
+    return node
+
+def pushLeaf(node,shift,i,leaf):
+    if shift==0:
+        return leaf
+    j = (i>>shift)&MASK
+    if j<len(node):
+        return node[:j]+(pushLeaf(node[j],shift-BITS,i,leaf),)
+    return node+(pushLeaf((),shift-BITS,i,leaf),)
+
+def truncateCells(node,shift,n):
+    if shift==0:
+        return node[:n]
+    j = (n-1)>>shift
+    return node[:j]+(truncateCells(node[j],shift-BITS,n-(j<<shift)),)
+
+def replaceCell(node,shift,i,t):
+    j = (i>>shift)&MASK
+    if shift>0:
+        t = replaceCell(node[j],shift-BITS,i,t)
+    return node[:j]+(t,)+node[j+1:]
+
+def joinCells(a,b,shift):
+    if a is b or a==b:
+        return a
+    if shift==0:
+        return tuple(x|y for x, y in zip(a,b))
+    return tuple(joinCells(x,y,shift-BITS) for x, y in zip(a,b))
+
+# No cells
+EMPTY = Cells()
+
+class State:
+    """ Abstract state at an address: types of the visible cells, from
+        the deepest known one to the top (Cells); index of the frame base
+        (None before INPP or ENPR) and of the lowest cell which may be
+        popped; first index of cells never written (None if unknown);
+        in procedures, depths below the linkage written, types of the
+        globals (Cells) and globals written.
+    """
+    __slots__ = ("cells", "fb", "floor", "fresh", "written", "globs",
+                 "wglobs")
+
+    def __init__(self,cells,fb,floor,fresh,written,globs=EMPTY,
+                 wglobs=frozenset()):
+        self.cells = cells
+        self.fb = fb
+        self.floor = floor
+        self.fresh = fresh
+        self.written = written
+        self.globs = globs
+        self.wglobs = wglobs
+
+    def key(self):
+        return (self.cells, self.fb, self.floor, self.fresh, self.written,
+                self.globs, self.wglobs)
+
+    def join(self,other):
+        if len(self.cells)!=len(other.cells):
+            raise VerifyError(V_HEIGHT % (len(self.cells),len(other.cells)))
+        if self.fb!=other.fb or self.floor!=other.floor:
+            raise VerifyError(V_FRAME)
+        fresh = None if self.fresh==None or other.fresh==None else \
+                max(self.fresh,other.fresh)
+        return State(self.cells.join(other.cells),
+                     self.fb, self.floor, fresh,
+                     self.written | other.written,
+                     self.globs.join(other.globs),
+                     self.wglobs | other.wglobs)
+
+class Verifier:
+    """ Verification of decoded program DP. """
+
+    def __init__(self,DP):
+        self.DP = DP
+        self.entries = {}      # procedure -> types below its linkage
+        self.gentries = {}     # procedure -> types of the globals
+        self.summaries = {}    # procedure -> (popped, {depth: types},
+                               #               {global: types})
+        self.reach = {}        # procedure -> deepest cell reached
+        self.limit = None      # globals of procedures are below it
+        self.callers = {}      # procedure -> routines calling it
+        self.owner = {}        # address -> routine
+        self.work = []
+        self.queued = set()
+
+    def run(self):
+        """ Analyzes the routines again while what they see of the
+            others changes.
+        """
+        self.schedule(None)
+        while self.work:
+            p = self.work.pop(0)
+            self.queued.discard(p)
+            self.routine(p)
+
+    def schedule(self,p):
+        if not p in self.queued:
+            self.queued.add(p)
+            self.work.append(p)
+
+    def changed(self,p):
+        """ What procedure p leaves to its callers changed. """
+        for q in self.callers.get(p,()):
+            self.schedule(q)
+
+    def routine(self,p):
+        """ Analysis of the main program (p is None) or of procedure p. """
+        DP = self.DP
+        if p==None:
+            start = State(EMPTY,None,0,0,frozenset())
+            entry = 0
+        else:
+            below = self.entries[p]
+            n = max(self.limit or 0,0)
+            globs = self.gentries[p]
+            globs = globs.truncate(min(n,len(globs)))
+            globs = globs.extend((n-len(globs))*(ANY,))
+            start = State(below.extend((L_RET,L_ADDR,L_LEVEL)),None,
+                          len(below)+3,None,frozenset(),globs)
+            entry = p
+            self.below = len(below)
+            self.reach.setdefault(p,-1)
+        self.p = p
+        states = { entry: start }
+        work = [entry]
+        while work:
+            k = work.pop()
+            self.k = k
+            if self.owner.setdefault(k,p)!=p:
+                raise VerifyError(V_SHARED)
+            for j, S in self.transfer(k,states[k]):
+                if not 0<=j<len(DP):
+                    continue    # reported in the same way by every engine
+                old = states.get(j)
+                self.k = j
+                new = S if old==None else old.join(S)
+                if old==None or new.key()!=old.key():
+                    states[j] = new
+                    work.append(j)
+
+    # Cells
+
+    def fail(self,msg):
+        raise VerifyError(msg)
+
+    def need(self,t,want,n):
+        """ Operand n (1 for the top) of types 't' must be of type 'want'. """
+        t = plain(t)
+        if t!=want:
+            self.fail(V_TYPE % (n,typeNames(t),typeNames(want)))
+
+    def pop(self,S,n):
+        if len(S.cells)-n<S.floor:
+            self.fail(V_UNDERFLOW)
+        return S.cells.truncate(len(S.cells)-n)
+
+    def new(self,S,cells,fb=False,floor=None,fresh=False,written=None):
+        if len(cells)>len(S.cells) and S.fresh!=None:
+            fresh = len(cells) if fresh is False else fresh
+            fresh = max(fresh,S.fresh)
+        return State(cells, S.fb if fb is False else fb,
+                     S.floor if floor==None else floor,
+                     S.fresh if fresh is False else fresh,
+                     S.written if written==None else written,
+                     S.globs, S.wglobs)
+
+    def level(self,S):
+        if S.fb==None:
+            return None
+        return 0 if self.p==None else 1
+
+    def depth(self,S,idx):
+        """ Depth below the linkage of procedure cell 'idx', recorded as
+            reached.
+        """
+        d = self.below-1-idx
+        if d>self.reach[self.p]:
+            self.reach[self.p] = d
+            self.changed(self.p)
+        return d
+
+    def load(self,S,m,n):
+        """ Types of the cell at (m,n). """
+        lev = self.level(S)
+        if lev==None or m!=lev:
+            if self.p!=None and m==0 and 0<=n<len(S.globs):
+                return S.globs[n]
+            return ANY
+        idx = S.fb+n
+        if self.p!=None and idx<self.below:
+            self.depth(S,idx)
+        if 0<=idx<len(S.cells):
+            return S.cells[idx]
+        if idx>=0 and S.fresh!=None and idx>=S.fresh:
+            return UNDEF
+        return ANY
+
+    def store(self,S,m,n,t):
+        """ State after storing a value of types 't' at (m,n). """
+        lev = self.level(S)
+        if self.p!=None and m==0 and lev!=None:
+            if not 0<=n<len(S.globs):
+                self.fail(V_GLOBAL)
+            return State(S.cells,S.fb,S.floor,S.fresh,S.written,
+                         S.globs.replace(n,t),S.wglobs|{n})
+        if lev==None or m!=lev:
+            self.fail(V_LEVEL % m)
+        idx = S.fb+n
+        if not 0<=idx<len(S.cells):
+            self.fail(V_OUTSIDE)
+        if S.cells[idx] & LINK:
+            self.fail(V_LINK)
+        written = S.written
+        if self.p!=None and idx<self.below:
+            written = written | {self.depth(S,idx)}
+        return self.new(S,S.cells.replace(idx,t),written=written)
+
+    # Transfer functions: list of (address, state) successors
+
+    def transfer(self,k,S):
+        name, args = self.DP[k]
+        cells = S.cells
+        if args==None:
+            self.fail(V_INSTR)
+        if name in NO_EFFECT:
+            return [(k+1,S)]
+        if name=="halt":
+            return []
+        if name=="init":
+            if self.p!=None:
+                self.fail(V_INSTR)
+            return [(k+1,State(EMPTY,0,0,S.fresh,frozenset()))]
+        if name=="jmp":
+            return [(args[0],S)]
+        if name=="jmpf":
+            T = self.new(S,self.pop(S,1))
+            self.need(cells[-1],INT,1)
+            return [(args[0],T), (k+1,T)]
+        if name in ("ldct", "read"):
+            return [(k+1,self.new(S,cells.extend((INT,))))]
+        if name=="writ":
+            T = self.new(S,self.pop(S,1))
+            self.need(cells[-1],INT,1)
+            return [(k+1,T)]
+        if name in BINARY_INSTR:
+            rest = self.pop(S,2)
+            self.need(cells[-1],INT,1)
+            self.need(cells[-2],INT,2)
+            return [(k+1,self.new(S,rest.extend((INT,))))]
+        if name in UNARY:
+            self.pop(S,1)
+            self.need(cells[-1],INT,1)
+            return [(k+1,S)]
+        if name in ("alloc", "dealloc"):
+            n = args[0] if name=="alloc" else -args[0]
+            if n<0:
+                return [(k+1,self.new(S,self.pop(S,-n)))]
+            new = tuple(UNDEF if S.fresh!=None and j>=S.fresh else ANY
+                        for j in range(len(cells),len(cells)+n))
+            return [(k+1,self.new(S,cells.extend(new)))]
+        if name=="ldvl":
+            t = plain(self.load(S,args[0],args[1]))
+            return [(k+1,self.new(S,cells.extend((t,))))]
+        if name=="ldaddr":
+            return [(k+1,self.new(S,cells.extend((ADDR,))))]
+        if name=="stvl":
+            rest = self.pop(S,1)
+            T = self.new(S,rest)
+            return [(k+1,self.store(T,args[0],args[1],plain(cells[-1])))]
+        if name=="call":
+            return self.call(k,S,args[0],args[1])
+        if name in ("entproc", "entprocd"):
+            if self.p==None or S.fb!=None or args[0]!=1:
+                self.fail(V_LEVEL % args[0])
+            if len(cells)!=self.below+3:
+                self.fail(V_ENTRY)
+            fb = len(cells)+1
+            return [(k+1,self.new(S,cells.extend((L_DISP,)),fb=fb,
+                                  floor=fb))]
+        if name in ("retproc", "retprocd"):
+            self.ret(S,args[0])
+            return []
+        self.fail(V_INSTR)
+
+    def call(self,k,S,p,lev):
+        cells = S.cells
+        if lev!=self.level(S) or lev>1:
+            self.fail(V_LEVEL % lev)
+        if not 0<=p<len(self.DP):
+            return []
+        self.callers.setdefault(p,set()).add(self.p)
+        # the procedure sees the top of the stack
+        old = self.entries.get(p)
+        if old==None:
+            new = cells
+        elif len(old)==len(cells):
+            new = old.join(cells)
+        else:
+            n = min(len(old),len(cells))
+            new = EMPTY.extend(tuple(a|b for a, b in
+                                     zip(old.top(n),cells.top(n))))
+        # and the globals
+        gold = self.gentries.get(p,EMPTY)
+        gnew = gold.union(cells if self.p==None else S.globs)
+        if new!=old or gnew!=gold:
+            self.entries[p] = new
+            self.gentries[p] = gnew
+            self.schedule(p)
+        reach = self.reach.get(p,-1)
+        if self.p==None:
+            limit = len(cells)-1-reach
+            if self.limit==None or limit<self.limit:
+                self.limit = limit
+                for q in self.entries:
+                    self.schedule(q)
+        if not p in self.summaries:
+            return []
+        n, types, gtypes = self.summaries[p]
+        rest = self.pop(S,n)
+        written = S.written
+        top = len(cells)-1
+        if self.p!=None and top-reach<self.below:
+            self.depth(S,top-reach)
+        for d, t in types.items():
+            if d>=n:
+                rest = rest.replace(top-d,t)
+                if self.p!=None and top-d<self.below:
+                    written = written | {self.depth(S,top-d)}
+        globs = S.globs
+        for g, t in gtypes.items():
+            if self.p==None and g<len(rest):
+                rest = rest.replace(g,t)
+            elif self.p!=None and g<len(globs):
+                globs = globs.replace(g,t)
+        return [(k+1,State(rest,S.fb,S.floor,None,written,globs,
+                           S.wglobs|set(gtypes)))]
+
+    def ret(self,S,n):
+        cells = S.cells
+        fb = S.fb
+        if self.p==None or fb==None or n<0:
+            self.fail(V_RETURN)
+        if len(cells)!=fb or cells.top(4)!=(L_RET,L_ADDR,L_LEVEL,L_DISP):
+            self.fail(V_RETURN)
+        types = dict((d,cells[self.below-1-d]) for d in S.written)
+        gtypes = dict((g,S.globs[g]) for g in S.wglobs)
+        old = self.summaries.get(self.p)
+        if old!=None:
+            if old[0]!=n:
+                self.fail(V_PARAMS)
+            for d, t in old[1].items():
+                types[d] = types.get(d,0) | t
+            for g, t in old[2].items():
+                gtypes[g] = gtypes.get(g,0) | t
+        if old!=(n, types, gtypes):
+            self.summaries[self.p] = (n, types, gtypes)
+            self.changed(self.p)
+
+def verifyProgram(DP):
+    """ None when decoded program DP passes the verification, or the
+        diagnostic of the first failure.
+    """
+    v = Verifier(DP)
+    try:
+        v.run()
+    except VerifyError as e:
+        k = v.k
+        name, args = DP[k]
+        return VERIFY_FAILED % (k,MNEMONICS.get(name,name),str(e))
+    return None
@@ -0,0 +1,1381 @@
+#------------------------------------------------------------------------#
+# See mepa.py file for description, history and copyright.               #
+#------------------------------------------------------------------------#
+
+#------------------------------------------------------------------------#
+#                                                                        #
+# Re-entrant MEPA machine: registers, memory, display, labels and I/O    #
+# streams belong to a VM object instead of module globals, so several    #
+# programs may be loaded and run in the same process.                    #
+#                                                                        #
+#    vm = VM(limit=100000)                                               #
+#    vm.load(open("prog.mep"))                                           #
+#    count = vm.run(infile,outfile)      # raises MepaError              #
+#                                                                        #
+# The memory is allocated in segments as the stack grows, up to twice    #
+# the stack size ('ceiling'), the memory of the original interpreter.    #
+# Accesses do not check the size: an IndexError adds the segments up to  #
+# the address the instruction accesses beyond the memory ('reach'), and  #
+# the instruction, which changes no register before its memory accesses, #
+# is executed again. Negative addresses, which Python takes from the end #
+# of a list, first grow the memory to the ceiling ('far'). 'peak' is the #
+# number of memory cells ever used; with '--stats' it is reported by     #
+# 'executeVM', also after an error.                                      #
+#                                                                        #
+# A snapshot of the state ('checkpoint') may be restored by a VM with    #
+# the same program, possibly in another process, and execution goes on   #
+# with 'resume'.                                                         #
+#                                                                        #
+# The methods of the VM are the instructions, with their debugging       #
+# output, and the superinstructions (see 'fuseProgram'). With            #
+# 'evaluate', each instruction runs by 'eval' of its MEPA string, as in  #
+# the reference engine (see mepa_interp.py). Otherwise instructions are  #
+# pre-decoded and, without debugging, accesses to globals and to the     #
+# current frame take their addresses without the display (see            #
+# 'addressProgram'), unless 'resolve' is False. With 'jit', hot loops    #
+# run as compiled traces (see mepa_jit.py).                              #
+#                                                                        #
+# Programs passing the static verifier (see mepa_verify.py) run without  #
+# type checks, unless 'verify' is False.                                 #
+#                                                                        #
+#------------------------------------------------------------------------#
+
+import sys, io, json, zlib, hashlib
+
+from mepa_defs import *
+from mepa_io import Input, Output, OUT_BUFFER, InputPending
+from mepa_profile import profile, writeProfile, profileTables
+from mepa_trace import TraceWriter, traced
+from mepa_obj import MepaObject
+from mepa_jit import Jit
+from mepa_verify import verifyProgram
+
+# Beginning of checkpoint files, followed by compressed JSON
+CHECKPOINT_MAGIC = b"MEPA-CHECKPOINT 1\n"
+
+# Instructions keeping the frame base with pre-resolved addressing
+FRAME_INSTR = [ "entproc", "entprocd", "retproc", "retprocd" ]
+
+# Memory cells added at a time
+SEGMENT = 1<<12
+
+# Cells pushed by the instructions which checked the memory size in the
+# original interpreter, where an overflow is an illegal argument ("read"
+# and "ldmv" check it themselves)
+SIZE_CHECKED = { "ldct": 1, "entproc": 1, "entprocd": 1, "ldgaddr": 3,
+                 "call": 3, "callpar": 3 }
+
+class VM:
+    """ MEPA machine; options not given are taken from OPTIONS_DICT. """
+
+    def __init__(self,stacksize=None,displaysize=None,limit=None,
+                 nocheck=None,debug=None,step=None,stats=None,
+                 profile=None,trace=None,jit=None,messfile=None,
+                 verify=True,evaluate=False,resolve=True):
+        def option(v,k):
+            return OPTIONS_DICT[k] if v==None else v
+        self.stacksize = option(stacksize,"stacksize")
+        # same number of cells as in the original interpreter
+        self.ceiling = 2*self.stacksize
+        self.displaysize = option(displaysize,"displaysize")
+        self.limit = option(limit,"limit")
+        self.checkopt = not option(nocheck,"nocheck")
+        self.check = self.checkopt
+        self.verify = verify
+        self.debugopt = option(debug,"debug")
+        self.stepopt = option(step,"step")
+        self.stats = option(stats,"stats")
+        self.profile = bool(option(profile,"profile"))
+        self.trace = trace
+        self.jitopt = option(jit,"jit")
+        self.evaluate = evaluate
+        self.resolve = resolve and not evaluate
+        self.jit = None
+        self.counts = []
+        self.mess = messfile if messfile!=None else sys.stderr
+        self.P = []
+        self.L = {}
+        self.DP = self.FP = []
+        self.names = []
+        self.frames = []
+        self.resolved = (0, 0)
+        self.sites = self.fired = {}
+        self.reset()
+
+    def reset(self):
+        """ Initial register values, memory and input buffer. """
+        self.i = 0
+        self.s = -1
+        self.D = self.displaysize * [None]
+        # memory is [v,t] where v: value, t: type (0: int, 1: level,
+        # 2: mem addr, 3: prog address); first segment
+        self.M = min(SEGMENT,self.ceiling) * [None]
+        # base of the current frame, for '_f' instructions
+        self.fp = None
+        self.count = 0
+        self.counts[:] = len(self.counts) * [0]
+        self.debug = self.debugopt
+        self.stepexec = self.stepopt
+        self.pending = None
+
+    def load(self,program):
+        """ Loads a program: MEPA text (a string or a text file), the
+            [P, L] pair of 'readProgram' with arguments resolved or a
+            MepaObject.
+        """
+        if isinstance(program,str):
+            program = io.StringIO(program)
+        if isinstance(program,MepaObject):
+            P, L = program, program.labels
+            names = program.decoded()
+        else:
+            if hasattr(program,"readline"):
+                P, L = readProgram(program)
+                resolveArgs(P,L)
+            else:
+                P, L = program
+            names = decodeProgram(P)
+        self.P = P
+        self.L = L
+        self.names = names
+        self.check = self.checkopt and \
+                     not (self.verify and verifyProgram(names)==None)
+        self.tracing = self.debugopt or self.stepopt or \
+                       any(name in DEBUG_INSTR for name, args in names)
+        if self.evaluate:
+            self.DP = self.evaluated(P)
+        else:
+            self.DP = self.decode(names)
+        self.FP = self.DP
+        self.sites = self.fired = {}
+        # traces and profiles see every address, without superinstructions
+        if self.trace!=None:
+            self.DP = [(traced(self,fn,k,*names[k]) if self.evaluate else
+                        traced(self,fn,k,names[k][0]) if names[k][1]!=None
+                        else fn, args, step, n)
+                       for k, (fn, args, step, n) in enumerate(self.DP)]
+        if self.profile:
+            self.counts = len(P) * [0]
+            self.DP = [(profiled(fn,k,self.counts), args, step, n)
+                       for k, (fn, args, step, n) in enumerate(self.DP)]
+        self.FP = self.DP
+        self.frames = []
+        self.resolved = (0, 0)
+        self.jit = None
+        if not (self.tracing or self.profile or self.trace!=None or
+                self.evaluate):
+            if self.resolve:
+                self.address(names)
+            self.fuse(names)
+            if self.jitopt and self.resolve:
+                self.jit = Jit(self)
+                self.jit.install()
+        self.reset()
+
+    def decode(self,names):
+        """ List of (handler, args, step, weight) entries, where 'step'
+            is added to 'i' before the handler runs, 'weight' is the
+            number of instructions it counts for, and jump handlers
+            return the next address; instructions using their own
+            address get the following one as last argument.
+        """
+        DP = []
+        for k in range(len(names)):
+            name, args = names[k]
+            if args==None:
+                DP.append((badarg, (), 1, 1))
+                continue
+            if name in ["call", "callpar", "dump"]:
+                args = args + (k+1,)
+            DP.append((getattr(self,name), args, 1, 1))
+        return DP
+
+    def evaluated(self,P):
+        """ Entries running each instruction by 'eval' of its string of
+            'makeMepa', with the instructions of this VM as names; as
+            in 'decode', instructions using their own address get the
+            following one as last argument.
+        """
+        ns = dict((name, getattr(self,name))
+                  for name in set(INSTR_DICT.values()))
+        DP = []
+        for k, m in enumerate(makeMepa(P)):
+            if m[:m.find('(')] in ["call", "callpar", "dump"]:
+                m = "%s%s%d)" % (m[:-1],"" if m.endswith("()") else ",",k+1)
+            DP.append((eval, (m, ns), 1, 1))
+        return DP
+
+    def address(self,names):
+        """ Pre-resolved addressing (see 'addressProgram'); the frame
+            base 'fp' is kept by the '_f' variants of procedure entries
+            and returns.
+        """
+        AP, levels = addressProgram(names)
+        DP = self.DP
+        g = f = 0
+        for k in range(len(AP)):
+            if AP[k]!=None:
+                name, args = AP[k]
+                DP[k] = (getattr(self,name), args, 1, 1)
+                if name.endswith("_g"):
+                    g += 1
+                else:
+                    f += 1
+        if f:
+            for k in range(len(names)):
+                name, args = names[k]
+                if name in FRAME_INSTR and args!=None:
+                    DP[k] = (getattr(self,name+"_f"), args, 1, 1)
+            # level of the current frame at each address
+            self.frames = [0 if lev==None else lev for lev in levels]
+        self.resolved = (g, f)
+
+    def fuse(self,names):
+        """ Superinstructions (see 'fuseProgram'); those with only
+            accesses of level 0 take absolute addresses after
+            'address'.
+        """
+        FP, self.sites = fuseProgram(names)
+        self.fired = dict.fromkeys(self.sites,0)
+        for k in range(len(FP)):
+            if FP[k]==None:
+                FP[k] = self.DP[k]
+            else:
+                name, args, n = FP[k]
+                fn = name
+                if self.resolved[0]:
+                    gargs = globalArgs(name,args)
+                    if gargs!=None:
+                        fn, args = name+"_g", gargs
+                args = tuple(OPERATIONS.get(a,a) for a in args)
+                fn = getattr(self,fn)
+                if self.stats:
+                    fn = counted(fn,name,self.fired)
+                FP[k] = (fn, args, n, n)
+        self.FP = FP
+
+    def run(self,infile=None,outfile=None):
+        """ Runs the loaded program from its beginning, reading from
+            'infile' and writing to 'outfile' (stdin and stdout by
+            default); returns the number of executed instructions.
+            Errors are raised as MepaError.
+        """
+        self.reset()
+        return self.resume(infile,outfile)
+
+    def resume(self,infile=None,outfile=None):
+        """ Same as 'run', from the current state, e.g. after 'restore'
+            or a MepaError for the instruction limit, once the limit
+            is raised.
+        """
+        self.attach(infile,outfile)
+        return self.execute()
+
+    def attach(self,infile=None,outfile=None):
+        """ Input and output of 'resume', for 'execute'. """
+        if infile==None:
+            infile = sys.stdin
+        if outfile==None:
+            outfile = sys.stdout
+        if not isinstance(outfile,Output):
+            outfile = Output(outfile,1 if self.tracing else OUT_BUFFER)
+        if not isinstance(infile,Input):
+            infile = Input(infile,self.tracing,outfile)
+        self.inf = infile
+        self.outf = outfile
+        if self.pending!=None:
+            self.inf.restore(*self.pending)
+            self.pending = None
+
+    def checkpoint(self):
+        """ Snapshot of registers, display, memory up to its last used
+            cell, instruction count and pending input, as bytes.
+        """
+        M = self.M
+        top = self.peak()
+        if self.pending!=None:
+            pending = self.pending
+        elif hasattr(self,"inf"):
+            pending = self.inf.pending()
+        else:
+            pending = [[],0]
+        state = { "program": self.signature(),
+                  "i": self.i, "s": self.s, "count": self.count,
+                  "D": self.D, "M": M[:top], "input": pending,
+                  "debug": self.debug, "step": self.stepexec }
+        return CHECKPOINT_MAGIC+zlib.compress(json.dumps(state).encode())
+
+    def restore(self,data,name=""):
+        """ State from a 'checkpoint' of the same program, read from
+            file 'name'.
+        """
+        try:
+            if not data.startswith(CHECKPOINT_MAGIC):
+                raise ValueError
+            state = json.loads(zlib.decompress(data[len(CHECKPOINT_MAGIC):]))
+        except (ValueError, zlib.error):
+            raise MepaError(ILLEGAL_CHECKPOINT % name)
+        if state["program"]!=self.signature():
+            raise MepaError(CHECKPOINT_PROGRAM % name)
+        if len(state["M"])>self.ceiling or len(state["D"])>len(self.D):
+            raise MepaError(ILLEGAL_CHECKPOINT % name)
+        self.assign(state["i"],state["s"],state["count"],state["M"],
+                    state["D"],state["input"])
+        self.debug = state["debug"]
+        self.stepexec = state["step"]
+
+    def assign(self,i,s,count,M,D,pending=None):
+        """ State with registers 'i' and 's', instruction count 'count',
+            memory 'M' up to its last used cell, display 'D' and the
+            pending input of 'checkpoint', if any.
+        """
+        self.reset()
+        self.grow(len(M)-1)
+        self.i = i
+        self.s = s
+        self.count = count
+        self.M[:len(M)] = M
+        self.D[:len(D)] = D
+        if 0<=self.i<len(self.frames):
+            self.fp = self.D[self.frames[self.i]]
+        self.pending = pending
+
+    def grow(self,a):
+        """ Adds segments to the memory so that it includes address 'a',
+            within the ceiling; False if nothing could be added.
+        """
+        M = self.M
+        size = min((a//SEGMENT+1)*SEGMENT,self.ceiling)
+        if size<=len(M):
+            return False
+        M.extend((size-len(M))*[None])
+        return True
+
+    def far(self):
+        """ Negative addresses take cells from the end of the memory, as
+            in the original interpreter: the memory grows to the
+            ceiling.
+        """
+        self.grow(self.ceiling-1)
+
+    def reach(self,k):
+        """ First address beyond the memory accessed by the instruction
+            at 'k' from the current state; None if it fails before, e.g.
+            with a level outside the display.
+        """
+        M = self.M
+        try:
+            for a in self.accesses(*self.names[k]):
+                if a>=len(M):
+                    return a
+        except (IndexError, TypeError):
+            pass
+        return None
+
+    def accesses(self,name,args):
+        """ Memory addresses accessed by instruction 'name' from the
+            current state, in the order of the checks of the original
+            interpreter; the cells read for addresses are in the memory
+            when they are used. Levels outside the display raise
+            IndexError.
+        """
+        M = self.M;  D = self.D;  s = self.s
+        if name in BINARY_INSTR or name=="indx":
+            yield s-1
+            yield s
+        elif name in ("inv", "nott", "writ", "jmpf", "ldmv"):
+            yield s
+        elif name=="cont":
+            yield s
+            yield M[s][0]
+        elif name=="stmv":
+            yield s-args[0]
+        elif name=="ldct":
+            yield s+1
+        elif name in ("entproc", "entprocd"):
+            yield s+1
+            D[args[0]-1]
+        elif name in ("retproc", "retprocd"):
+            yield s-1
+            yield s-2
+            yield s-3
+            D[M[s-1][0]]
+        elif name in ("ldvl", "ldvi", "ldaddr"):
+            a = D[args[0]]+args[1]
+            if name!="ldaddr":
+                yield a
+            if name=="ldvi":
+                yield M[a][0]
+            yield s+1
+        elif name in ("stvl", "stvi"):
+            a = D[args[0]]+args[1]
+            yield a
+            yield s
+            if name=="stvi":
+                yield M[a][0]
+        elif name=="entlabl":
+            D[args[0]]
+        elif name in ("ldgaddr", "call"):
+            yield s+3
+            D[args[1]]
+        elif name=="callpar":
+            a = D[args[0]]+args[1]
+            yield s+3
+            yield a+2
+            D[args[2]]
+            D[M[a+2][0]]
+
+    def overflow(self,k,a):
+        """ Error of the instruction at 'k' accessing address 'a' (None
+            if not known) beyond the ceiling.
+        """
+        name = self.names[k][0]
+        if a!=None and name in SIZE_CHECKED and \
+           self.s+SIZE_CHECKED[name]>=self.ceiling:
+            return MepaError("\n"+ILLEGAL_ARGUMENT_TYPE)
+        return MepaError(ILLEGAL_VALUE % k,0)
+
+    def peak(self):
+        """ High-water mark of the stack: memory cells up to the last
+            one ever written.
+        """
+        M = self.M
+        top = len(M)
+        while top>0 and M[top-1]==None:
+            top -= 1
+        return top
+
+    def signature(self):
+        """ Digest of the loaded program. """
+        text = repr([(p[1].upper(), p[2]) for p in self.P])
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def execute(self,stop=None):
+        """ Execution loop from the current state; with 'stop', returns
+            None when the count reaches 'stop', ready to go on.
+        """
+        DP = self.DP
+        FP = self.FP
+        tracing = self.tracing
+        limit = self.limit
+        end = limit if stop==None else min(limit,stop)
+        # superinstructions stop short of the limit
+        wide = max([n for fn, args, step, n in FP]+[1])
+        near = end-wide
+        i = self.i
+        count = self.count
+        if count>=near:
+            FP = DP;  near = end
+        try:
+            while True:
+                li = i
+                try:
+                    try:
+                        fn, args, step, n = FP[i]
+                    except:
+                        raise MepaError(PROG_END)
+                    if tracing and self.debug:
+                        self.deb(i)
+                    i += step
+                    r = fn(*args)
+                    if r is not None:
+                        i = r
+                    if tracing:
+                        if self.debug:
+                            self.msg('')
+                        if self.stepexec:
+                            stepin = input(">>:")
+                            if stepin:
+                                self.msg(STOPPING_STEPEXEC)
+                                self.stepexec = False
+                    count += n
+                except InputPending:
+                    # LEIT without input yet (see mepa_async.py), run
+                    # again by the next 'execute'
+                    i = li
+                    raise
+                except MepaError:
+                    raise
+                except IndexError:
+                    if FP[li][3]>1:
+                        # the plain instructions run up to the next
+                        # address
+                        i = li;  FP = DP;  near = count+1
+                        continue
+                    # an access beyond the allocated memory: it grows
+                    # up to that address, within the ceiling
+                    a = self.reach(li)
+                    if a!=None and a<self.ceiling:
+                        self.grow(a)
+                        i = li
+                        continue
+                    raise self.overflow(li,a)
+                except AssertionError:
+                    if FP[li][3]>1:
+                        # superinstructions fail before changing the
+                        # state: the plain instructions report the error
+                        i = li;  FP = DP
+                        continue
+                    raise MepaError("\n"+ILLEGAL_ARGUMENT_TYPE)
+                except:
+                    if FP[li][3]>1:
+                        i = li;  FP = DP
+                        continue
+                    raise MepaError(ILLEGAL_VALUE % li,0)
+                if i<0:
+                    if self.jit!=None and li in self.jit.sites:
+                        # a hot loop (see mepa_jit.py)
+                        i, count = self.jit.enter(li,count,near)
+                    else:      # halt()
+                        if self.debug:
+                            self.msg("")
+                        return count
+                if count>=near:
+                    if count>=limit:
+                        raise MepaError(MAXIMUM_INSTRUCTIONS_EXCEEDED % limit)
+                    if count>=end:
+                        return None
+                    if count<end-wide:
+                        FP = self.FP;  near = end-wide
+                    else:
+                        FP = DP;  near = end
+        finally:
+            self.i = i
+            self.count = count
+            self.outf.flush()
+
+    def msg(self,m,eol=True):
+        """ Messages to the VM message stream. """
+        self.mess.write(m+'\n' if eol else m)
+        self.mess.flush()
+
+    def undmsg(self,m,c,k=1):
+        self.msg(m)
+        self.msg((len(m)-k)*c)
+
+    def fusionStats(self):
+        """ Prints superinstruction statistics. """
+        self.undmsg(FUSION_STATS,'-')
+        for name, seq in FUSIONS:
+            if name in self.sites:
+                self.msg("%-20s %6d %12d" %
+                         (name,self.sites[name],self.fired[name]))
+        self.msg("")
+
+    # Debugging output
+
+    def deb(self,i):
+        self.msg("i=%3d, s=%3d:      %-20s      " % (i,self.s,self.P[i][3]),
+                 eol=False)
+
+    def top(self,k,adj=0):
+        """ Prints stack top (adjusted) 'k' values. """
+        for j in range(k):
+            self.stack(self.s-k+j+1-adj)
+
+    def stack(self,n):
+        try:
+            v,t = self.M[n]
+            self.msg("%d (%d)    " % (v,t),eol=False)
+        except:
+            self.msg(ILLEGAL_DEBUG_VALUE)
+
+    def debnum(self,addr):
+        self.msg("%d        " % addr,eol=False)
+
+    # Instructions
+
+    def add(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]+M[s][0],0]
+        self.s = s-1
+
+    def subt(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]-M[s][0],0]
+        self.s = s-1
+
+    def mult(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]*M[s][0],0]
+        self.s = s-1
+
+    def divi(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]//M[s][0],0]
+        self.s = s-1
+
+    def andd(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0] and M[s][0],0]
+        self.s = s-1
+
+    def orr(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0] or M[s][0],0]
+        self.s = s-1
+
+    def less(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]<M[s][0],0]
+        self.s = s-1
+
+    def grt(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]>M[s][0],0]
+        self.s = s-1
+
+    def eql(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]==M[s][0],0]
+        self.s = s-1
+
+    def dif(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]!=M[s][0],0]
+        self.s = s-1
+
+    def leq(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]<=M[s][0],0]
+        self.s = s-1
+
+    def geq(self):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==0 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]>=M[s][0],0]
+        self.s = s-1
+
+    def inv(self):
+        M = self.M;  s = self.s
+        if s<0:
+            self.far()
+        if self.check:
+            assert M[s][1]==0
+        if self.debug:
+            self.top(1)
+        M[s] = [-M[s][0],0]
+
+    def nott(self):
+        M = self.M;  s = self.s
+        if s<0:
+            self.far()
+        if self.check:
+            assert M[s][1]==0
+        if self.debug:
+            self.top(1)
+        M[s] = [1-M[s][0],0]
+
+    def nop(self):
+        pass
+
+    def halt(self):
+        return -1
+
+    def read(self):
+        M = self.M
+        if len(M)<=self.s+1:
+            self.grow(self.s+1)
+        assert len(M)>self.s
+        try:
+            v = self.inf.readInt()
+            self.s += 1;  M[self.s] = [v,0]
+            if self.debug:
+                self.top(1)
+        except EOFError:
+            raise MepaError("\n"+UNEXPECTED_EOF_INPUT)
+        except InputPending:
+            raise
+        except:
+            raise MepaError(ILLEGAL_INPUT_VALUE)
+
+    def writ(self):
+        M = self.M;  s = self.s
+        if s<0:
+            self.far()
+        if self.check:
+            assert M[s][1]==0
+        if self.debug:
+            self.top(1)
+        self.outf.write("%d\n" % M[s][0])
+        self.s = s-1
+
+    def init(self):
+        self.s = -1;  self.D[0] = 0
+
+    def cont(self):
+        M = self.M;  s = self.s
+        if s<0:
+            self.far()
+        if self.check:
+            assert M[s][1]==2
+        if self.debug:
+            self.top(1)
+        a = M[s][0]
+        if a<0:
+            self.far()
+        M[s] = M[a]
+
+    def ldct(self,k):
+        s = self.s+1
+        self.M[s] = [k,0]
+        self.s = s
+        if self.debug:
+            self.top(1)
+
+    def jmp(self,p):
+        if self.debug:
+            self.debnum(p)
+        return p
+
+    def jmpf(self,p):
+        M = self.M;  s = self.s
+        if s<0:
+            self.far()
+        if self.check:
+            assert M[s][1]==0
+        if self.debug:
+            self.debnum(p)
+            self.top(1)
+        self.s = s-1
+        if not M[s][0]:
+            return p
+
+    def alloc(self,n):
+        self.s += n
+        if self.s<-1:
+            self.far()
+
+    def dealloc(self,n):
+        self.s -= n
+        if self.s<-1:
+            self.far()
+
+    def entproc(self,k):
+        M = self.M;  D = self.D
+        assert len(D)>k
+        if self.debug:
+            self.debnum(D[k-1])
+        s = self.s+1
+        M[s] = [D[k-1],2]
+        self.s = s
+        D[k] = s+1
+
+    def retproc(self,n):
+        M = self.M;  D = self.D;  s = self.s
+        if s<3:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==1 and M[s-2][1]==2 and M[s-3][1]==3
+        if self.debug:
+            self.top(3,1)
+        t = M[s-1][0]
+        D[t] = M[s-2][0]
+        i = M[s-3][0]
+        self.chain(t)
+        self.s = s-(n+4)
+        if self.s<-1:
+            self.far()
+        return i
+
+    def entprocd(self,k):
+        M = self.M;  D = self.D
+        assert len(D)>k
+        if self.debug:
+            self.debnum(D[k-1])
+        s = self.s+1
+        if s<2:
+            self.far()
+        M[s] = [D[k-1],2]
+        M[s-1] = [k,1]
+        M[s-2] = [D[k],2]
+        self.s = s
+        D[k] = s+1
+
+    def retprocd(self,n):
+        M = self.M;  s = self.s
+        if s<3:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==1 and M[s-2][1]==2 and M[s-3][1]==3
+        if self.debug:
+            self.top(3,1)
+        self.D[M[s-1][0]] = M[s-2][0]
+        self.s = s-(n+4)
+        if self.s<-1:
+            self.far()
+        return M[s-3][0]
+
+    def indx(self,k):
+        M = self.M;  s = self.s
+        if s<1:
+            self.far()
+        if self.check:
+            assert M[s-1][1]==2 and M[s][1]==0
+        if self.debug:
+            self.top(2)
+        M[s-1] = [M[s-1][0]+M[s][0]*k,2]
+        self.s = s-1
+
+    def ldmv(self,k):
+        M = self.M;  s = self.s
+        if s<0:
+            self.far()
+        if self.check:
+            assert M[s][1]==2
+        t = M[s][0]
+        if t<0:
+            self.far()
+        if len(M)<=max(s,t)+k:
+            self.grow(max(s,t)+k)
+        assert len(M)>(s+k)
+        if self.debug:
+            self.top(1)
+        M[s:s+k] = M[t:t+k]
+        self.s = s+(k-1)
+        if self.s<-1:
+            self.far()
+
+    def stmv(self,k):
+        M = self.M;  s = self.s
+        if s<k:
+            self.far()
+        if self.check:
+            assert M[s-k][1]==2
+        if self.debug:
+            self.top(1,k)
+        t = M[s-k][0]
+        if t<0:
+            self.far()
+        if len(M)<t+k:
+            self.grow(t+k-1)
+        M[t:t+k] = M[s-k+1:s+1]
+        self.s = s-(k+1)
+        if self.s<-1:
+            self.far()
+
+    def ldvl(self,m,n):
+        a = self.D[m]
+        assert a!=None
+        a += n
+        if a<0:
+            self.far()
+        if self.debug:
+            self.debnum(a)
+        s = self.s+1
+        self.M[s] = self.M[a]
+        self.s = s
+
+    def ldaddr(self,m,n):
+        a = self.D[m]
+        assert a!=None
+        a += n
+        if self.debug:
+            self.debnum(a)
+        s = self.s+1
+        self.M[s] = [a,2]
+        self.s = s
+
+    def stvl(self,m,n):
+        a = self.D[m]
+        assert a!=None
+        a += n
+        if a<0 or self.s<0:
+            self.far()
+        if self.debug:
+            self.debnum(a)
+        self.M[a] = self.M[self.s]
+        self.s -= 1
+
+    def ldvi(self,m,n):
+        M = self.M
+        a = self.D[m]
+        assert a!=None
+        a += n
+        if a<0:
+            self.far()
+        if self.debug:
+            self.debnum(a)
+        if self.check:
+            assert M[a][1]==2
+        s = self.s+1
+        a = M[a][0]
+        if a<0:
+            self.far()
+        M[s] = M[a]
+        self.s = s
+
+    def stvi(self,m,n):
+        M = self.M
+        a = self.D[m]
+        assert a!=None
+        a += n
+        if a<0 or self.s<0:
+            self.far()
+        if self.debug:
+            self.debnum(a)
+        if self.check:
+            assert M[a][1]==2
+        a = M[a][0]
+        if a<0:
+            self.far()
+        M[a] = M[self.s]
+        self.s -= 1
+
+    def entlabl(self,j,n):
+        if self.debug:
+            self.debnum(self.D[j])
+        self.s = self.D[j]+n-1
+        if self.s<-1:
+            self.far()
+
+    def ldgaddr(self,p,k):
+        M = self.M;  s = self.s
+        M[s+1] = [p,3]
+        M[s+2] = [self.D[k],2]
+        M[s+3] = [k,1]
+        self.s = s+3
+        if self.debug:
+            self.top(3)
+
+    def call(self,p,k,ret):
+        M = self.M;  s = self.s
+        M[s+1] = [ret,3]
+        M[s+2] = [self.D[k],2]
+        M[s+3] = [k,1]
+        self.s = s+3
+        if self.debug:
+            self.top(3)
+        return p
+
+    def callpar(self,m,n,k,ret):
+        M = self.M;  D = self.D;  s = self.s
+        assert D[m]!=None
+        a = D[m]+n
+        if a<0:
+            self.far()
+        if self.check:
+            assert M[a][1]==3 and M[a+1][1]==2 and M[a+2][1]==1
+        if self.debug:
+            self.debnum(a)
+        M[s+1] = [ret,3]
+        M[s+2] = [D[k],2]
+        M[s+3] = [k,1]
+        self.s = s+3
+        if self.debug:
+            self.top(3)
+        i = M[a][0]
+        t = M[a+2][0]
+        D[t] = M[a+1][0]
+        self.chain(t)
+        return i
+
+    def chain(self,t):
+        """ Display entries below level 't' from the static links; the
+            memory grows for links beyond it, as the registers have
+            changed.
+        """
+        M = self.M;  D = self.D
+        while t>1:
+            a = D[t]-1
+            if a<0:
+                self.far()
+            elif a>=len(M):
+                self.grow(a)
+            if self.check:
+                assert M[a][1]==2
+            D[t-1] = M[a][0]
+            t -= 1
+
+    # Pre-resolved addressing: absolute addresses of level 0 ('_g') and
+    # offsets from the current frame base 'fp' ('_f'), without debugging
+
+    def ldvl_g(self,a):
+        s = self.s+1
+        self.M[s] = self.M[a]
+        self.s = s
+
+    def stvl_g(self,a):
+        if self.s<0:
+            self.far()
+        self.M[a] = self.M[self.s]
+        self.s -= 1
+
+    def ldvl_f(self,n):
+        a = self.fp+n
+        if a<0:
+            self.far()
+        s = self.s+1
+        self.M[s] = self.M[a]
+        self.s = s
+
+    def stvl_f(self,n):
+        a = self.fp+n
+        if a<0 or self.s<0:
+            self.far()
+        self.M[a] = self.M[self.s]
+        self.s -= 1
+
+    def entproc_f(self,k):
+        self.entproc(k)
+        self.fp = self.D[k]
+
+    def entprocd_f(self,k):
+        self.entprocd(k)
+        self.fp = self.D[k]
+
+    def retproc_f(self,n):
+        i = self.retproc(n)
+        F = self.frames
+        self.fp = self.D[F[i]] if 0<=i<len(F) else None
+        return i
+
+    def retprocd_f(self,n):
+        i = self.retprocd(n)
+        F = self.frames
+        self.fp = self.D[F[i]] if 0<=i<len(F) else None
+        return i
+
+    # Superinstructions, on absolute addresses: every check happens
+    # before the state changes. Cells above the stack top get the same
+    # values as with the plain instructions.
+
+    def ldvl_ldvl_op_stvl_g(self,a1,a2,op,a3):
+        M = self.M;  s = self.s
+        x = M[a1];  y = M[a2]
+        if self.check:
+            assert x[1]==0 and y[1]==0
+        z = [op(x[0],y[0]),0]
+        M[s+2] = y;  M[s+1] = z
+        M[a3] = z
+
+    def ldvl_ldct_op_stvl_g(self,a1,k,op,a3):
+        M = self.M;  s = self.s
+        x = M[a1]
+        if self.check:
+            assert x[1]==0
+        z = [op(x[0],k),0]
+        M[s+2] = [k,0];  M[s+1] = z
+        M[a3] = z
+
+    def ldvl_ldvl_op_jmpf_g(self,a1,a2,op,p):
+        M = self.M;  s = self.s
+        x = M[a1];  y = M[a2]
+        if self.check:
+            assert x[1]==0 and y[1]==0
+        z = op(x[0],y[0])
+        M[s+2] = y;  M[s+1] = [z,0]
+        if not z:
+            return p
+
+    def ldvl_ldct_op_jmpf_g(self,a1,k,op,p):
+        M = self.M;  s = self.s
+        x = M[a1]
+        if self.check:
+            assert x[1]==0
+        z = op(x[0],k)
+        M[s+2] = [k,0];  M[s+1] = [z,0]
+        if not z:
+            return p
+
+    def ldvl_ldvl_op_g(self,a1,a2,op):
+        M = self.M;  s = self.s
+        x = M[a1];  y = M[a2]
+        if self.check:
+            assert x[1]==0 and y[1]==0
+        z = [op(x[0],y[0]),0]
+        M[s+2] = y;  M[s+1] = z
+        self.s = s+1
+
+    def ldvl_ldct_op_g(self,a1,k,op):
+        M = self.M;  s = self.s
+        x = M[a1]
+        if self.check:
+            assert x[1]==0
+        z = [op(x[0],k),0]
+        M[s+2] = [k,0];  M[s+1] = z
+        self.s = s+1
+
+    def ldct_stvl_g(self,k,a):
+        M = self.M
+        z = [k,0]
+        M[self.s+1] = z
+        M[a] = z
+
+    def ldvl_stvl_g(self,a1,a2):
+        M = self.M
+        x = M[a1]
+        M[self.s+1] = x
+        M[a2] = x
+
+    # Superinstructions with the level and offset of each access: the
+    # addresses, then the same as with absolute addresses (as for level
+    # 0 after 'address').
+
+    def ldvl_ldvl_op_stvl(self,m1,n1,m2,n2,op,m3,n3):
+        D = self.D
+        assert D[m1]!=None and D[m2]!=None and D[m3]!=None
+        a1 = D[m1]+n1;  a2 = D[m2]+n2;  a3 = D[m3]+n3
+        if a1<0 or a2<0 or a3<0:
+            self.far()
+        self.ldvl_ldvl_op_stvl_g(a1,a2,op,a3)
+
+    def ldvl_ldct_op_stvl(self,m1,n1,k,op,m3,n3):
+        D = self.D
+        assert D[m1]!=None and D[m3]!=None
+        a1 = D[m1]+n1;  a3 = D[m3]+n3
+        if a1<0 or a3<0:
+            self.far()
+        self.ldvl_ldct_op_stvl_g(a1,k,op,a3)
+
+    def ldvl_ldvl_op_jmpf(self,m1,n1,m2,n2,op,p):
+        D = self.D
+        assert D[m1]!=None and D[m2]!=None
+        a1 = D[m1]+n1;  a2 = D[m2]+n2
+        if a1<0 or a2<0:
+            self.far()
+        return self.ldvl_ldvl_op_jmpf_g(a1,a2,op,p)
+
+    def ldvl_ldct_op_jmpf(self,m1,n1,k,op,p):
+        D = self.D
+        assert D[m1]!=None
+        a1 = D[m1]+n1
+        if a1<0:
+            self.far()
+        return self.ldvl_ldct_op_jmpf_g(a1,k,op,p)
+
+    def ldvl_ldvl_op(self,m1,n1,m2,n2,op):
+        D = self.D
+        assert D[m1]!=None and D[m2]!=None
+        a1 = D[m1]+n1;  a2 = D[m2]+n2
+        if a1<0 or a2<0:
+            self.far()
+        self.ldvl_ldvl_op_g(a1,a2,op)
+
+    def ldvl_ldct_op(self,m1,n1,k,op):
+        D = self.D
+        assert D[m1]!=None
+        a1 = D[m1]+n1
+        if a1<0:
+            self.far()
+        self.ldvl_ldct_op_g(a1,k,op)
+
+    def ldct_stvl(self,k,m,n):
+        D = self.D
+        assert D[m]!=None
+        a = D[m]+n
+        if a<0:
+            self.far()
+        self.ldct_stvl_g(k,a)
+
+    def ldvl_stvl(self,m1,n1,m2,n2):
+        D = self.D
+        assert D[m1]!=None and D[m2]!=None
+        a1 = D[m1]+n1;  a2 = D[m2]+n2
+        if a1<0 or a2<0:
+            self.far()
+        self.ldvl_stvl_g(a1,a2)
+
+    # Debugging instructions
+
+    def dbug(self,t):
+        """ Set on/off debugging flag."""
+        if t and not self.debug:
+            self.msg(STARTING_DEBUGGING)
+        elif self.debug and not t:
+            self.msg(STOPPING_DEBUGGING)
+        self.debug = t
+
+    def step(self,t):
+        """ Set on/off step execution flag."""
+        if t and not self.stepexec:
+            self.msg(STARTING_STEPEXEC)
+        elif self.stepexec and not t:
+            self.msg(STOPPING_STEPEXEC)
+        self.stepexec = t
+
+    def dump(self,i):
+        """ Dump everything that can be useful. """
+        self.undmsg(DUMP,'=',2)
+        self.msg("i=%3d, s=%3d" % (i,self.s))
+        self.undmsg(DISPLAY,'-')
+        for k in range(self.displaysize):
+            if self.D[k]!=None:
+                self.msg("%2d: %5d" % (k,self.D[k]))
+        self.undmsg(MEMORY,'-')
+        for k in range(min(self.stacksize,len(self.M))):
+            if self.M[k]!=None and self.M[k][0]!=None:
+                self.msg("%2d: %5d (%d)" % (k,self.M[k][0],self.M[k][1]))
+        self.undmsg(LABELS,'-')
+        for lab in self.L:
+            self.msg("%-5s:  %d" % (lab,self.L[lab]))
+        self.undmsg(END_DUMP,"=")
+
+
+def globalArgs(name,args):
+    """ Arguments of the '_g' variant of superinstruction 'name', with
+        addresses instead of level and offset pairs, if every access
+        has level 0; None otherwise.
+    """
+    gargs = []
+    j = 0
+    for instr in dict(FUSIONS)[name]:
+        if instr in ADDRESS_INSTR:
+            if args[j]!=0 or args[j+1]<0:
+                return None
+            gargs.append(args[j+1])
+            j += 2
+        else:
+            gargs.append(args[j])
+            j += 1
+    return tuple(gargs)
+
+def badarg(*args):
+    """ Argument that 'eval' would not accept. """
+    raise ValueError
+
+def profiled(fn,k,counts):
+    """ Handler 'fn' of address 'k' counting its executions. """
+    def f(*args):
+        r = fn(*args)
+        counts[k] += 1
+        return r
+    return f
+
+def counted(fn,name,fired):
+    """ Handler 'fn' counting its executions. """
+    def f(*args):
+        fired[name] += 1
+        return fn(*args)
+    return f
+
+def executeVM(MP,P,L,msfile,infile,outfile,nocheck,jit=None,
+              evaluate=False,resolve=True):
+    """Execution function running the program on a VM (see 'VM' for
+       'evaluate' and 'resolve'); 'jit' overrides the option.
+    """
+    trace = None
+    if OPTIONS_DICT["trace"]:
+        try:
+            trace = TraceWriter(OPTIONS_DICT["trace"],OPTIONS_DICT["tracesize"])
+        except OSError:
+            Msg(OPEN_FILE_ERROR % OPTIONS_DICT["trace"],quit=True,code=1,
+                file=msfile)
+    # verified by mepa_engines.py
+    vm = VM(nocheck=nocheck,messfile=msfile,trace=trace,jit=jit,
+            verify=False,evaluate=evaluate,resolve=resolve)
+    vm.load(P if isinstance(P,MepaObject) else [P,L])
+    if OPTIONS_DICT["restore"]:
+        try:
+            with open(OPTIONS_DICT["restore"],"rb") as f:
+                vm.restore(f.read(),OPTIONS_DICT["restore"])
+        except OSError:
+            Msg(OPEN_FILE_ERROR % OPTIONS_DICT["restore"],quit=True,code=1,
+                file=msfile)
+        except MepaError as e:
+            Msg(str(e),quit=True,code=1,file=msfile)
+    try:
+        if OPTIONS_DICT["restore"]:
+            count = vm.resume(infile,outfile)
+        else:
+            count = vm.run(infile,outfile)
+    except MepaError as e:
+        vm.msg(str(e))
+        if vm.stats:
+            vm.msg(STACK_PEAK % (vm.peak(),len(vm.M),vm.ceiling))
+        if OPTIONS_DICT["checkpoint"] and vm.i>=0 and vm.count>=vm.limit:
+            try:
+                with open(OPTIONS_DICT["checkpoint"],"wb") as f:
+                    f.write(vm.checkpoint())
+                vm.msg(CHECKPOINT_WRITTEN % (OPTIONS_DICT["checkpoint"],vm.count))
+            except OSError:
+                vm.msg(OPEN_FILE_ERROR % OPTIONS_DICT["checkpoint"])
+        sys.exit(e.code)
+    finally:
+        if trace!=None:
+            trace.close()
+        if vm.profile:
+            prof = profile(P,L,vm.counts)
+            writeProfile(OPTIONS_DICT["profile"],prof,vm.msg)
+            profileTables(prof,OPTIONS_DICT["profiletop"],vm.msg)
+    vm.msg(EXECUTED_INSTRUCTIONS % count)
+    if vm.stats:
+        vm.msg(STACK_PEAK % (vm.peak(),len(vm.M),vm.ceiling))
+        if vm.resolve:
+            vm.msg(ADDRESS_STATS % vm.resolved)
+        if vm.jit!=None:
+            vm.msg(JIT_STATS % (vm.jit.compiled,vm.jit.runs,vm.jit.steps))
+        if not vm.evaluate:
+            vm.fusionStats()
+    return -1
@@ -4,9 +4,11 @@ from parser_rascal import make_parser
 from printer_rascal import ImpressoraAST
 from sem_rascal import VerificadorSemantico
 from codegen_rascal import GeradorCodigoMEPA
+from codegen_reg_rascal import GeradorCodigoRegistradores
+from vm_reg_rascal import MaquinaRegistradores, ErroExecucao, lista_codigo
 
 def imprimir_modo_uso():
-    print("Modo de uso: python rascal.py <flag> < arquivo_entrada", file=sys.stderr)
+    print("Modo de uso: python rascal.py <flag> [arquivo_fonte] < arquivo_entrada", file=sys.stderr)
     print("Exemplo: python rascal.py -l < testes/exemplo1.ras", file=sys.stderr)
     print("Flags disponíveis:", file=sys.stderr)
     print("  -l : Executa apenas a análise léxica (scanner).", file=sys.stderr)
@@ -14,16 +16,23 @@ def imprimir_modo_uso():
     print("  -pp: Executa as análises léxica e sintática e imprime a AST.", file=sys.stderr)
     print("  -s : Executa as análises léxica, sintática e semântica.", file=sys.stderr)
     print("  -g : Compilação completa (gera código MEPA).", file=sys.stderr)
+    print("  -gd: Compilação completa, com retorno de subrotinas em tempo constante (ENPD/RTPD).", file=sys.stderr)
+    print("  -gr: Compilação completa para a máquina de registradores (gera o código de três endereços).", file=sys.stderr)
+    print("  -xr: Compila para a máquina de registradores e executa; com arquivo_fonte, o programa lê a entrada padrão.", file=sys.stderr)
 
 def main():
-    if len(sys.argv) != 2:
+    if len(sys.argv) not in (2, 3):
         imprimir_modo_uso()
         sys.exit(1)
         
     flag = sys.argv[1]
     
     try:
-        data = sys.stdin.read()
+        if len(sys.argv) == 3:
+            with open(sys.argv[2], encoding="utf-8") as fonte:
+                data = fonte.read()
+        else:
+            data = sys.stdin.read()
     except Exception as e:
         print(f"Erro ao ler entrada padrão: {e}", file=sys.stderr)
         sys.exit(1)
@@ -81,10 +90,10 @@ def main():
         print("SUCESSO: Análises léxica, sintática e semântica concluídas.", file=sys.stderr)
         return 
 
-    # Execução para -g
-    if flag == '-g':
+    # Execução para -g e -gd
+    if flag in ('-g', '-gd'):
         # Gerador de código
-        gerador = GeradorCodigoMEPA()
+        gerador = GeradorCodigoMEPA(salva_display=(flag == '-gd'))
         gerador.visita(ast_raiz)
 
         if gerador.tem_erro:
@@ -98,6 +107,34 @@ def main():
             print(instrucao, file=sys.stderr)
         print("SUCESSO: Geração de código concluída.", file=sys.stderr)    
         return
+
+    # Execução para -gr e -xr (máquina de registradores)
+    if flag in ('-gr', '-xr'):
+        gerador = GeradorCodigoRegistradores()
+        gerador.visita(ast_raiz)
+
+        if gerador.tem_erro:
+            print("ERRO DE GERAÇÃO:", file=sys.stderr)
+            for erro in gerador.erros:
+                print(f"- {erro}", file=sys.stderr)
+            sys.exit(0)
+
+        if flag == '-gr':
+            for linha in lista_codigo(gerador.funcoes):
+                print(linha, file=sys.stderr)
+            print("SUCESSO: Geração de código concluída.", file=sys.stderr)
+            return
+
+        maquina = MaquinaRegistradores(gerador.funcoes)
+        try:
+            maquina.executa()
+        except ErroExecucao as e:
+            sys.stdout.flush()
+            print(f"ERRO DE EXECUÇÃO: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.stdout.flush()
+        print(f"\n{maquina.contador} instruções executadas", file=sys.stderr)
+        return
     
     # Flag não reconhecida
     print(f"ERRO: Flag '{flag}' desconhecida.", file=sys.stderr)
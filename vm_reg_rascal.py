@@ -0,0 +1,199 @@
+from __future__ import annotations
+import sys
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Máquina de registradores: cada ativação de subrotina tem um quadro
+# (lista de registradores) com os parâmetros, as variáveis locais, o valor
+# de retorno, as constantes e os temporários; as instruções nomeiam os
+# registradores do quadro diretamente (três endereços). As variáveis
+# globais são os primeiros registradores do quadro do programa principal;
+# nas subrotinas, são acessadas por CRGL/ARGL.
+
+# Códigos das instruções, as mais frequentes primeiro
+(SOMA, SUBT, MOVE, DCME, DCEG, DCMA, DCAG, DCIG, DCDG, DSVS, DSVF,
+ MULT, DIVI, CMME, CMEG, CMMA, CMAG, CMIG, CMDG, CONJ, DISJ, INVR,
+ NEGA, CRGL, ARGL, CHAM, RETN, LEIT, IMPR, PARA) = range(30)
+
+NOMES = ["SOMA", "SUBT", "MOVE", "DCME", "DCEG", "DCMA", "DCAG", "DCIG",
+         "DCDG", "DSVS", "DSVF", "MULT", "DIVI", "CMME", "CMEG", "CMMA",
+         "CMAG", "CMIG", "CMDG", "CONJ", "DISJ", "INVR", "NEGA", "CRGL",
+         "ARGL", "CHAM", "RETN", "LEIT", "IMPR", "PARA"]
+
+# Formato dos operandos de cada instrução na listagem: r registrador,
+# g global, e endereço de desvio
+FORMATOS = {
+    MOVE: "rr", INVR: "rr", NEGA: "rr", DSVS: "e", DSVF: "re",
+    CRGL: "rg", ARGL: "gr", RETN: "", LEIT: "r", IMPR: "r", PARA: "",
+}
+FORMATOS.update(dict.fromkeys([DCME, DCEG, DCMA, DCAG, DCIG, DCDG], "rre"))
+
+@dataclass
+class FuncaoReg:
+    '''
+    Código de uma subrotina (ou do programa principal).
+    modelo: quadro inicial, com as constantes nos seus registradores.
+    retorno: registrador do valor de retorno (-1 em procedimentos).
+    '''
+    nome: str
+    parametros: int = 0
+    retorno: int = -1
+    codigo: List[tuple] = field(default_factory=list)
+    modelo: List[Optional[int]] = field(default_factory=list)
+
+def lista_codigo(funcoes: List[FuncaoReg]) -> List[str]:
+    '''
+    Listagem legível do código de registradores.
+    '''
+    linhas = []
+    for k, f in enumerate(funcoes):
+        cabecalho = f"F{k}: {f.nome} (parâmetros {f.parametros}, registradores {len(f.modelo)}"
+        if f.retorno >= 0:
+            cabecalho += f", retorno r{f.retorno}"
+        linhas.append(cabecalho + ")")
+        for r, v in enumerate(f.modelo):
+            if v is not None:
+                linhas.append(f"   CONST r{r},{v}")
+        for pc, instr in enumerate(f.codigo):
+            op = instr[0]
+            if op == CHAM:
+                _, sub, destino, args = instr
+                ops = [f"F{sub}", f"r{destino}"] + [f"r{a}" for a in args]
+            else:
+                formato = FORMATOS.get(op, "rrr")
+                prefixos = {"r": "r", "g": "g", "e": ""}
+                ops = [prefixos[c] + str(a) for c, a in zip(formato, instr[1:])]
+            linhas.append(f"{pc:4d}: {NOMES[op]} {','.join(ops)}".rstrip())
+    return linhas
+
+class ErroExecucao(Exception):
+    pass
+
+class MaquinaRegistradores:
+    '''
+    Interpretador do código de registradores; a entrada e a saída são as
+    da MEPA: LEIT lê o próximo inteiro da entrada e IMPR escreve um valor
+    por linha. Registradores não inicializados valem None, e as
+    instruções que os usam como valor falham (TypeError), como na MEPA;
+    os valores lógicos são sempre 0 ou 1.
+    '''
+    def __init__(self, funcoes: List[FuncaoReg], entrada=sys.stdin,
+                 saida=sys.stdout):
+        self.funcoes = funcoes
+        self.entrada = entrada
+        self.saida = saida
+        self.tokens: List[str] = []
+        self.pos = 0
+        self.contador = 0
+
+    def _le_inteiro(self) -> int:
+        while self.pos >= len(self.tokens):
+            linha = self.entrada.readline()
+            if not linha:
+                raise ErroExecucao("Fim inesperado do arquivo de entrada")
+            self.tokens = linha.split()
+            self.pos = 0
+        t = self.tokens[self.pos]
+        self.pos += 1
+        try:
+            return int(t)
+        except ValueError:
+            raise ErroExecucao("Valor de entrada inválido")
+
+    def executa(self) -> int:
+        '''
+        Executa o programa (subrotina 0); devolve o número de instruções
+        executadas.
+        '''
+        funcoes = [(f.codigo, f.modelo, f.retorno) for f in self.funcoes]
+        codigo, modelo, retorno = funcoes[0]
+        G = F = list(modelo)
+        pilha = []      # (código, pc, quadro, destino, retorno) dos chamadores
+        escreve = self.saida.write
+        pc = 0
+        n = 0
+        try:
+            while True:
+                op, a, b, c = codigo[pc]
+                pc += 1
+                n += 1
+                if op == SOMA:
+                    F[a] = F[b] + F[c]
+                elif op == SUBT:
+                    F[a] = F[b] - F[c]
+                elif op == MOVE:
+                    F[a] = F[b]
+                elif op == DCME:
+                    if not F[a] < F[b]: pc = c
+                elif op == DCEG:
+                    if not F[a] <= F[b]: pc = c
+                elif op == DCMA:
+                    if not F[a] > F[b]: pc = c
+                elif op == DCAG:
+                    if not F[a] >= F[b]: pc = c
+                elif op == DCIG:
+                    if F[a] - F[b]: pc = c
+                elif op == DCDG:
+                    if not F[a] - F[b]: pc = c
+                elif op == DSVS:
+                    pc = a
+                elif op == DSVF:
+                    if F[a] < 1: pc = b
+                elif op == MULT:
+                    F[a] = F[b] * F[c]
+                elif op == DIVI:
+                    F[a] = F[b] // F[c]
+                elif op == CMME:
+                    F[a] = int(F[b] < F[c])
+                elif op == CMEG:
+                    F[a] = int(F[b] <= F[c])
+                elif op == CMMA:
+                    F[a] = int(F[b] > F[c])
+                elif op == CMAG:
+                    F[a] = int(F[b] >= F[c])
+                elif op == CMIG:
+                    F[a] = 0 if F[b] - F[c] else 1
+                elif op == CMDG:
+                    F[a] = 1 if F[b] - F[c] else 0
+                elif op == CONJ:
+                    F[a] = F[b] & F[c]
+                elif op == DISJ:
+                    F[a] = F[b] | F[c]
+                elif op == INVR:
+                    F[a] = -F[b]
+                elif op == NEGA:
+                    F[a] = 1 - F[b]
+                elif op == CRGL:
+                    F[a] = G[b]
+                elif op == ARGL:
+                    G[a] = F[b]
+                elif op == CHAM:
+                    pilha.append((codigo, pc, F, b, retorno))
+                    codigo, modelo, retorno = funcoes[a]
+                    N = modelo[:]
+                    for k, r in enumerate(c):
+                        N[k] = F[r]
+                    F = N
+                    pc = 0
+                elif op == RETN:
+                    v = F[retorno] if retorno >= 0 else None
+                    codigo, pc, F, d, retorno = pilha.pop()
+                    if d >= 0:
+                        F[d] = v
+                elif op == LEIT:
+                    F[a] = self._le_inteiro()
+                elif op == IMPR:
+                    escreve("%d\n" % F[a])
+                else:   # PARA
+                    break
+        except ErroExecucao:
+            self.contador = n
+            raise
+        except ZeroDivisionError:
+            self.contador = n
+            raise ErroExecucao(f"Divisão por zero na instrução {pc-1}")
+        except (TypeError, IndexError):
+            self.contador = n
+            raise ErroExecucao(f"Valor indefinido na instrução {pc-1}")
+        self.contador = n
+        return n